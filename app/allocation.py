@@ -0,0 +1,192 @@
+"""
+Toplu kupon dağıtım motoru.
+
+Atanmamış ("created") tüm kuponlar ve uygun ihtiyaç sahipleri tek seferde belleğe
+alınır, eşleştirme bellekte yapılır ve sonuç tek executemany UPDATE ile yazılır.
+
+Kurallar (seçim motoru ve /coupons/assign ile aynı):
+- Sadece role IN (beneficiary, both) ve is_verified olan kullanıcılar
+- Priority'ye göre kupon limiti (3/5/10), received_coupon_count sayacı ile
+- Aynı kupon tipinden kişi başı en fazla 1 kupon (reserved/assigned/used)
+
+Adaylar bir kez (priority yüksek, dağıtım başındaki kupon sayısı az, id küçük) sırasıyla
+sıralanır; her kupon tipi için bu sırada hâlâ uygun olan (limiti dolmamış, tipten kuponu
+olmayan) ilk k kişi seçilir. NumPy kuruluysa sıralama ve filtre vektörel (np.lexsort)
+yapılır, değilse aynı sonuç saf Python ile üretilir.
+"""
+
+from collections import Counter, defaultdict
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app import beneficiary_selector, coupon_state, logic, models, showcase, stats
+
+try:
+    import numpy as np
+except ImportError:  # NumPy opsiyonel
+    np = None
+
+
+def _unassigned_coupons(db: Session, coupon_type_ids=None) -> dict:
+    """{coupon_type_id: [coupon_id, ...]} (ix_coupons_status / ix_coupons_type_status)"""
+    q = db.query(models.Coupon.id, models.Coupon.coupon_type_id).filter(
+        models.Coupon.status == "created",
+        models.Coupon.beneficiary_id.is_(None)
+    )
+    if coupon_type_ids:
+        q = q.filter(models.Coupon.coupon_type_id.in_(coupon_type_ids))
+
+    coupons = defaultdict(list)
+    for coupon_id, coupon_type_id in q.order_by(models.Coupon.id):
+        coupons[coupon_type_id].append(coupon_id)
+    return coupons
+
+
+def _candidates(db: Session):
+    """Limiti dolmamış doğrulanmış ihtiyaç sahipleri: [(user_id, priority, received, cap)]"""
+    rows = (
+        db.query(models.User.id, models.User.priority, models.User.received_coupon_count)
+        .filter(
+            models.User.role.in_(beneficiary_selector.BENEFICIARY_ROLES),
+            models.User.is_verified.is_(True)
+        )
+        .order_by(models.User.id)
+        .all()
+    )
+    candidates = []
+    for user_id, priority, received in rows:
+        cap = beneficiary_selector.max_coupons_for_priority(priority)
+        if received < cap:
+            candidates.append((user_id, priority, received, cap))
+    return candidates
+
+
+def _owned_types(db: Session, coupon_type_ids) -> dict:
+    """{coupon_type_id: {user_id, ...}} - bu tiplerden zaten kuponu olanlar"""
+    owned = defaultdict(set)
+    rows = (
+        db.query(models.Coupon.coupon_type_id, models.Coupon.beneficiary_id)
+        .filter(
+            models.Coupon.coupon_type_id.in_(coupon_type_ids),
+            models.Coupon.beneficiary_id.isnot(None),
+            models.Coupon.status.in_(coupon_state.HELD_STATUSES)
+        )
+        .distinct()
+    )
+    for coupon_type_id, user_id in rows:
+        owned[coupon_type_id].add(user_id)
+    return owned
+
+
+def _match_numpy(coupons: dict, candidates, owned: dict) -> list:
+    user_ids = np.array([c[0] for c in candidates], dtype=np.int64)
+    priority = np.array([c[1] for c in candidates], dtype=np.int64)
+    received = np.array([c[2] for c in candidates], dtype=np.int64)
+    remaining = np.array([c[3] - c[2] for c in candidates], dtype=np.int64)
+    index_of = {user_id: i for i, user_id in enumerate(user_ids.tolist())}
+
+    # lexsort son anahtara göre önce sıralar: -priority, sonra received, sonra user_id
+    order = np.lexsort((user_ids, received, -priority))
+
+    pairs = []
+    for coupon_type_id in sorted(coupons):
+        coupon_ids = coupons[coupon_type_id]
+        eligible = remaining > 0
+        blocked = [index_of[u] for u in owned.get(coupon_type_id, ()) if u in index_of]
+        if blocked:
+            eligible[blocked] = False
+
+        chosen = order[eligible[order]][:len(coupon_ids)]
+        if chosen.size == 0:
+            continue
+
+        remaining[chosen] -= 1
+        pairs.extend(zip(coupon_ids, user_ids[chosen].tolist()))
+    return pairs
+
+
+def _match_python(coupons: dict, candidates, owned: dict) -> list:
+    user_ids = [c[0] for c in candidates]
+    remaining = [c[3] - c[2] for c in candidates]
+    order = sorted(range(len(candidates)), key=lambda i: (-candidates[i][1], candidates[i][2], user_ids[i]))
+
+    pairs = []
+    for coupon_type_id in sorted(coupons):
+        coupon_ids = coupons[coupon_type_id]
+        blocked = owned.get(coupon_type_id, set())
+        eligible = (i for i in order if remaining[i] > 0 and user_ids[i] not in blocked)
+
+        for coupon_id, i in zip(coupon_ids, eligible):
+            remaining[i] -= 1
+            pairs.append((coupon_id, user_ids[i]))
+    return pairs
+
+
+def match(coupons: dict, candidates, owned: dict) -> list:
+    """[(coupon_id, user_id), ...] eşleşmeleri (veritabanına dokunmaz)"""
+    if not coupons or not candidates:
+        return []
+    if np is not None:
+        return _match_numpy(coupons, candidates, owned)
+    return _match_python(coupons, candidates, owned)
+
+
+def allocate(db: Session, coupon_type_ids=None, dry_run: bool = False, commit: bool = True):
+    """
+    Atanmamış kuponları uygun ihtiyaç sahiplerine dağıtır.
+    Yazma hattında çalıştırılmalı (commit=False ile çağrılır).
+    """
+    coupons = _unassigned_coupons(db, coupon_type_ids)
+    unassigned = sum(len(ids) for ids in coupons.values())
+    candidates = _candidates(db) if coupons else []
+    owned = _owned_types(db, list(coupons)) if candidates else {}
+
+    pairs = match(coupons, candidates, owned)
+    per_user = Counter(user_id for _, user_id in pairs)
+
+    if pairs and not dry_run:
+        table = models.Coupon.__table__
+        result = db.execute(
+            update(table)
+            .where(
+                table.c.id == bindparam("cid"),
+                table.c.status == "created",
+                table.c.beneficiary_id.is_(None)
+            )
+            .values(beneficiary_id=bindparam("uid"), status="assigned"),
+            [{"cid": coupon_id, "uid": user_id} for coupon_id, user_id in pairs]
+        )
+        if result.rowcount != len(pairs):
+            if commit:
+                db.rollback()
+            return {"status": "error", "message": "Kuponlar dağıtım sırasında değişti, tekrar deneyin"}
+
+        # Limit SQL'de tekrar kontrol edilir (başka bir worker bu arada kupon atadıysa savepoint geri alınır)
+        if logic.reserve_coupon_quota(db, per_user) != set(per_user):
+            if commit:
+                db.rollback()
+            return {"status": "error", "message": "İhtiyaç sahiplerinin kupon limitleri dağıtım sırasında değişti, tekrar deneyin"}
+        stats.coupon_status_changed(db, "created", "assigned", count=len(pairs))
+        showcase.mark_dirty(db)
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+
+    return {
+        "status": "success",
+        "dry_run": dry_run,
+        "engine": "numpy" if np is not None else "python",
+        "unassigned_coupons": unassigned,
+        "eligible_beneficiaries": len(candidates),
+        "assigned": len(pairs),
+        "beneficiaries_served": len(per_user),
+        "remaining_unassigned": unassigned - len(pairs),
+        "assignments_by_type": _by_type(coupons, pairs)
+    }
+
+
+def _by_type(coupons: dict, pairs) -> dict:
+    type_of = {coupon_id: coupon_type_id for coupon_type_id, ids in coupons.items() for coupon_id in ids}
+    return dict(Counter(type_of[coupon_id] for coupon_id, _ in pairs))
@@ -0,0 +1,132 @@
+"""
+Otomatik bağış zamanlayıcısı.
+
+Kurallar next_run_at'e göre bir min-heap'te tutulur. Heap, (is_active, next_run_at)
+indeksi üzerinden sadece önümüzdeki LOOKAHEAD süresinde vakti gelecek kurallarla
+doldurulur; her tick'te tablo taranmaz. Vakti gelen kurallar CHUNK_SIZE'lık parçalar
+halinde yazma hattı üzerinden logic.run_auto_donations (toplu bağış) ile çalıştırılır.
+"""
+
+import heapq
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from app import models, logic
+from app.database import SessionLocal
+from app.write_pipeline import pipeline as write_pipeline
+
+logger = logging.getLogger(__name__)
+
+# AUTO_DONATION_SCHEDULER=0 ile arka plan thread'i kapatılabilir (/auto-donations/run yine çalışır)
+ENABLED = os.getenv("AUTO_DONATION_SCHEDULER", "1") != "0"
+
+TICK_SECONDS = 30
+LOOKAHEAD = timedelta(minutes=10)
+CHUNK_SIZE = 500
+# Heap'e tek seferde yüklenecek en fazla kural
+MAX_HEAP_SIZE = 100000
+
+
+class AutoDonationScheduler:
+    def __init__(self, tick_seconds: float = TICK_SECONDS, lookahead: timedelta = LOOKAHEAD,
+                 chunk_size: int = CHUNK_SIZE):
+        self.tick_seconds = tick_seconds
+        self.lookahead = lookahead
+        self.chunk_size = chunk_size
+        self._heap = []  # (next_run_at, rule_id)
+        self._queued = set()
+        self._loaded_until = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def notify(self, rule_id: int, next_run_at: datetime):
+        """Yeni/yeniden zamanlanan kural; bakış penceresi içindeyse heap'e eklenir."""
+        with self._lock:
+            self._push(rule_id, next_run_at)
+
+    def _push(self, rule_id, next_run_at):
+        if next_run_at is None or rule_id in self._queued:
+            return
+        if self._loaded_until is not None and next_run_at > self._loaded_until:
+            return  # Pencere dışında; sonraki doldurmada gelir
+        heapq.heappush(self._heap, (next_run_at, rule_id))
+        self._queued.add(rule_id)
+
+    def _refill(self, now: datetime):
+        horizon = now + self.lookahead
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(models.AutoDonation.id, models.AutoDonation.next_run_at)
+                .filter(
+                    models.AutoDonation.is_active.is_(True),
+                    models.AutoDonation.next_run_at <= horizon
+                )
+                .order_by(models.AutoDonation.next_run_at)
+                .limit(MAX_HEAP_SIZE)
+                .all()
+            )
+        finally:
+            db.close()
+
+        self._loaded_until = horizon if len(rows) < MAX_HEAP_SIZE else rows[-1].next_run_at
+        for rule_id, next_run_at in rows:
+            self._push(rule_id, next_run_at)
+
+    def _pop_due(self, now: datetime, refill: bool):
+        with self._lock:
+            if refill or self._loaded_until is None or now >= self._loaded_until:
+                self._refill(now)
+
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                _, rule_id = heapq.heappop(self._heap)
+                self._queued.discard(rule_id)
+                due.append(rule_id)
+            return due
+
+    def run_due(self, now: datetime = None, refill: bool = False):
+        """Vakti gelen kuralları parça parça çalıştırır ve kural başına sonuçları döner."""
+        now = now or datetime.utcnow()
+        due = self._pop_due(now, refill)
+
+        results = []
+        created_coupons_count = 0
+        for start in range(0, len(due), self.chunk_size):
+            chunk = due[start:start + self.chunk_size]
+            outcome = write_pipeline.run(logic.run_auto_donations, now, chunk, len(chunk))
+
+            if outcome["status"] == "error":
+                # Parça geri alındı; kurallar bir sonraki tick'te tekrar denenir
+                for rule_id in chunk:
+                    self.notify(rule_id, now)
+                continue
+
+            created_coupons_count += outcome.get("created_coupons_count", 0)
+            for item in outcome["results"]:
+                self.notify(item["rule_id"], datetime.fromisoformat(item["next_run_at"]))
+            results.extend(outcome["results"])
+
+        return {"status": "success", "created_coupons_count": created_coupons_count, "results": results}
+
+    def _loop(self):
+        while not self._stop.wait(self.tick_seconds):
+            try:
+                self.run_due()
+            except Exception:
+                logger.exception("Otomatik bağış zamanlayıcısı hatası")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="auto-donation-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+scheduler = AutoDonationScheduler()
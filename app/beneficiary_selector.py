@@ -0,0 +1,138 @@
+"""
+İhtiyaç sahibi seçim motoru.
+
+Doğrulanmış ihtiyaç sahipleri bellekte bir öncelik kuyruğunda (heap) tutulur.
+Sıralama: önce priority (yüksek), sonra alınan kupon sayısı (az), sonra son seçilme sırası.
+Böylece aynı öncelik katmanındakiler sırayla kupon alır, priority'ye göre kupon limiti
+(3/5/10) dolan kişi kuyruktan çıkar. k kişilik seçim O(k log n) sürer.
+
+Kuyruk sadece sıralama içindir, limitin kendisi değildir: her worker'ın kendi kuyruğu
+olduğundan limit atama sırasında SQL'de (received_coupon_count < limit koşuluyla) uygulanır,
+bkz. logic.reserve_coupon_quota. Seçim yapılan transaction geri alınırsa (savepoint dahil)
+kuyruk geçersiz sayılır ve bir sonraki seçimde veritabanından yeniden yüklenir.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from sqlalchemy import case, event
+from sqlalchemy.orm import Session
+
+from app import models
+
+BENEFICIARY_ROLES = ["beneficiary", "both"]
+
+# Kuyruk bu süreden eski ise veritabanından yeniden yüklenir (diğer worker'ların atamaları için)
+REFRESH_SECONDS = 60
+
+# Session.info anahtarı: bu transaction'da kuyruktan seçim yapıldı
+_PICKED_KEY = "beneficiary_selector_picked"
+
+
+def max_coupons_for_priority(priority: int) -> int:
+    """Priority 0-30: 3 kupon, 31-60: 5 kupon, 61-100: 10 kupon"""
+    if priority >= 61:
+        return 10
+    if priority >= 31:
+        return 5
+    return 3
+
+
+def max_coupons_sql(priority):
+    """max_coupons_for_priority'nin SQL karşılığı (koşullu UPDATE'lerde limit için)"""
+    return case((priority >= 61, 10), (priority >= 31, 5), else_=3)
+
+
+class BeneficiarySelector:
+    def __init__(self, refresh_seconds: float = REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._loaded_at = None
+
+    def invalidate(self):
+        """Kullanıcı rolü/önceliği/doğrulaması değişince çağrılır; bir sonraki seçimde yeniden yüklenir."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def _load(self, db: Session):
+        # ix_users_role_verified_priority indeksi ile taranır; alınan kupon sayısı sayaç sütunundan gelir
+        rows = (
+            db.query(
+                models.User.id,
+                models.User.priority,
+                models.User.received_coupon_count
+            )
+            .filter(
+                models.User.role.in_(BENEFICIARY_ROLES),
+                models.User.is_verified.is_(True)
+            )
+            .all()
+        )
+
+        heap = [
+            (-priority, count, next(self._seq), user_id)
+            for user_id, priority, count in rows
+            if count < max_coupons_for_priority(priority)
+        ]
+        heapq.heapify(heap)
+        self._heap = heap
+        self._loaded_at = time.monotonic()
+
+    def pick(self, db: Session, count: int, exclude=()):
+        """
+        En fazla `count` farklı ihtiyaç sahibi ID'si döner (bir kupon tipi için: kişi başı tek kupon).
+        exclude'daki kullanıcılar (bu tipten kuponu olanlar) atlanır ve kuyruktaki yerlerini korur.
+        Uygun kimse kalmazsa liste kısa döner.
+        """
+        with self._lock:
+            if self._is_stale():
+                self._load(db)
+
+            # Transaction geri alınırsa kuyruk ilerlemiş kalmasın (_on_rollback)
+            db.info[_PICKED_KEY] = True
+            picked = []
+            # Seçilenler bu çağrıda tekrar seçilmesin diye kuyruğa döngüden sonra geri konur
+            put_back = []
+            while len(picked) < count and self._heap:
+                entry = heapq.heappop(self._heap)
+                neg_priority, received, _, user_id = entry
+                if user_id in exclude:
+                    put_back.append(entry)
+                    continue
+                picked.append(user_id)
+                received += 1
+                if received < max_coupons_for_priority(-neg_priority):
+                    put_back.append((neg_priority, received, next(self._seq), user_id))
+            for entry in put_back:
+                heapq.heappush(self._heap, entry)
+            return picked
+
+
+selector = BeneficiarySelector()
+
+
+# Seçim yapılan transaction commit edilmeden biterse kuyruk veritabanıyla uyumsuz kalır
+@event.listens_for(Session, "after_rollback")
+def _on_rollback(session):
+    if session.info.pop(_PICKED_KEY, False):
+        selector.invalidate()
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session):
+    if not session.in_nested_transaction():
+        session.info.pop(_PICKED_KEY, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _on_transaction_end(session, transaction):
+    # Commit/rollback olmadan kapatılan session (close) da geri almadır
+    if transaction.parent is None and session.info.pop(_PICKED_KEY, False):
+        selector.invalidate()
@@ -0,0 +1,127 @@
+"""
+İçerik adresli belge deposu.
+
+Belgeler (e-Devlet / SGK evrakları) veritabanında base64 olarak değil, diskte
+SHA-256 özetleriyle saklanır: BLOB_DIR/ab/cd/abcd...  Satırda sadece özet tutulur.
+Aynı içerik ikinci kez yüklenirse yeniden yazılmaz (tekilleştirme).
+
+Yazma önce BLOB_DIR/tmp altına yapılır, sonra os.replace ile yerine taşınır;
+yarım yazılmış dosya hiçbir zaman bir özetin altında görünmez.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+
+BLOB_DIR = os.getenv("BLOB_DIR", "./blobs")
+
+# Tek belge için üst sınır (bayt)
+MAX_DOCUMENT_SIZE = 20 * 1024 * 1024
+
+CHUNK_SIZE = 1024 * 1024
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# İlk baytlara göre içerik tipi (uzantı/MIME bilgisi saklanmaz)
+_MAGIC_TYPES = [
+    (b"%PDF", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+class DocumentTooLarge(ValueError):
+    pass
+
+
+class InvalidDocument(ValueError):
+    pass
+
+
+def is_valid_sha256(sha256: str) -> bool:
+    return bool(sha256) and bool(_SHA256_RE.match(sha256))
+
+
+def path_for(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+
+def exists(sha256: str) -> bool:
+    return is_valid_sha256(sha256) and os.path.isfile(path_for(sha256))
+
+
+def content_type(sha256: str) -> str:
+    with open(path_for(sha256), "rb") as f:
+        head = f.read(16)
+    for magic, media_type in _MAGIC_TYPES:
+        if head.startswith(magic):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def put_chunks(chunks, max_size: int = MAX_DOCUMENT_SIZE) -> str:
+    """
+    Bayt parçalarını geçici dosyaya yazarken özetini hesaplar ve özeti döner.
+    max_size aşılırsa okuma o anda kesilir ve DocumentTooLarge yükselir.
+    """
+    tmp_dir = os.path.join(BLOB_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise DocumentTooLarge(f"Belge en fazla {max_size // (1024 * 1024)} MB olabilir")
+                digest.update(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if size == 0:
+            raise InvalidDocument("Boş belge yüklenemez")
+
+        sha256 = digest.hexdigest()
+        final_path = path_for(sha256)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)  # Aynı içerik zaten var
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        return sha256
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def put_bytes(data: bytes, max_size: int = MAX_DOCUMENT_SIZE) -> str:
+    return put_chunks(
+        (data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)),
+        max_size
+    )
+
+
+def decode_data_url(value: str) -> bytes:
+    """'data:application/pdf;base64,JVBERi0...' veya düz base64 metnini baytlara çevirir."""
+    if value.startswith("data:"):
+        _, _, value = value.partition(",")
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise InvalidDocument("Belge base64 formatında değil")
+
+
+def put_data_url(value: str, max_size: int = MAX_DOCUMENT_SIZE) -> str:
+    """Eski base64 (data URL) belgeyi depoya yazar ve özetini döner."""
+    return put_bytes(decode_data_url(value), max_size)
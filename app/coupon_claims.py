@@ -0,0 +1,257 @@
+"""
+Kupon tipine göre self-servis kupon alma (claim).
+
+İstemci belirli bir kupon ID'si yerine coupon_type_id gönderir. Her kupon tipi için
+bellekte bir FIFO (deque) tutulur; kuyruk boşalınca (coupon_type_id, status) indeksinden
+REFILL_SIZE kadar "created" kupon ID'si okunur. Aynı tipe aynı anda gelen istekler
+kuyruktan farklı kuponları alır, aynı satır için yarışmaz.
+
+Atamadaki uygunluk kuralları burada da geçerlidir: role beneficiary/both, is_verified ve
+priority'ye göre kupon limiti. Limit, sayaç logic.reserve_coupon_quota'nın koşullu UPDATE'i
+ile artırılarak SQL'de uygulanır; eşzamanlı claim'ler limiti aşamaz.
+
+Kupon koşullu UPDATE ile alınır: WHERE id = :id AND status = 'created' AND
+beneficiary_id IS NULL AND (kullanıcının bu tipten kuponu yok). Başka bir worker veya
+toplu dağıtım kuponu önce aldıysa etkilenen satır 0 olur ve kuyruktaki sıradaki kupon denenir.
+Alınan kuponun transaction'ı geri alınırsa (savepoint dahil) ID kuyruğun başına geri konur.
+
+reserve_seconds verilirse kupon "reserved" durumuna alınır ve reserved_until'e kadar
+/coupons/{id}/confirm ile onaylanmalıdır. Süresi dolan rezervasyonlar aynı tipe gelen
+bir sonraki claim'de (tembel olarak) tekrar "created" yapılır.
+"""
+
+import threading
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from app import beneficiary_selector, coupon_state, logic, models, showcase, stats
+
+# Kuyruk boşalınca veritabanından okunacak kupon sayısı
+REFILL_SIZE = 64
+
+MAX_RESERVATION_SECONDS = 15 * 60
+
+# Session.info anahtarı: bu transaction'da kuyruktan alınan (coupon_type_id, coupon_id) çiftleri
+_CLAIMED_KEY = "coupon_claims_claimed"
+
+
+class ClaimQueues:
+    def __init__(self, refill_size: int = REFILL_SIZE):
+        self.refill_size = refill_size
+        self._lock = threading.Lock()
+        self._queues = {}
+
+    def _refill(self, db: Session, coupon_type_id: int, queue: deque):
+        rows = (
+            db.query(models.Coupon.id)
+            .filter(
+                models.Coupon.coupon_type_id == coupon_type_id,
+                models.Coupon.status == "created",
+                models.Coupon.beneficiary_id.is_(None)
+            )
+            .order_by(models.Coupon.id)
+            .limit(self.refill_size)
+        )
+        queue.extend(coupon_id for (coupon_id,) in rows)
+
+    def next_id(self, db: Session, coupon_type_id: int):
+        """Tipin kuyruğundaki sıradaki kupon ID'si; kupon kalmadıysa None."""
+        with self._lock:
+            queue = self._queues.setdefault(coupon_type_id, deque())
+            if not queue:
+                self._refill(db, coupon_type_id, queue)
+            return queue.popleft() if queue else None
+
+    def put_back(self, claimed):
+        """Geri alınan transaction'ın kuponlarını kuyrukların başına geri koyar."""
+        with self._lock:
+            for coupon_type_id, coupon_id in reversed(claimed):
+                queue = self._queues.get(coupon_type_id)
+                if queue is not None and coupon_id not in queue:
+                    queue.appendleft(coupon_id)
+
+    def invalidate(self, coupon_type_id: int = None):
+        with self._lock:
+            if coupon_type_id is None:
+                self._queues.clear()
+            else:
+                self._queues.pop(coupon_type_id, None)
+
+
+queues = ClaimQueues()
+
+
+# Claim edilen kupon commit edilmeden geri alınırsa veritabanında tekrar "created"dır.
+# Savepoint geri alındığında aynı batch'teki diğer claim'ler de geri konabilir; commit edilmiş
+# kupon koşullu UPDATE'te reddedilir ve kuyruktaki sıradaki kupona geçilir.
+@event.listens_for(Session, "after_rollback")
+def _on_rollback(session):
+    claimed = session.info.pop(_CLAIMED_KEY, None)
+    if claimed:
+        queues.put_back(claimed)
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session):
+    if not session.in_nested_transaction():
+        session.info.pop(_CLAIMED_KEY, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _on_transaction_end(session, transaction):
+    # Commit/rollback olmadan kapatılan session (close) da geri almadır
+    if transaction.parent is None:
+        claimed = session.info.pop(_CLAIMED_KEY, None)
+        if claimed:
+            queues.put_back(claimed)
+
+
+def release_expired(db: Session, coupon_type_id: int) -> int:
+    """Süresi dolan rezervasyonları tekrar "created" yapar ve sayaçları geri alır."""
+    now = datetime.utcnow()
+    expired = dict(
+        db.query(models.Coupon.id, models.Coupon.beneficiary_id)
+        .filter(
+            models.Coupon.coupon_type_id == coupon_type_id,
+            models.Coupon.status == "reserved",
+            models.Coupon.reserved_until <= now
+        )
+        .all()
+    )
+    if not expired:
+        return 0
+
+    table = models.Coupon.__table__
+    released = db.execute(
+        update(table)
+        .where(
+            table.c.id.in_(list(expired)),
+            table.c.status == "reserved",
+            table.c.reserved_until <= now
+        )
+        .values(status="created", beneficiary_id=None, reserved_until=None)
+        .returning(table.c.id)
+    ).scalars().all()
+
+    logic.add_received_coupons(db, {
+        user_id: -count for user_id, count in Counter(expired[coupon_id] for coupon_id in released).items()
+    })
+    stats.coupon_status_changed(db, "reserved", "created", count=len(released))
+    showcase.mark_dirty(db)
+    return len(released)
+
+
+def _already_held_error():
+    return {
+        "status": "error",
+        "message": "Bu kupon tipinden zaten bir kuponunuz var. Aynı kupon tipinden sadece 1 tane alabilirsiniz."
+    }
+
+
+def _claim_row(db: Session, coupon_id: int, coupon_type_id: int, user_id: int, reserved_until) -> bool:
+    return coupon_state.transition(
+        db, coupon_id, "created", "reserved" if reserved_until else "assigned",
+        where=[
+            models.Coupon.__table__.c.beneficiary_id.is_(None),
+            ~coupon_state.held_by(user_id, coupon_type_id)
+        ],
+        beneficiary_id=user_id,
+        reserved_until=reserved_until
+    )
+
+
+def _fail(db: Session, commit: bool, error: dict) -> dict:
+    # Bu claim'in yazdıkları (sayaç, serbest bırakılan rezervasyonlar) geri alınır;
+    # commit=False ise yazma hattı op'un savepoint'ini geri alır
+    if commit:
+        db.rollback()
+    return error
+
+
+def claim(db: Session, coupon_type_id: int, beneficiary_id: int,
+          reserve_seconds: int = None, commit: bool = True):
+    """Tipin sıradaki boş kuponunu kullanıcıya atar (veya rezerve eder)."""
+    user = (
+        db.query(models.User.role, models.User.is_verified)
+        .filter(models.User.id == beneficiary_id)
+        .first()
+    )
+    if user is None:
+        return {"status": "error", "message": "İhtiyaç sahibi bulunamadı"}
+    if user.role not in beneficiary_selector.BENEFICIARY_ROLES:
+        return {"status": "error", "message": "Sadece ihtiyaç sahipleri kupon alabilir"}
+    if not user.is_verified:
+        return {"status": "error", "message": "Kupon almak için fakirlik durumunuzun onaylanması gerekir"}
+
+    # Süresi dolan rezervasyonlar (kullanıcının kendi eski rezervasyonu dahil) serbest kalsın
+    release_expired(db, coupon_type_id)
+
+    if db.query(coupon_state.held_by(beneficiary_id, coupon_type_id)).scalar():
+        return _fail(db, commit, _already_held_error())
+
+    # Limit kontrolü ve sayaç artışı tek koşullu UPDATE (reserved kuponlar da sayılır)
+    if beneficiary_id not in logic.reserve_coupon_quota(db, {beneficiary_id: 1}):
+        return _fail(db, commit, {
+            "status": "error",
+            "message": "Önceliğinize göre alabileceğiniz kupon limitine ulaştınız"
+        })
+
+    reserved_until = None
+    if reserve_seconds:
+        reserved_until = datetime.utcnow() + timedelta(seconds=reserve_seconds)
+
+    while True:
+        coupon_id = queues.next_id(db, coupon_type_id)
+        if coupon_id is None:
+            return _fail(db, commit, {"status": "error", "message": "Bu kupon tipi için mevcut kupon bulunamadı"})
+        if _claim_row(db, coupon_id, coupon_type_id, beneficiary_id, reserved_until):
+            # Transaction geri alınırsa kupon kuyruğa geri konur (_on_rollback)
+            db.info.setdefault(_CLAIMED_KEY, []).append((coupon_type_id, coupon_id))
+            break
+        # Kupon başka biri tarafından alınmış (veya kullanıcı aynı anda bu tipten almış)
+        if db.query(coupon_state.held_by(beneficiary_id, coupon_type_id)).scalar():
+            return _fail(db, commit, _already_held_error())
+
+    status = "reserved" if reserved_until else "assigned"
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+
+    return {
+        "status": "success",
+        "message": "Kupon rezerve edildi, süre dolmadan onaylayın" if reserved_until else "Kupon başarıyla alındı",
+        "coupon": {
+            "id": coupon_id,
+            "coupon_type_id": coupon_type_id,
+            "beneficiary_id": beneficiary_id,
+            "status": status,
+            "reserved_until": reserved_until.isoformat() if reserved_until else None
+        }
+    }
+
+
+def confirm(db: Session, coupon_id: int, beneficiary_id: int, commit: bool = True):
+    """Süresi dolmamış rezervasyonu "assigned" yapar."""
+    table = models.Coupon.__table__
+    confirmed = coupon_state.transition(
+        db, coupon_id, "reserved", "assigned",
+        where=[table.c.beneficiary_id == beneficiary_id, table.c.reserved_until > datetime.utcnow()],
+        reserved_until=None
+    )
+    if not confirmed:
+        return {"status": "error", "message": "Geçerli bir rezervasyon bulunamadı (süresi dolmuş olabilir)"}
+
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+
+    return {
+        "status": "success",
+        "message": "Kupon başarıyla alındı",
+        "coupon": {"id": coupon_id, "beneficiary_id": beneficiary_id, "status": "assigned"}
+    }
@@ -0,0 +1,87 @@
+"""
+Kupon yaşam döngüsü (durum makinesi).
+
+created → assigned → used. Self-servis claim'de created → reserved → assigned;
+süresi dolan rezervasyon reserved → created olur. Atanmamış kupon doğrudan kullanılabilir
+(created → used).
+
+Her geçiş tek bir koşullu UPDATE'tir:
+    UPDATE coupons SET status = :new ... WHERE id = :id AND status = :expected
+Kuponu Python'da okuyup sonra yazan iki eşzamanlı istekten sadece biri 1 satır etkiler;
+diğeri 0 döner ve hiçbir yan etki (bakiye, kazanç, istatistik) uygulanmaz.
+Böylece birden çok uvicorn worker'ı çalışırken de aynı kupon iki kez ödenmez.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import exists, update
+from sqlalchemy.orm import Session, aliased
+
+from app import models, showcase, stats
+
+ALLOWED_TRANSITIONS = {
+    "created": {"reserved", "assigned", "used"},
+    "reserved": {"created", "assigned"},
+    "assigned": {"used"},
+    "used": set(),
+}
+
+# Kullanıcının bu tipten kuponu var sayılan durumlar (tip başına 1 kupon kuralı)
+HELD_STATUSES = ["reserved", "assigned", "used"]
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def can_transition(old_status: str, new_status: str) -> bool:
+    return new_status in ALLOWED_TRANSITIONS.get(old_status, ())
+
+
+def sources(new_status: str) -> list:
+    """new_status'e geçilebilen durumlar (toplu koşullu UPDATE'ler için: status IN (...))"""
+    return [old for old, targets in ALLOWED_TRANSITIONS.items() if new_status in targets]
+
+
+def held_by(user_id: int, coupon_type_id: int):
+    """Kullanıcının bu tipten kuponu var mı (UPDATE koşulu veya SELECT EXISTS olarak kullanılır)"""
+    held = aliased(models.Coupon)
+    return exists().where(
+        held.coupon_type_id == coupon_type_id,
+        held.beneficiary_id == user_id,
+        held.status.in_(HELD_STATUSES)
+    )
+
+
+def transition(db: Session, coupon_id: int, expected: str, new_status: str, where=(), **values) -> bool:
+    """
+    Kuponu expected durumundan new_status'e geçirir; values diğer sütunlardır (beneficiary_id, used_at ...).
+    where ek koşullardır. Satır değiştiyse (başka istek önce davrandıysa) False döner ve hiçbir şey yazılmaz.
+    Commit etmez.
+    """
+    if not can_transition(expected, new_status):
+        raise InvalidTransition(f"Kupon {expected} durumundan {new_status} durumuna geçemez")
+
+    table = models.Coupon.__table__
+    result = db.execute(
+        update(table)
+        .where(table.c.id == coupon_id, table.c.status == expected, *where)
+        .values(status=new_status, **values)
+    )
+    if result.rowcount != 1:
+        return False
+
+    stats.coupon_status_changed(db, expected, new_status)
+    showcase.mark_dirty(db)
+    return True
+
+
+def mark_backflow(db: Session, coupon_id: int) -> bool:
+    """Kullanılmış kupon için işletme geri akışını bir kez işaretler (backflow_at IS NULL koşulu)."""
+    table = models.Coupon.__table__
+    result = db.execute(
+        update(table)
+        .where(table.c.id == coupon_id, table.c.status == "used", table.c.backflow_at.is_(None))
+        .values(backflow_at=datetime.utcnow())
+    )
+    return result.rowcount == 1
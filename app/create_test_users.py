@@ -42,7 +42,7 @@ def create_test_users():
         for user_data in test_users:
             # Kullanıcı var mı kontrol et
             existing_user = db.query(models.User).filter(
-                models.User.name == user_data["name"]
+                models.User.name_normalized == models.normalize_name(user_data["name"])
             ).first()
             
             # company_name'i ayır (User modelinde yok, Merchant modelinde var)
@@ -1,21 +1,52 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///./donation.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}  # SQLite için gerekli
-)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base = declarative_base()
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close() 
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./donation.db"
+
+# Session.connection(execution_options={BEGIN_MODE_OPTION: "IMMEDIATE"}) ile transaction modu
+BEGIN_MODE_OPTION = "sqlite_begin_mode"
+
+
+def configure_sqlite(engine):
+    """
+    pysqlite transaction yönetimini SQLAlchemy'ye bırakır (SQLAlchemy'nin belgelenmiş tarifi).
+    pysqlite kendiliğinden BEGIN göndermez; bu olmadan begin_nested() SAVEPOINT'i en dış
+    transaction olur ve her RELEASE işlemi tek başına commit eder (yazma hattının grup commit'i bozulur).
+    """
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # pysqlite'ın kendi BEGIN/COMMIT davranışını kapat
+        dbapi_connection.isolation_level = None
+        # WAL: okuyucular yazıcıyı beklemez; busy_timeout: kilit varsa hemen "database is locked" verme
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        # Yazma hattı yazıcı kilidini baştan alır (BEGIN IMMEDIATE): okuduğu anlık görüntü
+        # yazmaya geçerken başka bir commit yüzünden geçersiz olmaz
+        mode = conn.get_execution_options().get(BEGIN_MODE_OPTION)
+        conn.exec_driver_sql(f"BEGIN {mode}" if mode else "BEGIN")
+
+    return engine
+
+
+engine = configure_sqlite(create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "isolation_level": None}  # SQLite için gerekli
+))
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base = declarative_base()
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,74 @@
+"""
+Seyrek alan kümeleri: ?fields=id,amount,created_at
+
+fields verildiğinde endpoint hem SQL projeksiyonunu (load_only / sadece gereken
+sütunlar ve join'ler) hem de JSON çıktısını istenen alanlarla sınırlar.
+fields verilmezse yanıt eskisiyle birebir aynıdır.
+
+Hesaplanan alanlar (progress, user_name ...) `depends` sözlüğüyle ihtiyaç duydukları
+sütunlara açılır; istenmeyen sütunlar veritabanından hiç okunmaz.
+"""
+
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import load_only
+
+FIELDS_DESCRIPTION = "Virgülle ayrılmış alan listesi (örn. id,amount,created_at); verilmezse tüm alanlar döner"
+
+
+def column_names(model) -> list:
+    return [attr.key for attr in model.__mapper__.column_attrs]
+
+
+def parse(fields: Optional[str], allowed) -> Optional[list]:
+    """
+    'id,amount' → ['id', 'amount'] (sıra korunur, tekrarlar atılır).
+    fields yoksa None döner; bilinmeyen alan 400 hatası verir.
+    """
+    if fields is None:
+        return None
+
+    allowed = list(allowed)
+    selected = []
+    for name in fields.split(","):
+        name = name.strip()
+        if not name or name in selected:
+            continue
+        if name not in allowed:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Bilinmeyen alan: {name} (geçerli alanlar: {', '.join(allowed)})"
+            )
+        selected.append(name)
+
+    if not selected:
+        raise HTTPException(status_code=400, detail="fields en az bir alan içermeli")
+    return selected
+
+
+def required(selected, depends: dict = None) -> list:
+    """Seçili alanların okunması gereken sütun/ifade adları (hesaplananlar depends ile açılır)."""
+    depends = depends or {}
+    names = []
+    for name in selected:
+        for dependency in depends.get(name, [name]):
+            if dependency not in names:
+                names.append(dependency)
+    return names
+
+
+def load_only_option(model, selected, depends: dict = None, always=("id",)):
+    """ORM sorgusu için load_only; always sıralama/cursor sütunları içindir."""
+    columns = set(column_names(model))
+    names = [name for name in required([*always, *selected], depends) if name in columns]
+    return load_only(*[getattr(model, name) for name in names])
+
+
+def render(obj, getters: dict, selected=None) -> dict:
+    """getters: alan adı → değer fonksiyonu. selected None ise tüm alanlar."""
+    return {name: getters[name](obj) for name in (selected or getters)}
+
+
+def model_dict(obj, selected) -> dict:
+    return {name: getattr(obj, name) for name in selected}
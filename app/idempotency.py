@@ -0,0 +1,162 @@
+"""
+Idempotency-Key desteği (para hareketi endpoint'leri).
+
+Frontend ağ hatasında isteği tekrar gönderir, çift tıklama da aynı bağışı iki kez yapar.
+İstemci her işlem için bir Idempotency-Key header'ı gönderirse ilk başarılı yanıt
+idempotency_keys tablosuna (endpoint, key) benzersiz indeksiyle, işlemin kendisiyle
+aynı transaction içinde yazılır. Tekrar denemede bakiye ve havuzlara dokunulmadan
+kayıtlı yanıt döner. Son yanıtlar ayrıca süreç içi bir LRU'da tutulur.
+
+Yanıtla birlikte isteğin parmak izi (argümanların SHA-256'sı) ve isteği yapan kullanıcı
+saklanır. Aynı anahtar farklı bir gövde veya farklı bir kullanıcı ile tekrar gelirse
+başkasının yanıtı dönmez, 422 hatası verilir.
+
+Aynı yeni anahtarla iki worker yarışırsa ikincisinin kaydı benzersiz indekse takılır;
+işlemi geri alınır ve kazananın kayıtlı yanıtı döner.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.write_pipeline import pipeline as write_pipeline
+
+# Bellekte tutulacak en fazla yanıt sayısı
+LRU_SIZE = 10000
+
+
+class ResponseLRU:
+    def __init__(self, max_size: int = LRU_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self._lock:
+            value = self._items.get(cache_key)
+            if value is not None:
+                self._items.move_to_end(cache_key)
+            return value
+
+    def put(self, cache_key, value):
+        with self._lock:
+            self._items[cache_key] = value
+            self._items.move_to_end(cache_key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+# (endpoint, key) → (request_hash, user_id, yanıt JSON)
+recent_responses = ResponseLRU()
+
+
+def _is_success(result) -> bool:
+    return not (isinstance(result, dict) and result.get("status") == "error")
+
+
+def _default(value):
+    # Pydantic istek modelleri alanlarıyla parmak izine girer
+    if hasattr(value, "dict"):
+        return value.dict()
+    return str(value)
+
+
+def fingerprint(args, kwargs) -> str:
+    """İşleme verilen argümanların SHA-256 özeti (aynı istek → aynı özet)."""
+    payload = json.dumps([list(args), kwargs], sort_keys=True, default=_default)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(stored, request_hash: str, user_id):
+    """Kayıtlı yanıtı döner; anahtar başka bir istek için kullanılmışsa 422."""
+    stored_hash, stored_user_id, response = stored
+    # Parmak izi sütunundan önceki kayıtlarda karşılaştırılacak değer yok
+    if stored_hash is not None and (stored_hash != request_hash or stored_user_id != user_id):
+        raise HTTPException(
+            status_code=422,
+            detail="Bu Idempotency-Key farklı bir istek için kullanılmış, yeni bir anahtar gönderin"
+        )
+    return json.loads(response)
+
+
+def lookup(db: Session, endpoint: str, key: str):
+    """Kayıtlı (request_hash, user_id, yanıt) üçlüsünü döner (önce LRU, sonra indeksli tablo); yoksa None."""
+    cached = recent_responses.get((endpoint, key))
+    if cached is not None:
+        return cached
+
+    row = (
+        db.query(models.IdempotencyKey.request_hash, models.IdempotencyKey.user_id, models.IdempotencyKey.response)
+        .filter(models.IdempotencyKey.endpoint == endpoint, models.IdempotencyKey.key == key)
+        .first()
+    )
+    if row is None:
+        return None
+    stored = (row.request_hash, row.user_id, row.response)
+    recent_responses.put((endpoint, key), stored)
+    return stored
+
+
+def run_once(db: Session, endpoint: str, key: str, fn, *args, user_id: int = None,
+             commit: bool = True, **kwargs):
+    """
+    Anahtar daha önce işlendiyse kayıtlı yanıtı döner; işlenmediyse fn'i çalıştırır ve
+    başarılı yanıtı aynı transaction içinde saklar (commit'i fn veya yazma hattı yapar).
+    user_id isteği yapan kullanıcıdır (fn'e geçmez).
+    """
+    request_hash = fingerprint(args, kwargs)
+    stored = lookup(db, endpoint, key)
+    if stored is not None:
+        return _replay(stored, request_hash, user_id)
+
+    savepoint = db.begin_nested()
+    try:
+        result = fn(db, *args, commit=False, **kwargs)
+        if _is_success(result):
+            db.add(models.IdempotencyKey(
+                endpoint=endpoint,
+                key=key,
+                user_id=user_id,
+                request_hash=request_hash,
+                response=json.dumps(result, default=str)
+            ))
+            db.flush()
+    except IntegrityError:
+        # Başka bir worker aynı anahtarı önce yazdı: bu işlem geri alınır, onun yanıtı döner
+        savepoint.rollback()
+        stored = lookup(db, endpoint, key)
+        if stored is None:
+            raise
+        return _replay(stored, request_hash, user_id)
+    savepoint.commit()
+
+    if commit:
+        db.commit()
+    return result
+
+
+def execute(endpoint: str, key, fn, *args, user_id: int = None, **kwargs):
+    """
+    Yazma işlemini yazma hattında çalıştırır.
+    key (Idempotency-Key) verilmişse işlem en fazla bir kez uygulanır; user_id isteği
+    yapan kullanıcıdır ve anahtar sadece aynı kullanıcının aynı isteği için tekrar oynatılır.
+    """
+    if not key:
+        return write_pipeline.run(fn, *args, **kwargs)
+
+    cached = recent_responses.get((endpoint, key))
+    if cached is not None:
+        return _replay(cached, fingerprint(args, kwargs), user_id)
+
+    result = write_pipeline.run(run_once, endpoint, key, fn, *args, user_id=user_id, **kwargs)
+    if _is_success(result):
+        recent_responses.put(
+            (endpoint, key), (fingerprint(args, kwargs), user_id, json.dumps(result, default=str))
+        )
+    return result
@@ -0,0 +1,146 @@
+"""
+Birleşik para akışı defteri (/money-flows).
+
+Kaynaklar: money_flows kayıtları ve kupon bağışları (donations, coupon_type_id dolu).
+Her kaynak kendi (user_id, created_at) / (created_at) indeksi üzerinden, join'li tek
+sorguyla en fazla `limit` satır okur; satırlar (created_at, id) azalan sırada heapq.merge
+ile birleştirilir ve ilk `limit` tanesi döner.
+
+Cursor kaynak başına son verilen satırın konumunu tutar; sonraki sayfa her kaynakta
+kaldığı yerden devam eder.
+"""
+
+import heapq
+
+from sqlalchemy.orm import Session
+
+from app import models, pagination
+
+MONEY_FLOW = "mf"
+COUPON_DONATION = "don"
+
+
+def _money_flows(db: Session, user_id):
+    query = (
+        db.query(
+            models.MoneyFlow.id,
+            models.MoneyFlow.user_id,
+            models.MoneyFlow.transaction_type,
+            models.MoneyFlow.amount,
+            models.MoneyFlow.balance_before,
+            models.MoneyFlow.balance_after,
+            models.MoneyFlow.description,
+            models.MoneyFlow.created_at,
+            pagination.sort_column(models.MoneyFlow.created_at).label("sort_created_at"),
+            models.User.name.label("user_name")
+        )
+        .outerjoin(models.User, models.User.id == models.MoneyFlow.user_id)
+    )
+    if user_id:
+        query = query.filter(models.MoneyFlow.user_id == user_id)
+    return query, [models.MoneyFlow.created_at, models.MoneyFlow.id]
+
+
+def _money_flow_dict(row):
+    return {
+        "id": f"mf_{row.id}",
+        "user_id": row.user_id,
+        "user_name": row.user_name,
+        "transaction_type": row.transaction_type,
+        "amount": row.amount,
+        "balance_before": row.balance_before,
+        "balance_after": row.balance_after,
+        "description": row.description,
+        "created_at": row.created_at.isoformat() if row.created_at else None
+    }
+
+
+def _coupon_donations(db: Session, user_id):
+    query = (
+        db.query(
+            models.Donation.id,
+            models.Donation.user_id,
+            models.Donation.amount,
+            models.Donation.created_at,
+            pagination.sort_column(models.Donation.created_at).label("sort_created_at"),
+            models.User.name.label("user_name"),
+            models.CouponType.name.label("coupon_type_name"),
+            models.Merchant.name.label("merchant_name")
+        )
+        .outerjoin(models.User, models.User.id == models.Donation.user_id)
+        .outerjoin(models.CouponType, models.CouponType.id == models.Donation.coupon_type_id)
+        .outerjoin(models.Merchant, models.Merchant.id == models.CouponType.merchant_id)
+        .filter(models.Donation.coupon_type_id.isnot(None))
+    )
+    if user_id:
+        query = query.filter(models.Donation.user_id == user_id)
+    return query, [models.Donation.created_at, models.Donation.id]
+
+
+def _coupon_donation_dict(row):
+    return {
+        "id": f"don_{row.id}",
+        "user_id": row.user_id,
+        "user_name": row.user_name,
+        "transaction_type": "coupon_donation",
+        "amount": row.amount,
+        "balance_before": None,
+        "balance_after": None,
+        "description": f"Kupon bağışı - {row.coupon_type_name or 'Bilinmeyen'} ({row.merchant_name or 'Bilinmeyen İşletme'})",
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "coupon_type_name": row.coupon_type_name,
+        "merchant_name": row.merchant_name
+    }
+
+
+# Sıra: birleştirmede aynı created_at'te önce money_flows, sonra bağışlar
+SOURCES = [
+    (MONEY_FLOW, _money_flows, _money_flow_dict),
+    (COUPON_DONATION, _coupon_donations, _coupon_donation_dict),
+]
+
+
+def page(db: Session, user_id: int = None, after: str = None, limit: int = 100):
+    """Defterin bir sayfası: (satır sözlükleri, next_cursor)"""
+    positions = pagination.decode_token(after) if after else {}
+    if not isinstance(positions, dict):
+        positions = {}
+
+    streams = []
+    exhausted = {}
+    for rank, (name, build, to_dict) in enumerate(SOURCES):
+        query, columns = build(db, user_id)
+        if name in positions:
+            if positions[name] is None:
+                exhausted[name] = True
+                continue  # Bu kaynak önceki sayfalarda bitti
+            values = pagination.bind_values(columns, positions[name])
+            query = query.filter(pagination.after_condition(columns, values, descending=True))
+        rows = query.order_by(*[c.desc() for c in columns]).limit(limit).all()
+        exhausted[name] = len(rows) < limit
+        streams.append([((row.sort_created_at or "", -rank, row.id), name, row, to_dict) for row in rows])
+
+    merged = list(heapq.merge(*streams, key=lambda entry: entry[0], reverse=True))
+    taken = merged[:limit]
+
+    flows = []
+    last = {}
+    for _, name, row, to_dict in taken:
+        flows.append(to_dict(row))
+        last[name] = [row.sort_created_at, row.id]
+
+    # Sayfada kalmayan satırlar veya dolu okunan kaynaklar varsa devam sayfası vardır
+    has_more = len(merged) > limit or not all(exhausted.values())
+    if not has_more:
+        return flows, None
+
+    next_positions = {}
+    leftover = {name for _, name, _, _ in merged[limit:]}
+    for name, _, _ in SOURCES:
+        if name in last:
+            next_positions[name] = last[name]
+        elif name in positions:
+            next_positions[name] = positions[name]
+        if exhausted.get(name) and name not in leftover:
+            next_positions[name] = None
+    return flows, pagination.encode_token(next_positions)
@@ -0,0 +1,87 @@
+"""
+İstek kapsamlı toplu yükleyici (DataLoader benzeri).
+
+Liste endpoint'leri satır başına db.query(User)... yapmak yerine önce sayfadaki
+ID'leri prime() ile bildirir; ilk get() çağrısında bekleyen tüm ID'ler model başına
+tek bir IN (...) sorgusuyla okunur ve istek boyunca bellekte tutulur.
+
+Kullanım:
+    def endpoint(db: Session = Depends(get_db), loaders: Loaders = Depends(get_loaders)):
+        loaders.users.prime(a.user_id for a in applications)
+        user = loaders.users.get(application.user_id)
+"""
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import get_db
+
+# SQLite bağlı parametre sınırının altında kal
+MAX_IN_SIZE = 500
+
+
+class BatchLoader:
+    def __init__(self, db: Session, model):
+        self.db = db
+        self.model = model
+        self._cache = {}
+        self._pending = set()
+
+    def prime(self, ids):
+        """ID'leri bir sonraki toplu sorgu için biriktirir (None ve bilinenler atlanır)."""
+        for id_ in ids:
+            if id_ is not None and id_ not in self._cache:
+                self._pending.add(id_)
+
+    def _flush(self):
+        pending = list(self._pending)
+        self._pending.clear()
+        for start in range(0, len(pending), MAX_IN_SIZE):
+            chunk = pending[start:start + MAX_IN_SIZE]
+            for obj in self.db.query(self.model).filter(self.model.id.in_(chunk)):
+                self._cache[obj.id] = obj
+            for id_ in chunk:
+                self._cache.setdefault(id_, None)  # Bulunamayanlar tekrar sorgulanmasın
+
+    def get(self, id_):
+        if id_ is None:
+            return None
+        if id_ not in self._cache:
+            # Biriken diğer ID'ler de aynı sorguda gelir
+            self._pending.add(id_)
+            self._flush()
+        return self._cache[id_]
+
+    def get_many(self, ids) -> dict:
+        ids = list(ids)
+        self.prime(ids)
+        if self._pending:
+            self._flush()
+        return {id_: self._cache[id_] for id_ in ids if id_ is not None}
+
+
+class Loaders:
+    """Bir isteğe ait yükleyiciler (model başına bir tane)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._loaders = {}
+
+    def for_model(self, model) -> BatchLoader:
+        if model not in self._loaders:
+            self._loaders[model] = BatchLoader(self.db, model)
+        return self._loaders[model]
+
+    @property
+    def users(self) -> BatchLoader:
+        return self.for_model(models.User)
+
+    @property
+    def merchants(self) -> BatchLoader:
+        return self.for_model(models.Merchant)
+
+
+def get_loaders(db: Session = Depends(get_db)) -> Loaders:
+    """FastAPI dependency - aynı istek içinde tek örnek (get_db ile aynı session)."""
+    return Loaders(db)
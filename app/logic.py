@@ -1,8 +1,12 @@
-﻿from datetime import datetime, date
+﻿import os
+import threading
+from collections import Counter
+from datetime import datetime, date, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, update, select, case, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from app import models
+from app import models, beneficiary_selector, showcase, stats, loaders, coupon_state
 
 
 # ---------- Yardımcılar ----------
@@ -14,27 +18,192 @@ def _today_start_end():
     return start, end
 
 
+def _finish(db: Session, commit: bool):
+    """
+    commit=False ise (ör. yazma hattı içinde grup commit) sadece flush edilir,
+    commit'i çağıran yapar.
+    """
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+
+
 # ---------- Beneficiary Seçme ----------
 
 def assign_beneficiary(db: Session):
     """
-    En yüksek öncelikli, doğrulanmış ihtiyaç sahibini seçer.
-    role: beneficiary veya both olanlar
+    Seçim motorundan sıradaki doğrulanmış ihtiyaç sahibini alır.
+    role: beneficiary veya both olanlar, priority'ye göre kupon limiti dolmamış olanlar
     """
-    beneficiary = (
-        db.query(models.User)
-        .filter(
-            models.User.role.in_(["beneficiary", "both"]),
-            models.User.is_verified.is_(True)
-        )
-        .order_by(models.User.priority.desc())
-        .first()
+    picked = beneficiary_selector.selector.pick(db, 1)
+    if not picked:
+        return None
+    return db.query(models.User).filter(models.User.id == picked[0]).first()
+
+
+def add_received_coupons(db: Session, counts: dict):
+    """
+    counts = {user_id: adet} kadar received_coupon_count artırır (tek executemany UPDATE).
+    Kuponun beneficiary_id'si her atandığında çağrılmalı. Commit etmez.
+    """
+    params = [{"uid": user_id, "n": n} for user_id, n in counts.items() if user_id and n]
+    if not params:
+        return
+    db.execute(
+        update(models.User.__table__)
+        .where(models.User.__table__.c.id == bindparam("uid"))
+        .values(received_coupon_count=models.User.__table__.c.received_coupon_count + bindparam("n")),
+        params
     )
-    return beneficiary
+
+
+def reserve_coupon_quota(db: Session, counts: dict) -> set:
+    """
+    Seçim motorunun atamaları için received_coupon_count'u priority limiti (3/5/10) SQL'de
+    uygulanarak artırır: received_coupon_count + adet <= limit olmayan kullanıcının satırı
+    güncellenmez. Limit her worker'ın kendi kuyruğunda değil burada uygulandığından aşılamaz.
+    Sayacı artırılan (kupon verilebilecek) kullanıcı ID'lerini döner. Commit etmez.
+    """
+    counts = {user_id: n for user_id, n in counts.items() if user_id and n}
+    users = models.User.__table__
+    accepted = set()
+    user_ids = list(counts)
+    for start in range(0, len(user_ids), loaders.MAX_IN_SIZE):
+        chunk = user_ids[start:start + loaders.MAX_IN_SIZE]
+        n = case({user_id: counts[user_id] for user_id in chunk}, value=users.c.id)
+        accepted.update(db.execute(
+            update(users)
+            .where(
+                users.c.id.in_(chunk),
+                users.c.received_coupon_count + n <= beneficiary_selector.max_coupons_sql(users.c.priority)
+            )
+            .values(received_coupon_count=users.c.received_coupon_count + n)
+            .returning(users.c.id)
+        ).scalars())
+    return accepted
+
+
+# ---------- Kupon Uygunluğu ----------
+
+def coupon_eligibility(db: Session, user_ids) -> dict:
+    """
+    Kullanıcıların kupon alma uygunluğu: {user_id: {...}} (bulunamayanlar sonuçta yer almaz).
+    Sayaç sütunu sayesinde kupon tablosu taranmaz; doğrulama durumu aynı sorguda join ile gelir.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    results = {}
+    # SQLite bağlı parametre sınırının altında kal
+    for start in range(0, len(user_ids), loaders.MAX_IN_SIZE):
+        chunk = user_ids[start:start + loaders.MAX_IN_SIZE]
+        rows = (
+            db.query(
+                models.User.id,
+                models.User.name,
+                models.User.priority,
+                models.User.received_coupon_count,
+                models.PovertyVerification.verification_status
+            )
+            .outerjoin(models.PovertyVerification, models.PovertyVerification.user_id == models.User.id)
+            .filter(models.User.id.in_(chunk))
+            .all()
+        )
+        for user_id, name, priority, received, verification_status in rows:
+            is_verified = verification_status == "approved"
+            max_coupons = beneficiary_selector.max_coupons_for_priority(priority)
+            results[user_id] = {
+                "user_id": user_id,
+                "user_name": name,
+                "is_verified": is_verified,
+                "verification_status": verification_status or "none",
+                "priority": priority,
+                "received_coupons": received,
+                "max_coupons": max_coupons,
+                "can_receive": is_verified and received < max_coupons,
+                "remaining_coupons": max(0, max_coupons - received)
+            }
+    return results
 
 
 # ---------- Kupon Oluşturma ----------
 
+def mint_coupons(db: Session, coupon_type_id: int, count: int):
+    """
+    `count` adet kuponu tek bir çok satırlı INSERT ile üretir.
+    İhtiyaç sahipleri seçim motorundan tek seferde alınır, uygun kimse kalmazsa kupon "created" kalır.
+    Commit etmez; çağıranın transaction'ı içinde çalışır.
+    """
+    return mint_coupons_bulk(db, {coupon_type_id: count})
+
+
+def _type_holders(db: Session, coupon_type_id: int) -> set:
+    """Bu tipten kuponu olan (reserved/assigned/used) kullanıcılar - ix_coupons_type_status"""
+    return {
+        user_id for (user_id,) in db.query(models.Coupon.beneficiary_id).filter(
+            models.Coupon.coupon_type_id == coupon_type_id,
+            models.Coupon.status.in_(coupon_state.HELD_STATUSES),
+            models.Coupon.beneficiary_id.isnot(None)
+        )
+    }
+
+
+def mint_coupons_bulk(db: Session, counts: dict):
+    """
+    Birden çok kupon tipi için kupon üretir: counts = {coupon_type_id: adet}.
+    Tüm kuponlar tek INSERT ile yazılır. Commit etmez.
+    """
+    total = sum(c for c in counts.values() if c > 0)
+    if total <= 0:
+        return []
+
+    # Kupon tipi başına kişi başı en fazla 1 kupon: her tip için farklı kişiler seçilir,
+    # bu tipten zaten kuponu olanlar atlanır. Kişi bulunamayan kuponlar "created" kalır.
+    picked = {
+        coupon_type_id: beneficiary_selector.selector.pick(
+            db, count, exclude=_type_holders(db, coupon_type_id)
+        )
+        for coupon_type_id, count in counts.items() if count > 0
+    }
+    # Limit SQL'de uygulanır; başka bir worker'ın atamalarıyla limiti dolan kişinin kuponu "created" kalır
+    accepted = reserve_coupon_quota(db, Counter(u for user_ids in picked.values() for u in user_ids))
+    if any(u not in accepted for user_ids in picked.values() for u in user_ids):
+        beneficiary_selector.selector.invalidate()
+    showcase.mark_dirty(db)
+
+    rows = []
+    assigned = 0
+    for coupon_type_id, count in counts.items():
+        beneficiary_ids = [u for u in picked.get(coupon_type_id, []) if u in accepted]
+        assigned += len(beneficiary_ids)
+        for i in range(max(count, 0)):
+            beneficiary_id = beneficiary_ids[i] if i < len(beneficiary_ids) else None
+            rows.append({
+                "coupon_type_id": coupon_type_id,
+                "beneficiary_id": beneficiary_id,
+                "status": "assigned" if beneficiary_id else "created",
+            })
+
+    result = db.execute(
+        insert(models.Coupon).returning(
+            models.Coupon.id,
+            models.Coupon.coupon_type_id,
+            models.Coupon.beneficiary_id,
+            models.Coupon.status,
+            sort_by_parameter_order=True
+        ),
+        rows
+    )
+    stats.bump(db, {
+        stats.COUPONS_TOTAL: len(rows),
+        stats.coupon_status("assigned"): assigned,
+        stats.coupon_status("created"): len(rows) - assigned,
+    })
+    return [
+        {"id": r.id, "coupon_type_id": r.coupon_type_id, "beneficiary_id": r.beneficiary_id, "status": r.status}
+        for r in result
+    ]
+
+
 def create_coupon(db: Session, coupon_type_id: int):
     """
     Havuz dolduğunda kupon üretir ve uygun ihtiyaç sahibine atar.
@@ -44,92 +213,151 @@ def create_coupon(db: Session, coupon_type_id: int):
     if not coupon_type:
         return None
 
-    beneficiary = assign_beneficiary(db)
+    minted = mint_coupons(db, coupon_type_id, 1)
+    db.commit()
+
+    return db.query(models.Coupon).filter(models.Coupon.id == minted[0]["id"]).first()
+
+
+# ---------- Atomik Bakiye İşlemleri ----------
+# Bakiye Python'da okunup yazılmaz; koşullu UPDATE ile veritabanında değiştirilir.
+# Böylece birden fazla uvicorn worker'ı aynı anda çalışsa da güncelleme kaybolmaz.
 
-    coupon = models.Coupon(
-        coupon_type_id=coupon_type_id,
-        beneficiary_id=beneficiary.id if beneficiary else None,
-        status="assigned" if beneficiary else "created"
+def debit_balance(db: Session, user_id: int, amount: float) -> bool:
+    """balance = balance - :amt WHERE id = :id AND balance >= :amt → etkilenen satır 1 ise başarılı"""
+    updated = (
+        db.query(models.User)
+        .filter(models.User.id == user_id, models.User.balance >= amount)
+        .update({models.User.balance: models.User.balance - amount}, synchronize_session=False)
     )
+    if updated == 1:
+        stats.bump(db, {stats.USERS_BALANCE: -amount})
+    return updated == 1
 
-    db.add(coupon)
-    db.commit()
-    db.refresh(coupon)
 
-    return coupon
+def credit_balance(db: Session, user_id: int, amount: float) -> bool:
+    """balance = balance + :amt WHERE id = :id → etkilenen satır 1 ise başarılı"""
+    updated = (
+        db.query(models.User)
+        .filter(models.User.id == user_id)
+        .update({models.User.balance: models.User.balance + amount}, synchronize_session=False)
+    )
+    if updated == 1:
+        stats.bump(db, {stats.USERS_BALANCE: amount})
+    return updated == 1
+
+
+def get_balance(db: Session, user_id: int):
+    return db.query(models.User.balance).filter(models.User.id == user_id).scalar()
+
+
+def _debit_error(db: Session, user_id: int):
+    """Başarısız düşümün nedenini bulur: kullanıcı yok mu, bakiye mi yetersiz?"""
+    exists = db.query(models.User.id).filter(models.User.id == user_id).first()
+    if not exists:
+        return {"status": "error", "message": "Kullanıcı bulunamadı"}
+    return {"status": "error", "message": "Yetersiz bakiye"}
+
+
+def _drain_pool(db: Session, pool_id: int, target_amount: float) -> int:
+    """
+    Havuzdan dolan her target_amount için bir kupon ayırır ve ayrılan kupon sayısını döner.
+    Düşüm koşullu yapılır; başka bir işlem araya girdiyse güncel bakiye ile tekrar denenir.
+    """
+    if target_amount <= 0:
+        return 0
+
+    while True:
+        current = db.query(models.Pool.current_balance).filter(models.Pool.id == pool_id).scalar()
+        count = int(current // target_amount)
+        if count == 0:
+            return 0
+
+        drained = count * target_amount
+        updated = (
+            db.query(models.Pool)
+            .filter(models.Pool.id == pool_id, models.Pool.current_balance >= drained)
+            .update({models.Pool.current_balance: models.Pool.current_balance - drained}, synchronize_session=False)
+        )
+        if updated == 1:
+            return count
+
+
+# ---------- Bakiye Yükleme ----------
+
+def topup(db: Session, user_id: int, amount: float, commit: bool = True):
+    if amount <= 0:
+        return {"status": "error", "message": "Geçersiz tutar"}
+    # balance = balance + :amt (atomik, okuma-yazma yarışı yok)
+    if not credit_balance(db, user_id, amount):
+        return {"status": "error", "message": "Kullanıcı bulunamadı"}
+    new_balance = get_balance(db, user_id)
+    _finish(db, commit)
+    return {"status": "success", "new_balance": new_balance}
 
 
 # ---------- Bağış İşlemi ----------
 
-def donate(db: Session, user_id: int, amount: float, coupon_type_id: int = 1):
+def donate(db: Session, user_id: int, amount: float, coupon_type_id: int = 1, commit: bool = True):
     """
     Bağış akışı:
-    1) Kullanıcının bakiyesini ve günlük limitini kontrol et
-    2) Bakiyeden düş
+    1) Havuzu ve kupon tipini kontrol et
+    2) Bakiyeden koşullu düş (yetersizse hiçbir şey yazılmaz)
     3) Donation kaydı oluştur
-    4) Havuzu güncelle
+    4) Havuzu atomik olarak güncelle
     5) Havuz dolduysa kupon oluştur
     """
 
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        return {"status": "error", "message": "Kullanıcı bulunamadı"}
+    if amount <= 0:
+        return {"status": "error", "message": "Geçersiz bağış tutarı"}
 
-    if user.balance < amount:
-        return {"status": "error", "message": "Yetersiz bakiye"}
+    # 1) Havuzu ve kupon tipini bul (yazmadan önce)
+    pool = db.query(models.Pool).filter(models.Pool.coupon_type_id == coupon_type_id).first()
+    if not pool:
+        return {"status": "error", "message": "Havuz bulunamadı"}
+
+    coupon_type = db.query(models.CouponType).filter(models.CouponType.id == coupon_type_id).first()
+    if not coupon_type:
+        return {"status": "error", "message": "Kupon tipi bulunamadı"}
 
     # Günlük limit kontrolü KALDIRILDI - Gönüllüler istediği kadar bağış yapabilir
     # (Kod yorum satırına alındı, limit kontrolü yapılmıyor)
 
-    # 1-2) Bakiyeden düş
-    user.balance -= amount
+    # 2) Bakiyeden düş
+    if not debit_balance(db, user_id, amount):
+        return _debit_error(db, user_id)
 
     # 3) Donation kaydı
     donation = models.Donation(
-        user_id=user.id,
+        user_id=user_id,
         amount=amount,
         coupon_type_id=coupon_type_id
     )
     db.add(donation)
+    stats.bump(db, {stats.DONATIONS_TOTAL: 1, stats.DONATIONS_AMOUNT: amount})
 
-    # 4) Havuzu bul ve güncelle
-    pool = db.query(models.Pool).filter(models.Pool.coupon_type_id == coupon_type_id).first()
-    if not pool:
-        return {"status": "error", "message": "Havuz bulunamadı"}
-
-    # Kupon tipi bilgisini al
-    coupon_type = db.query(models.CouponType).filter(models.CouponType.id == coupon_type_id).first()
-    if not coupon_type:
-        return {"status": "error", "message": "Kupon tipi bulunamadı"}
-
-    pool.current_balance += amount
-
-    created_coupons = []
-    created_count = 0
+    # 4) Havuzu güncelle
+    db.query(models.Pool).filter(models.Pool.id == pool.id).update(
+        {models.Pool.current_balance: models.Pool.current_balance + amount}, synchronize_session=False
+    )
+    showcase.mark_dirty(db)
 
     # 5) Havuz dolduysa, her target_amount için bir kupon üret
     # Örneğin: target_amount=6000, coupon_amount=1000 ise, 6 kupon oluşturulmalı
-    while pool.current_balance >= pool.target_amount:
-        pool.current_balance -= pool.target_amount
-        created_coupon = create_coupon(db, coupon_type_id)
-        if created_coupon:
-            created_coupons.append({
-                "id": created_coupon.id,
-                "beneficiary_id": created_coupon.beneficiary_id,
-                "status": created_coupon.status,
-            })
-            created_count += 1
+    # Kuponlar tek INSERT ile, bağışla aynı transaction içinde üretilir (tek commit).
+    created_count = _drain_pool(db, pool.id, pool.target_amount)
+    created_coupons = mint_coupons(db, coupon_type_id, created_count)
 
-    db.commit()
-    db.refresh(user)
-    db.refresh(pool)
+    user_balance = get_balance(db, user_id)
+    pool_current = db.query(models.Pool.current_balance).filter(models.Pool.id == pool.id).scalar()
+    _finish(db, commit)
 
     response = {
         "status": "success",
         "message": "Bağış alındı",
-        "user_balance": user.balance,
-        "donor_balance": user.balance,  # Frontend için
-        "pool_current": pool.current_balance,
+        "user_balance": user_balance,
+        "donor_balance": user_balance,  # Frontend için
+        "pool_current": pool_current,
         "created_coupons_count": created_count,
         "coupon_type_name": coupon_type.name,  # Bildirim için
         "merchant_name": coupon_type.merchant.name  # Bildirim için
@@ -142,42 +370,201 @@ def donate(db: Session, user_id: int, amount: float, coupon_type_id: int = 1):
     return response
 
 
+# ---------- Toplu Bağış ----------
+
+def donate_batch(db: Session, items: list, commit: bool = True):
+    """
+    Toplu bağış (bordro bağışları, otomatik bağışlar):
+    items = [{"user_id", "amount", "coupon_type_id"}, ...]
+
+    Kalem sayısından bağımsız, sabit sayıda SQL ifadesi çalışır:
+    1) Bakiyeler tek sorguda, havuz/kupon tipleri tek sorguda okunur
+    2) Kalemler bellekte sırayla doğrulanır (aynı kullanıcının kalemleri birikimli düşülür)
+    3) Kullanıcı başına toplam tutar koşullu UPDATE ile düşülür (executemany)
+    4) Donation kayıtları tek INSERT ile yazılır
+    5) Havuz artışları coupon_type_id başına toplanıp uygulanır
+    6) Dolan havuzların kuponları tek INSERT ile üretilir
+    """
+    users_table = models.User.__table__
+    pools_table = models.Pool.__table__
+
+    user_ids = {item["user_id"] for item in items}
+    coupon_type_ids = {item.get("coupon_type_id", 1) for item in items}
+
+    balances = dict(
+        db.query(models.User.id, models.User.balance)
+        .filter(models.User.id.in_(user_ids))
+        .all()
+    ) if user_ids else {}
+
+    pools = {
+        row.coupon_type_id: row
+        for row in (
+            db.query(
+                models.Pool.id,
+                models.Pool.coupon_type_id,
+                models.Pool.target_amount,
+                models.CouponType.name.label("coupon_type_name"),
+                models.Merchant.name.label("merchant_name")
+            )
+            .join(models.CouponType, models.CouponType.id == models.Pool.coupon_type_id)
+            .join(models.Merchant, models.Merchant.id == models.CouponType.merchant_id)
+            .filter(models.Pool.coupon_type_id.in_(coupon_type_ids))
+            .all()
+        )
+    } if coupon_type_ids else {}
+
+    results = []
+    accepted = []
+    debits = {}
+    pool_increments = {}
+
+    for index, item in enumerate(items):
+        user_id = item["user_id"]
+        amount = item["amount"]
+        coupon_type_id = item.get("coupon_type_id", 1)
+
+        if amount <= 0:
+            results.append({"index": index, "status": "error", "message": "Geçersiz bağış tutarı"})
+            continue
+        pool = pools.get(coupon_type_id)
+        if not pool:
+            results.append({"index": index, "status": "error", "message": "Havuz bulunamadı"})
+            continue
+        if user_id not in balances:
+            results.append({"index": index, "status": "error", "message": "Kullanıcı bulunamadı"})
+            continue
+        if balances[user_id] < amount:
+            results.append({"index": index, "status": "error", "message": "Yetersiz bakiye"})
+            continue
+
+        balances[user_id] -= amount
+        debits[user_id] = debits.get(user_id, 0.0) + amount
+        pool_increments[pool.id] = pool_increments.get(pool.id, 0.0) + amount
+        accepted.append((index, item))
+        results.append({"index": index, "status": "success", "message": "Bağış alındı"})
+
+    if not accepted:
+        return {"status": "success", "accepted": 0, "rejected": len(items), "total_amount": 0.0,
+                "created_coupons_count": 0, "results": results}
+
+    # 3) Kullanıcı başına toplam düşüm - biri bile tutmazsa (eşzamanlı değişiklik) batch geri alınır
+    debited = db.execute(
+        update(users_table)
+        .where(users_table.c.id == bindparam("uid"), users_table.c.balance >= bindparam("amt"))
+        .values(balance=users_table.c.balance - bindparam("amt")),
+        [{"uid": uid, "amt": amt} for uid, amt in debits.items()]
+    ).rowcount
+    if debited != len(debits):
+        if commit:
+            db.rollback()
+        return {"status": "error", "message": "Bakiyeler işlem sırasında değişti, lütfen tekrar deneyin"}
+    total_amount = sum(debits.values())
+    stats.bump(db, {
+        stats.USERS_BALANCE: -total_amount,
+        stats.DONATIONS_TOTAL: len(accepted),
+        stats.DONATIONS_AMOUNT: total_amount,
+    })
+
+    # 4) Donation kayıtları
+    donation_ids = db.execute(
+        insert(models.Donation).returning(models.Donation.id, sort_by_parameter_order=True),
+        [
+            {"user_id": item["user_id"], "amount": item["amount"], "coupon_type_id": item.get("coupon_type_id", 1)}
+            for _, item in accepted
+        ]
+    ).scalars().all()
+    for (index, _), donation_id in zip(accepted, donation_ids):
+        results[index]["donation_id"] = donation_id
+
+    # 5) Havuz artışları
+    db.execute(
+        update(pools_table)
+        .where(pools_table.c.id == bindparam("pid"))
+        .values(current_balance=pools_table.c.current_balance + bindparam("amt")),
+        [{"pid": pid, "amt": amt} for pid, amt in pool_increments.items()]
+    )
+    showcase.mark_dirty(db)
+
+    # 6) Dolan havuzlardan kupon üret
+    current = dict(
+        db.query(models.Pool.id, models.Pool.current_balance)
+        .filter(models.Pool.id.in_(pool_increments.keys()))
+        .all()
+    )
+    coupon_counts = {}
+    drains = []
+    for pool in pools.values():
+        if pool.id in current and pool.target_amount > 0:
+            count = int(current[pool.id] // pool.target_amount)
+            if count:
+                coupon_counts[pool.coupon_type_id] = count
+                drains.append({"pid": pool.id, "amt": count * pool.target_amount})
+    if drains:
+        drained = db.execute(
+            update(pools_table)
+            .where(pools_table.c.id == bindparam("pid"), pools_table.c.current_balance >= bindparam("amt"))
+            .values(current_balance=pools_table.c.current_balance - bindparam("amt")),
+            drains
+        ).rowcount
+        # Düşülmeyen havuz için kupon üretilmemeli (para havuzdan çıkmadı) - batch geri alınır
+        if drained != len(drains):
+            if commit:
+                db.rollback()
+            return {"status": "error", "message": "Havuz bakiyeleri işlem sırasında değişti, lütfen tekrar deneyin"}
+    created_coupons = mint_coupons_bulk(db, coupon_counts)
+
+    _finish(db, commit)
+
+    return {
+        "status": "success",
+        "message": f"{len(accepted)} bağış alındı",
+        "accepted": len(accepted),
+        "rejected": len(items) - len(accepted),
+        "total_amount": total_amount,
+        "created_coupons_count": len(created_coupons),
+        "coupons": created_coupons,
+        "results": results
+    }
+
+
 # ---------- Kullanıcı → Kullanıcı Transfer ----------
 
-def transfer(db: Session, sender_id: int, receiver_id: int, amount: float):
-    sender = db.query(models.User).filter(models.User.id == sender_id).first()
-    receiver = db.query(models.User).filter(models.User.id == receiver_id).first()
+def transfer(db: Session, sender_id: int, receiver_id: int, amount: float, commit: bool = True):
+    if amount <= 0:
+        return {"status": "error", "message": "Geçersiz transfer tutarı"}
 
-    if not sender or not receiver:
+    receiver = db.query(models.User.id).filter(models.User.id == receiver_id).first()
+    if not receiver:
         return {"status": "error", "message": "Kullanıcı bulunamadı"}
 
-    if sender.balance < amount:
-        return {"status": "error", "message": "Yetersiz bakiye"}
-
-    sender.balance -= amount
-    receiver.balance += amount
+    if not debit_balance(db, sender_id, amount):
+        return _debit_error(db, sender_id)
+    credit_balance(db, receiver_id, amount)
 
     transfer_rec = models.Transfer(
-        sender_id=sender.id,
-        receiver_id=receiver.id,
+        sender_id=sender_id,
+        receiver_id=receiver_id,
         amount=amount
     )
     db.add(transfer_rec)
-    db.commit()
-    db.refresh(sender)
-    db.refresh(receiver)
+    stats.bump(db, {stats.TRANSFERS_TOTAL: 1, stats.TRANSFERS_AMOUNT: amount})
+
+    sender_balance = get_balance(db, sender_id)
+    receiver_balance = get_balance(db, receiver_id)
+    _finish(db, commit)
 
     return {
         "status": "success",
         "message": "Transfer tamamlandı",
-        "sender_balance": sender.balance,
-        "receiver_balance": receiver.balance
+        "sender_balance": sender_balance,
+        "receiver_balance": receiver_balance
     }
 
 
 # ---------- İşletme Geri Bağış ----------
 
-def merchant_backflow(db: Session, coupon_id: int):
+def merchant_backflow(db: Session, coupon_id: int, commit: bool = True):
     """
     İşletmenin kupon tutarının belirli oranını havuza geri göndermesini simüle eder.
     backflow_rate: örn. %10 → 0.10
@@ -190,23 +577,179 @@ def merchant_backflow(db: Session, coupon_id: int):
     coupon_type = coupon.coupon_type
     merchant = coupon_type.merchant
     pool = coupon_type.pool
+    if not pool:
+        return {"status": "error", "message": "Kupon tipinin havuzu bulunamadı"}
+
+    # Geri akış kupon başına bir kez: backflow_at IS NULL koşullu işaretlenemezse havuza yazılmaz
+    if not coupon_state.mark_backflow(db, coupon.id):
+        if coupon.status != "used":
+            return {"status": "error", "message": "Geri akış sadece kullanılmış kuponlar için yapılabilir"}
+        return {"status": "error", "message": "Bu kupon için geri akış zaten yapılmış"}
 
     back_amount = coupon_type.amount * merchant.backflow_rate
-    pool.current_balance += back_amount
+    db.query(models.Pool).filter(models.Pool.id == pool.id).update(
+        {models.Pool.current_balance: models.Pool.current_balance + back_amount}, synchronize_session=False
+    )
+    showcase.mark_dirty(db)
 
-    db.commit()
-    db.refresh(pool)
+    _finish(db, commit)
 
     return {
         "status": "success",
         "backflow_amount": back_amount,
-        "pool_current": pool.current_balance,
+        "pool_current": db.query(models.Pool.current_balance).filter(models.Pool.id == pool.id).scalar(),
     }
 
 
+# ---------- İşletme Günlük Kazanç ----------
+
+DAILY_EARNINGS_LIMIT = 2000.0  # İşletme başına günlük kazanç limiti (TL)
+
+
+def add_merchant_earnings(db: Session, merchant_id: int, amount: float, donated_back: float, day: date = None):
+    """
+    Bugünkü (merchant_id, day) kaydına kazanç ekler - limit kontrolü ve artış tek ifadede:
+    INSERT ... ON CONFLICT (merchant_id, day) DO UPDATE ... WHERE daily_earnings + :amt <= daily_limit
+    Limit aşılırsa hiçbir şey yazılmaz ve None döner; aksi halde (daily_earnings, daily_limit) satırı.
+    """
+    if amount > DAILY_EARNINGS_LIMIT:
+        return None
+
+    table = models.MerchantDailyEarnings.__table__
+    stmt = sqlite_insert(table).values(
+        merchant_id=merchant_id,
+        day=day or date.today(),
+        date=datetime.utcnow(),
+        daily_earnings=amount,
+        daily_limit=DAILY_EARNINGS_LIMIT,
+        total_earnings=amount,
+        total_donated_back=donated_back
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.merchant_id, table.c.day],
+        set_={
+            "daily_earnings": table.c.daily_earnings + stmt.excluded.daily_earnings,
+            "total_earnings": table.c.total_earnings + stmt.excluded.total_earnings,
+            "total_donated_back": table.c.total_donated_back + stmt.excluded.total_donated_back,
+            "updated_at": func.now(),
+        },
+        where=table.c.daily_earnings + stmt.excluded.daily_earnings <= table.c.daily_limit
+    ).returning(table.c.daily_earnings, table.c.daily_limit)
+
+    return db.execute(stmt).first()
+
+
+def get_merchant_daily_earnings(db: Session, merchant_id: int, day: date = None):
+    """(merchant_id, day) benzersiz indeksi ile bugünkü kaydı getirir"""
+    return db.query(models.MerchantDailyEarnings).filter(
+        models.MerchantDailyEarnings.merchant_id == merchant_id,
+        models.MerchantDailyEarnings.day == (day or date.today())
+    ).first()
+
+
+def _daily_limit_error(db: Session, merchant_id: int):
+    daily_earning = get_merchant_daily_earnings(db, merchant_id)
+    daily_limit = daily_earning.daily_limit if daily_earning else DAILY_EARNINGS_LIMIT
+    daily_earnings = daily_earning.daily_earnings if daily_earning else 0.0
+    return {
+        "status": "error",
+        "message": f"Günlük kazanç limiti aşıldı. Limit: {daily_limit} TL, Bugünkü kazanç: {daily_earnings:.2f} TL"
+    }
+
+
+# ---------- İhtiyaçlara Otomatik Bağış Dağıtımı ----------
+
+# İşletme geri bağışının hangi ihtiyaca gideceği:
+#   closest     → tamamlanmaya en yakın ihtiyaç (remaining_amount indeksi ile tek seek)
+#   priority    → en yüksek öncelikli ihtiyaç sahibinin ihtiyacı
+#   round_robin → aktif ihtiyaçlar sırayla
+BACKFLOW_POLICIES = ("closest", "priority", "round_robin")
+BACKFLOW_POLICY = os.getenv("BACKFLOW_POLICY", "closest")
+if BACKFLOW_POLICY not in BACKFLOW_POLICIES:
+    # Yazım hatası sessizce "closest"a düşmesin: uygulama yanlış ayarla başlamaz
+    raise ValueError(
+        f"Geçersiz BACKFLOW_POLICY: {BACKFLOW_POLICY!r} (geçerli değerler: {', '.join(BACKFLOW_POLICIES)})"
+    )
+
+_round_robin_lock = threading.Lock()
+_round_robin_last_need_id = 0
+
+
+def add_to_need(db: Session, need_id: int, amount: float) -> bool:
+    """
+    Aktif ihtiyaca tutar ekler (current_amount ve remaining_amount birlikte).
+    Eklenemediyse (ihtiyaç artık aktif değil) False döner.
+    """
+    added = db.query(models.Need).filter(
+        models.Need.id == need_id,
+        models.Need.status == "active"
+    ).update({
+        models.Need.current_amount: models.Need.current_amount + amount,
+        models.Need.remaining_amount: models.Need.remaining_amount - amount,
+    }, synchronize_session=False)
+    return added == 1
+
+
+def complete_need_if_funded(db: Session, need_id: int) -> bool:
+    """Hedefe ulaşan aktif ihtiyacı tamamlar; sadece tamamlayan istek True alır."""
+    completed = db.query(models.Need).filter(
+        models.Need.id == need_id,
+        models.Need.status == "active",
+        models.Need.current_amount >= models.Need.target_amount
+    ).update({
+        models.Need.status: "completed",
+        models.Need.completed_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    if completed == 1:
+        stats.need_status_changed(db, "active", "completed")
+    return completed == 1
+
+
+def select_backflow_need(db: Session, policy: str = None):
+    """Dağıtım politikasına göre geri bağışı alacak aktif ihtiyacın ID'sini döner (yoksa None)."""
+    global _round_robin_last_need_id
+
+    policy = policy or BACKFLOW_POLICY
+    active = db.query(models.Need.id).filter(models.Need.status == "active")
+
+    if policy == "priority":
+        row = (
+            active.join(models.User, models.User.id == models.Need.user_id)
+            .order_by(models.User.priority.desc(), models.Need.remaining_amount, models.Need.id)
+            .first()
+        )
+    elif policy == "round_robin":
+        with _round_robin_lock:
+            row = (
+                active.filter(models.Need.id > _round_robin_last_need_id).order_by(models.Need.id).first()
+                or active.order_by(models.Need.id).first()
+            )
+            if row:
+                _round_robin_last_need_id = row.id
+    else:
+        # ix_needs_status_remaining: status = 'active' ORDER BY remaining_amount LIMIT 1
+        row = (
+            active.filter(models.Need.remaining_amount.isnot(None))
+            .order_by(models.Need.remaining_amount)
+            .first()
+        )
+
+    return row.id if row else None
+
+
+def apply_need_backflow(db: Session, amount: float, policy: str = None):
+    """Geri bağışı seçilen ihtiyaca ekler; ihtiyacın ID'sini döner (aktif ihtiyaç yoksa None)."""
+    need_id = select_backflow_need(db, policy)
+    if need_id is None:
+        return None
+    if add_to_need(db, need_id, amount):
+        complete_need_if_funded(db, need_id)
+    return need_id
+
+
 # ---------- Kupon Kullanım ----------
 
-def use_coupon(db: Session, coupon_id: int):
+def use_coupon(db: Session, coupon_id: int, commit: bool = True):
     """Kupon kullanımı - İşletmeye para ekle, günlük limit kontrolü yap, %10 otomatik bağış"""
     coupon = db.query(models.Coupon).filter(models.Coupon.id == coupon_id).first()
     if not coupon:
@@ -215,80 +758,48 @@ def use_coupon(db: Session, coupon_id: int):
     if coupon.status == "used":
         return {"status": "error", "message": "Kupon zaten kullanılmış"}
 
+    if not coupon_state.can_transition(coupon.status, "used"):
+        return {"status": "error", "message": "Rezerve edilmiş kupon onaylanmadan kullanılamaz"}
+
     coupon_type = coupon.coupon_type
     merchant = coupon_type.merchant
     
     # İşletme kullanıcısını bul (merchant_id ile user.id eşleşmeli)
-    merchant_user = db.query(models.User).filter(
+    merchant_user_id = db.query(models.User.id).filter(
         models.User.id == merchant.id,
         models.User.role.in_(["merchant", "seller"])
-    ).first()
+    ).scalar()
     
-    if not merchant_user:
+    if merchant_user_id is None:
         # Merchant ID ile user ID farklı olabilir, merchant_id'yi user_id olarak kullan
-        merchant_user = db.query(models.User).filter(models.User.id == merchant.id).first()
+        merchant_user_id = db.query(models.User.id).filter(models.User.id == merchant.id).scalar()
     
-    if not merchant_user:
+    if merchant_user_id is None:
         return {"status": "error", "message": "İşletme kullanıcısı bulunamadı"}
     
     coupon_amount = coupon_type.amount
-    today = date.today()
-    
-    # Günlük kazanç kaydını bul veya oluştur
-    daily_earning = db.query(models.MerchantDailyEarnings).filter(
-        models.MerchantDailyEarnings.merchant_id == merchant.id,
-        func.date(models.MerchantDailyEarnings.date) == today
-    ).first()
-    
-    if not daily_earning:
-        daily_earning = models.MerchantDailyEarnings(
-            merchant_id=merchant.id,
-            date=datetime.utcnow(),
-            daily_earnings=0.0,
-            daily_limit=2000.0,
-            total_earnings=0.0,
-            total_donated_back=0.0
-        )
-        db.add(daily_earning)
-    
-    # Günlük limit kontrolü
-    if daily_earning.daily_earnings + coupon_amount > daily_earning.daily_limit:
-        return {
-            "status": "error",
-            "message": f"Günlük kazanç limiti aşıldı. Limit: {daily_earning.daily_limit} TL, Bugünkü kazanç: {daily_earning.daily_earnings:.2f} TL"
-        }
-    
-    # İşletmeye para ekle
-    merchant_user.balance += coupon_amount
-    
-    # Günlük kazanç güncelle
-    daily_earning.daily_earnings += coupon_amount
-    daily_earning.total_earnings += coupon_amount
-    
-    # Kazancın %10'unu otomatik bağış olarak ekle
+    # Kazancın %10'u otomatik bağış olarak ayrılır
     backflow_amount = coupon_amount * 0.10
-    daily_earning.total_donated_back += backflow_amount
     
-    # Otomatik bağışı sisteme ekle (genel havuz veya en yüksek öncelikli ihtiyaç)
-    # En yüksek öncelikli ihtiyacı bul
-    top_need = db.query(models.Need).filter(
-        models.Need.status == "active"
-    ).order_by(models.Need.target_amount - models.Need.current_amount).first()
+    # Önce kupon durumu: koşullu geçiş (WHERE status = okunan durum) tutmazsa başka bir istek
+    # kuponu kullanmıştır ve hiçbir ödeme yazılmaz
+    if not coupon_state.transition(db, coupon.id, coupon.status, "used", used_at=datetime.utcnow()):
+        return {"status": "error", "message": "Kupon zaten kullanılmış"}
     
-    if top_need:
-        top_need.current_amount += backflow_amount
-        if top_need.current_amount >= top_need.target_amount:
-            top_need.status = "completed"
-            top_need.completed_at = datetime.utcnow()
+    # Günlük limit kontrolü + kazanç artışı tek ifadede (upsert)
+    daily_earning = add_merchant_earnings(db, merchant.id, coupon_amount, backflow_amount)
+    if daily_earning is None:
+        if commit:
+            db.rollback()
+        return _daily_limit_error(db, merchant.id)
     
-    # Kupon durumunu güncelle
-    coupon.status = "used"
-    coupon.used_at = datetime.utcnow()
+    # İşletmeye para ekle (atomik)
+    credit_balance(db, merchant_user_id, coupon_amount)
     
-    db.commit()
-    db.refresh(coupon)
-    db.refresh(merchant_user)
-    db.refresh(daily_earning)
+    # Otomatik bağışı dağıtım politikasının seçtiği aktif ihtiyaca ekle
+    apply_need_backflow(db, backflow_amount)
+    
+    _finish(db, commit)
     
     return {
         "status": "success",
@@ -298,50 +809,205 @@ def use_coupon(db: Session, coupon_id: int):
         "daily_earnings": daily_earning.daily_earnings,
         "daily_limit": daily_earning.daily_limit,
         "auto_donation": backflow_amount,
-        "merchant_balance": merchant_user.balance
+        "merchant_balance": get_balance(db, merchant_user_id)
     }
 
-    if coupon.status == "used":
-        return {"status": "error", "message": "Kupon zaten kullanılmış"}
 
-    coupon.status = "used"
-    coupon.used_at = datetime.utcnow()
-    db.commit()
-    db.refresh(coupon)
+# ---------- Toplu Kupon Kullanımı ----------
+
+def use_coupons_batch(db: Session, merchant_id: int, coupon_ids: list, commit: bool = True):
+    """
+    İşletme vardiya sonu kapanışı: bir işletmenin çok sayıda kuponu tek seferde kullanılır.
+
+    1) Kuponlar kupon tipleriyle birlikte tek sorguda okunur
+    2) Kalemler sırayla doğrulanır; günlük limit bugünkü kazanca birikimli uygulanır
+    3) Kabul edilen kuponlar tek koşullu UPDATE ile "used" yapılır
+    4) İşletme bakiyesi, günlük kazanç ve ihtiyaç geri bağışı batch başına bir kez yazılır
+    """
+    merchant = db.query(models.Merchant).filter(models.Merchant.id == merchant_id).first()
+    if not merchant:
+        return {"status": "error", "message": "İşletme bulunamadı"}
+
+    # use_coupon ile aynı eşleşme: işletme kullanıcısının ID'si merchant ID'si
+    merchant_user_id = db.query(models.User.id).filter(models.User.id == merchant.id).scalar()
+    if merchant_user_id is None:
+        return {"status": "error", "message": "İşletme kullanıcısı bulunamadı"}
+
+    coupons = {
+        row.id: row
+        for row in (
+            db.query(
+                models.Coupon.id,
+                models.Coupon.status,
+                models.CouponType.merchant_id,
+                models.CouponType.amount
+            )
+            .join(models.CouponType, models.CouponType.id == models.Coupon.coupon_type_id)
+            .filter(models.Coupon.id.in_(set(coupon_ids)))
+            .all()
+        )
+    } if coupon_ids else {}
+
+    daily_earning = get_merchant_daily_earnings(db, merchant.id)
+    daily_limit = daily_earning.daily_limit if daily_earning else DAILY_EARNINGS_LIMIT
+    daily_earnings = daily_earning.daily_earnings if daily_earning else 0.0
+
+    results = []
+    accepted = []
+    seen = set()
+    total_amount = 0.0
+
+    for index, coupon_id in enumerate(coupon_ids):
+        coupon = coupons.get(coupon_id)
+        if not coupon:
+            results.append({"index": index, "coupon_id": coupon_id, "status": "error", "message": "Kupon bulunamadı"})
+            continue
+        if coupon.status == "used" or coupon_id in seen:
+            results.append({"index": index, "coupon_id": coupon_id, "status": "error", "message": "Kupon zaten kullanılmış"})
+            continue
+        if not coupon_state.can_transition(coupon.status, "used"):
+            results.append({"index": index, "coupon_id": coupon_id, "status": "error", "message": "Rezerve edilmiş kupon onaylanmadan kullanılamaz"})
+            continue
+        if coupon.merchant_id != merchant.id:
+            results.append({"index": index, "coupon_id": coupon_id, "status": "error", "message": "Kupon bu işletmeye ait değil"})
+            continue
+        if daily_earnings + total_amount + coupon.amount > daily_limit:
+            results.append({
+                "index": index,
+                "coupon_id": coupon_id,
+                "status": "error",
+                "message": f"Günlük kazanç limiti aşıldı. Limit: {daily_limit} TL, Bugünkü kazanç: {daily_earnings + total_amount:.2f} TL"
+            })
+            continue
+
+        seen.add(coupon_id)
+        total_amount += coupon.amount
+        accepted.append(coupon_id)
+        results.append({"index": index, "coupon_id": coupon_id, "status": "success", "message": "Kupon kullanıldı"})
+
+    if not accepted:
+        return {"status": "success", "accepted": 0, "rejected": len(coupon_ids), "merchant_earnings": 0.0,
+                "auto_donation": 0.0, "results": results}
+
+    # 3) Kuponları kullanıldı yap - biri bile tutmazsa (eşzamanlı kullanım) batch geri alınır.
+    # Kaynak durum başına bir UPDATE: sayaçlar okunan durumdan değil, UPDATE'in gerçekten
+    # değiştirdiği satırlardan düşülür (okuma ile yazma arasında durum değişmiş olabilir)
+    used_at = datetime.utcnow()
+    used_from = {}
+    for source in coupon_state.sources("used"):
+        changed = db.query(models.Coupon).filter(
+            models.Coupon.id.in_(accepted),
+            models.Coupon.status == source
+        ).update({models.Coupon.status: "used", models.Coupon.used_at: used_at}, synchronize_session=False)
+        if changed:
+            used_from[source] = changed
+    if sum(used_from.values()) != len(accepted):
+        if commit:
+            db.rollback()
+        return {"status": "error", "message": "Kuponlar işlem sırasında değişti, lütfen tekrar deneyin"}
+    showcase.mark_dirty(db)
+    for source, changed in used_from.items():
+        stats.coupon_status_changed(db, source, "used", count=changed)
+
+    # 4) Kazancın %10'u otomatik bağış olarak ayrılır
+    backflow_amount = total_amount * 0.10
+    daily_earning = add_merchant_earnings(db, merchant.id, total_amount, backflow_amount)
+    if daily_earning is None:
+        if commit:
+            db.rollback()
+        return _daily_limit_error(db, merchant.id)
+
+    credit_balance(db, merchant_user_id, total_amount)
+    apply_need_backflow(db, backflow_amount)
+    merchant_balance = get_balance(db, merchant_user_id)
+
+    _finish(db, commit)
 
     return {
         "status": "success",
-        "message": "Kupon kullanıldı",
-        "coupon_id": coupon.id
+        "message": f"{len(accepted)} kupon kullanıldı",
+        "accepted": len(accepted),
+        "rejected": len(coupon_ids) - len(accepted),
+        "merchant_earnings": total_amount,
+        "daily_earnings": daily_earning.daily_earnings,
+        "daily_limit": daily_earning.daily_limit,
+        "auto_donation": backflow_amount,
+        "merchant_balance": merchant_balance,
+        "results": results
     }
 
 
-# ---------- Otomatik Bağış Kurallarını Çalıştırma (Simülasyon) ----------
+# ---------- Otomatik Bağış Kurallarını Çalıştırma ----------
+
+AUTO_DONATION_INTERVALS = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+    "monthly": timedelta(days=30),
+}
+
+
+def next_auto_donation_run(frequency: str, after: datetime) -> datetime:
+    """Kuralın bir sonraki çalışma zamanı (bilinmeyen frekans günlük sayılır)"""
+    return after + AUTO_DONATION_INTERVALS.get(frequency, AUTO_DONATION_INTERVALS["daily"])
 
-def run_auto_donations(db: Session):
+
+def run_auto_donations(db: Session, now: datetime = None, rule_ids: list = None,
+                       limit: int = 500, commit: bool = True):
     """
-    Tüm aktif otomatik bağış kurallarını çalıştırır (simülasyon).
-    Gerçek cron yok, bu endpoint manuel çağrılır.
+    Vakti gelmiş (next_run_at <= now) aktif otomatik bağış kurallarını çalıştırır.
+    Kurallar tek UPDATE ... RETURNING ile sahiplenilip yeniden zamanlanır,
+    böylece iki worker aynı kuralı iki kez çalıştıramaz. Bağışlar donate_batch ile toplu uygulanır.
     """
+    now = now or datetime.utcnow()
+    table = models.AutoDonation.__table__
+
+    due = (
+        select(table.c.id)
+        .where(table.c.is_active.is_(True), table.c.next_run_at <= now)
+        .order_by(table.c.next_run_at)
+        .limit(limit)
+    )
+    if rule_ids is not None:
+        due = due.where(table.c.id.in_(rule_ids))
 
-    rules = db.query(models.AutoDonation).filter(models.AutoDonation.is_active.is_(True)).all()
-    results = []
-
-    for rule in rules:
-        result = donate(
-            db=db,
-            user_id=rule.user_id,
-            amount=rule.amount,
-            coupon_type_id=rule.coupon_type_id
-        )
-        rule.last_run = datetime.utcnow()
-        results.append({
-            "rule_id": rule.id,
-            "user_id": rule.user_id,
-            "amount": rule.amount,
-            "result": result
-        })
+    next_run = case(
+        {frequency: next_auto_donation_run(frequency, now) for frequency in AUTO_DONATION_INTERVALS},
+        value=table.c.frequency,
+        else_=next_auto_donation_run("daily", now)
+    )
+    claimed = db.execute(
+        update(table)
+        .where(table.c.id.in_(due.scalar_subquery()), table.c.next_run_at <= now)
+        .values(last_run=now, next_run_at=next_run)
+        .returning(table.c.id, table.c.user_id, table.c.coupon_type_id, table.c.amount, table.c.next_run_at)
+    ).all()
+
+    if not claimed:
+        return {"status": "success", "results": []}
+
+    batch = donate_batch(
+        db,
+        [{"user_id": r.user_id, "amount": r.amount, "coupon_type_id": r.coupon_type_id} for r in claimed],
+        commit=False
+    )
+    if batch["status"] == "error":
+        if commit:
+            db.rollback()
+        return batch
 
-    db.commit()
-    return {"status": "success", "results": results}
+    _finish(db, commit)
 
+    return {
+        "status": "success",
+        "created_coupons_count": batch["created_coupons_count"],
+        "results": [
+            {
+                "rule_id": rule.id,
+                "user_id": rule.user_id,
+                "amount": rule.amount,
+                "next_run_at": rule.next_run_at.isoformat(),
+                "result": item
+            }
+            for rule, item in zip(claimed, batch["results"])
+        ]
+    }
@@ -1,8 +1,10 @@
 from sqlalchemy import func
-from fastapi import FastAPI, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, Query, HTTPException, Header, Response, Request, UploadFile, File
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session, joinedload, defer
 from pydantic import BaseModel
 from typing import Optional, List
+from datetime import datetime
 
 # ======================================
 # CORS EKLENDİ (React → FastAPI çalışsın)
@@ -11,13 +13,22 @@ from fastapi.middleware.cors import CORSMiddleware
 
 # Kendi dosya yapına uygun importlar
 from app.database import Base, engine, get_db
-from app import models, logic
+from app import models, logic, idempotency, auto_donation_scheduler, showcase, pagination, streaming, stats, ledger, blob_store, fieldsets, allocation, coupon_claims, coupon_state
+from app.write_pipeline import pipeline as write_pipeline
+from app.loaders import Loaders, get_loaders
+from app.beneficiary_selector import selector as beneficiary_selector, max_coupons_for_priority
+from app.upload_limit import UploadSizeLimit
 
 # Tabloları oluştur
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="Dijital Gönüllülük Platformu Backend")
 
+# Belge yüklemelerinde gövde okunurken boyut sınırı (chunked yüklemeler diske tamamen yazılmadan kesilir).
+# CORS'tan önce eklenir ki 413 yanıtı da CORS header'larıyla dönsün.
+app.add_middleware(UploadSizeLimit)
+
+
 # ======================================
 # CORS MIDDLEWARE → EN KRİTİK KISIM!
 # OPTIONS → 200 döner, POST çalışır.
@@ -28,8 +39,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],          # GET, POST, PUT, DELETE, OPTIONS HER ŞEY
     allow_headers=["*"],          # Header kısıtlaması yok
+    expose_headers=[pagination.NEXT_CURSOR_HEADER],  # Sayfalama cursor'ı frontend'den okunabilsin
 )
 
+
+# Otomatik bağış zamanlayıcısı (arka plan thread'i)
+@app.on_event("startup")
+def start_auto_donation_scheduler():
+    if auto_donation_scheduler.ENABLED:
+        auto_donation_scheduler.scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_auto_donation_scheduler():
+    auto_donation_scheduler.scheduler.stop()
+
 # ---------------------------------------------------------
 # ŞEMALAR (Pydantic Models)
 # ---------------------------------------------------------
@@ -74,6 +98,9 @@ class DonateRequest(BaseModel):
     amount: float
     coupon_type_id: int = 1
 
+class DonateBatchRequest(BaseModel):
+    items: List[DonateRequest]
+
 class BackflowRequest(BaseModel):
     coupon_id: int
 
@@ -86,6 +113,25 @@ class AutoDonationCreate(BaseModel):
 class UseCouponRequest(BaseModel):
     coupon_id: int
 
+class UseCouponBatchRequest(BaseModel):
+    merchant_id: int
+    coupon_ids: List[int]
+
+class EligibilityCheckRequest(BaseModel):
+    user_ids: List[int]
+
+class ClaimCouponRequest(BaseModel):
+    coupon_type_id: int
+    beneficiary_id: int
+    reserve_seconds: Optional[int] = None  # Verilirse kupon bu süre için rezerve edilir, confirm ile onaylanır
+
+class ConfirmCouponRequest(BaseModel):
+    beneficiary_id: int
+
+class AllocateCouponsRequest(BaseModel):
+    coupon_type_ids: Optional[List[int]] = None  # Verilmezse tüm atanmamış kuponlar
+    dry_run: bool = False
+
 class AssignCouponRequest(BaseModel):
     coupon_id: int
     beneficiary_id: int
@@ -176,6 +222,8 @@ def clear_all_users(db: Session = Depends(get_db)):
         deleted_count = db.query(models.User).count()
         db.query(models.User).delete()
         db.commit()
+        beneficiary_selector.invalidate()
+        stats.rebuild(db)
         return {
             "status": "success",
             "message": f"{deleted_count} kullanıcı silindi. Artık sadece yeni kayıt olanlar görünecek.",
@@ -266,6 +314,9 @@ def init_demo(db: Session = Depends(get_db)):
             db.add(coupon)
     
     db.commit()
+    beneficiary_selector.invalidate()
+    showcase.cache.invalidate()
+    stats.rebuild(db)
 
     return {"status": "ok", "message": "Demo veriler eklendi"}
 
@@ -273,9 +324,9 @@ def init_demo(db: Session = Depends(get_db)):
 # LOGIN
 @app.post("/login")
 def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    # Kullanıcı adını case-insensitive (büyük/küçük harf duyarsız) arama
+    # Kullanıcı adını case-insensitive (büyük/küçük harf duyarsız) arama - ix_users_name_normalized
     user = db.query(models.User).filter(
-        func.lower(models.User.name) == func.lower(user_data.username)
+        models.User.name_normalized == models.normalize_name(user_data.username)
     ).first()
 
     if not user:
@@ -304,60 +355,38 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
 # ITEMS (Dashboard vitrin)
 @app.get("/items")
 def get_items(merchant_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
-    """Kupon tiplerini listele, opsiyonel olarak merchant_id ile filtrele"""
-    query = db.query(models.Pool)
-    if merchant_id:
-        # Merchant'a ait kupon tiplerini filtrele
-        query = query.join(models.CouponType).filter(models.CouponType.merchant_id == merchant_id)
-    pools = query.all()
-    result = []
-    for p in pools:
-        # Bu pool için oluşturulmuş kupon sayısını bul
-        coupon_count = db.query(models.Coupon).filter(
-            models.Coupon.coupon_type_id == p.coupon_type_id
-        ).count()
-        
-        # Tamamlanmış pool'lar için mevcut kupon sayısını göster
-        # Pool tamamlandıysa, henüz atanmamış (status="created") kuponları say
-        available_coupons = db.query(models.Coupon).filter(
-            models.Coupon.coupon_type_id == p.coupon_type_id,
-            models.Coupon.status == "created"
-        ).count()
-        
-        # Potansiyel kupon sayısını hesapla (mevcut bakiye / hedef tutar)
-        # Örneğin: 6000 TL toplandı, hedef 1000 TL ise, 6 kupon oluşturulabilir
-        potential_coupons = int(p.current_balance / p.target_amount) if p.target_amount > 0 else 0
-        
-        result.append({
-            "id": p.id,
-            "pool_id": p.id,
-            "coupon_type_id": p.coupon_type_id,  # Bağış için gerekli
-            "title": p.coupon_type.name,
-            "description": f"{p.coupon_type.merchant.name} tarafından sağlanan destek.",
-            "company": p.coupon_type.merchant.name,
-            "category": p.coupon_type.category,
-            "totalAmount": p.target_amount,
-            "collected": p.current_balance,
-            "coupon_count": coupon_count,  # Toplam oluşturulmuş kupon sayısı
-            "available_coupons": available_coupons,  # Henüz alınmamış kupon sayısı
-            "potential_coupons": potential_coupons,  # Mevcut bakiye ile oluşturulabilecek kupon sayısı
-            "is_completed": p.current_balance >= p.target_amount
-        })
-    return result
+    """Kupon tiplerini listele, opsiyonel olarak merchant_id ile filtrele (tek sorgu + önbellek)"""
+    return showcase.cache.get(db, merchant_id)
+
+
+def _name_taken(db: Session, name: str, exclude_user_id: int = None) -> bool:
+    """Kullanıcı adı (büyük/küçük harf duyarsız) başka bir kullanıcıda var mı - indeksli arama"""
+    q = db.query(models.User.id).filter(models.User.name_normalized == models.normalize_name(name))
+    if exclude_user_id is not None:
+        q = q.filter(models.User.id != exclude_user_id)
+    return q.first() is not None
+
+
+def _email_taken(db: Session, email: Optional[str], exclude_user_id: int = None) -> bool:
+    if not email:
+        return False
+    q = db.query(models.User.id).filter(models.User.email_normalized == models.normalize_email(email))
+    if exclude_user_id is not None:
+        q = q.filter(models.User.id != exclude_user_id)
+    return q.first() is not None
 
 
 # KULLANICI OLUŞTURMA
 @app.post("/users")
 def create_user(req: UserCreate, db: Session = Depends(get_db)):
     try:
-        # Aynı isimde kullanıcı var mı kontrol et (case-insensitive)
-        existing_user = db.query(models.User).filter(
-            func.lower(models.User.name) == func.lower(req.name)
-        ).first()
-        
-        if existing_user:
+        # Aynı isimde / e-postada kullanıcı var mı kontrol et (case-insensitive)
+        if _name_taken(db, req.name):
             raise HTTPException(status_code=400, detail="Bu kullanıcı adı zaten kullanılıyor")
         
+        if _email_taken(db, req.email):
+            raise HTTPException(status_code=400, detail="Bu e-posta adresi zaten kullanılıyor")
+        
         # User modeline veri ekle (password dahil)
         user_data = req.dict()
         company_name = user_data.pop('company_name', None)  # company_name'i çıkar (User modelinde yok)
@@ -365,6 +394,7 @@ def create_user(req: UserCreate, db: Session = Depends(get_db)):
         user = models.User(**user_data)
         db.add(user)
         db.flush()  # commit() öncesi ID'yi almak için
+        stats.user_created(db, user.role, user.balance)
         
         # Eğer merchant ise Merchant tablosuna da kayıt yap
         if req.role == "merchant" and company_name:
@@ -376,6 +406,7 @@ def create_user(req: UserCreate, db: Session = Depends(get_db)):
         
         db.commit()
         db.refresh(user)
+        beneficiary_selector.invalidate()
         
         return {
             "id": user.id,
@@ -399,6 +430,11 @@ def update_user(user_id: int, req: UserUpdate, db: Session = Depends(get_db)):
         if not user:
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
         
+        if req.name and _name_taken(db, req.name, exclude_user_id=user.id):
+            raise HTTPException(status_code=400, detail="Bu kullanıcı adı zaten kullanılıyor")
+        if req.email and _email_taken(db, req.email, exclude_user_id=user.id):
+            raise HTTPException(status_code=400, detail="Bu e-posta adresi zaten kullanılıyor")
+        
         if req.name:
             user.name = req.name
         if req.email is not None:
@@ -464,11 +500,24 @@ def change_password(user_id: int, req: ChangePasswordRequest, db: Session = Depe
 
 # USER LIST
 @app.get("/users")
-def list_users(role: Optional[str] = Query(None), db: Session = Depends(get_db)):
+def list_users(
+    role: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description=fieldsets.FIELDS_DESCRIPTION),
+    after: Optional[str] = Query(None, description=pagination.AFTER_DESCRIPTION),
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, description=pagination.LIMIT_DESCRIPTION),
+    response: Response = None,
+    db: Session = Depends(get_db)
+):
+    selected = fieldsets.parse(fields, fieldsets.column_names(models.User))
     q = db.query(models.User)
+    if selected:
+        q = q.options(fieldsets.load_only_option(models.User, selected))
     if role:
         q = q.filter(models.User.role == role)
-    return q.all()
+    users, next_cursor = pagination.paginate(q, [models.User.id], after, limit, response=response)
+    if selected:
+        users = [fieldsets.model_dict(u, selected) for u in users]
+    return pagination.page(users, next_cursor)
 
 
 # USER UPDATE
@@ -480,6 +529,11 @@ def update_user(user_id: int, req: UserUpdate, db: Session = Depends(get_db)):
         if not user:
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
         
+        if req.name and _name_taken(db, req.name, exclude_user_id=user.id):
+            raise HTTPException(status_code=400, detail="Bu kullanıcı adı zaten kullanılıyor")
+        if req.email and _email_taken(db, req.email, exclude_user_id=user.id):
+            raise HTTPException(status_code=400, detail="Bu e-posta adresi zaten kullanılıyor")
+        
         if req.name:
             user.name = req.name
         if req.email is not None:
@@ -548,29 +602,40 @@ def change_password(user_id: int, req: ChangePasswordRequest, db: Session = Depe
 @app.get("/users/list", 
          summary="Kullanıcı Listesi ve Şifreleri",
          description="Veritabanındaki tüm kullanıcıları, şifre durumlarını ve detaylı bilgilerini listeler")
-def list_users_detailed(db: Session = Depends(get_db)):
+def list_users_detailed(
+    stream: bool = Query(False, description="true ise tüm sonuçlar sayfalanmadan akışlı JSON olarak döner"),
+    db: Session = Depends(get_db)
+):
     """
     Tüm kullanıcıları detaylı bilgilerle listele
     
     - **total_count**: Toplam kullanıcı sayısı
     - **users**: Kullanıcı listesi (id, name, email, role, balance, şifre durumu)
     """
+    def user_dict(u):
+        return {
+            "id": u.id,
+            "name": u.name,
+            "email": u.email,
+            "role": u.role,
+            "balance": u.balance,
+            "is_verified": u.is_verified,
+            "password": "123 (varsayılan - tüm test kullanıcıları için)",
+            "created_at": u.created_at.isoformat() if u.created_at else None
+        }
+
+    if stream:
+        return streaming.json_object(
+            lambda db: {"total_count": db.query(func.count(models.User.id)).scalar()},
+            "users",
+            lambda db: db.query(models.User).order_by(models.User.id),
+            user_dict
+        )
+
     users = db.query(models.User).all()
     return {
         "total_count": len(users),
-        "users": [
-            {
-                "id": u.id,
-                "name": u.name,
-                "email": u.email,
-                "role": u.role,
-                "balance": u.balance,
-                "is_verified": u.is_verified,
-                "password": "123 (varsayılan - tüm test kullanıcıları için)",
-                "created_at": u.created_at.isoformat() if u.created_at else None
-            }
-            for u in users
-        ]
+        "users": [user_dict(u) for u in users]
     }
 
 
@@ -595,22 +660,31 @@ def list_users_detailed(db: Session = Depends(get_db)):
 
 # USER DETAIL
 @app.get("/users/{user_id}")
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    u = db.query(models.User).filter(models.User.id == user_id).first()
+def get_user(
+    user_id: int,
+    fields: Optional[str] = Query(None, description=fieldsets.FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db)
+):
+    selected = fieldsets.parse(fields, fieldsets.column_names(models.User))
+    q = db.query(models.User)
+    if selected:
+        q = q.options(fieldsets.load_only_option(models.User, selected))
+    u = q.filter(models.User.id == user_id).first()
     if not u:
         return {"status": "error", "message": "Kullanıcı bulunamadı"}
+    if selected:
+        return fieldsets.model_dict(u, selected)
     return u
 
 
 # WALLET TOPUP
 @app.post("/wallet/topup")
-def wallet_topup(req: TopUpRequest, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == req.user_id).first()
-    if not user:
-        return {"status": "error", "message": "Kullanıcı bulunamadı"}
-    user.balance += req.amount
-    db.commit()
-    return {"status": "success", "new_balance": user.balance}
+def wallet_topup(
+    req: TopUpRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return idempotency.execute("/wallet/topup", idempotency_key, logic.topup, req.user_id, req.amount,
+                               user_id=req.user_id)
 
 
 @app.post("/wallet/topup-all",
@@ -625,6 +699,7 @@ def topup_all_users(amount: float = 500.0, db: Session = Depends(get_db)):
         for user in users:
             user.balance += amount
             updated_count += 1
+        stats.bump(db, {stats.USERS_BALANCE: amount * updated_count})
         
         db.commit()
         
@@ -651,6 +726,7 @@ def topup_donors(amount: float = 5000.0, db: Session = Depends(get_db)):
         for donor in donors:
             donor.balance += amount
             updated_count += 1
+        stats.bump(db, {stats.USERS_BALANCE: amount * updated_count})
         
         db.commit()
         
@@ -672,7 +748,7 @@ def topup_user_by_name(name: str, amount: float = 5000.0, db: Session = Depends(
     """İsme göre kullanıcı bulup para ekle"""
     try:
         user = db.query(models.User).filter(
-            func.lower(models.User.name) == func.lower(name)
+            models.User.name_normalized == models.normalize_name(name)
         ).first()
         
         if not user:
@@ -680,6 +756,7 @@ def topup_user_by_name(name: str, amount: float = 5000.0, db: Session = Depends(
         
         old_balance = user.balance
         user.balance += amount
+        stats.bump(db, {stats.USERS_BALANCE: amount})
         
         # Para akışı kaydı ekle
         try:
@@ -718,59 +795,29 @@ def topup_user_by_name(name: str, amount: float = 5000.0, db: Session = Depends(
          summary="Veritabanı Genel Bakış",
          description="Tüm tabloların özet bilgilerini döner")
 def database_overview(db: Session = Depends(get_db)):
-    """Veritabanı genel bakış"""
+    """Veritabanı genel bakış - sayaçlar platform_stats tablosundan okunur (tablo boyutundan bağımsız)"""
     try:
-        users = db.query(models.User).all()
-        donations = db.query(models.Donation).all()
-        transfers = db.query(models.Transfer).all()
-        needs = db.query(models.Need).all()
-        coupons = db.query(models.Coupon).all()
-        
-        # Para akışı (eğer tablo varsa)
-        money_flows = []
-        try:
-            money_flows = db.query(models.MoneyFlow).order_by(models.MoneyFlow.created_at.desc()).limit(50).all()
-        except:
-            pass
-        
-        total_balance = sum(u.balance for u in users)
-        total_donations = sum(d.amount for d in donations)
-        total_transfers = sum(t.amount for t in transfers)
+        values = stats.snapshot(db)
+        if values is None:
+            # Sayaçlar ilk kez kullanılıyor: tablolardan bir kez hesapla
+            write_pipeline.run(stats.rebuild)
+            values = stats.snapshot(db) or {}
+        
+        money_flows = (
+            db.query(models.MoneyFlow, models.User.name)
+            .outerjoin(models.User, models.User.id == models.MoneyFlow.user_id)
+            .order_by(models.MoneyFlow.created_at.desc())
+            .limit(50)
+            .all()
+        )
         
         return {
-            "users": {
-                "total": len(users),
-                "by_role": {
-                    role: len([u for u in users if u.role == role])
-                    for role in set(u.role for u in users)
-                },
-                "total_balance": total_balance
-            },
-            "donations": {
-                "total": len(donations),
-                "total_amount": total_donations
-            },
-            "transfers": {
-                "total": len(transfers),
-                "total_amount": total_transfers
-            },
-            "needs": {
-                "total": len(needs),
-                "active": len([n for n in needs if n.status == "active"]),
-                "completed": len([n for n in needs if n.status == "completed"])
-            },
-            "coupons": {
-                "total": len(coupons),
-                "by_status": {
-                    status: len([c for c in coupons if c.status == status])
-                    for status in set(c.status for c in coupons)
-                }
-            },
+            **stats.overview(values),
             "recent_money_flows": [
                 {
                     "id": mf.id,
                     "user_id": mf.user_id,
-                    "user_name": db.query(models.User).filter(models.User.id == mf.user_id).first().name if mf.user_id else None,
+                    "user_name": user_name,
                     "transaction_type": mf.transaction_type,
                     "amount": mf.amount,
                     "balance_before": mf.balance_before,
@@ -778,86 +825,39 @@ def database_overview(db: Session = Depends(get_db)):
                     "description": mf.description,
                     "created_at": mf.created_at.isoformat() if mf.created_at else None
                 }
-                for mf in money_flows
+                for mf, user_name in money_flows
             ]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Veritabanı bilgisi alınırken hata: {str(e)}")
 
 
+@app.post("/database/overview/rebuild",
+          summary="Platform Sayaçlarını Yeniden Hesapla",
+          description="platform_stats sayaçlarını tablolardan GROUP BY ile baştan hesaplar (onarım için)")
+def rebuild_database_overview():
+    return write_pipeline.run(stats.rebuild)
+
+
 @app.get("/money-flows",
          summary="Para Akışı Geçmişi",
          description="Tüm para giriş/çıkış işlemlerini listeler (kupon bağışları dahil)")
 def get_money_flows(
     user_id: Optional[int] = Query(None),
     limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="Önceki sayfanın X-Next-Cursor değeri"),
+    response: Response = None,
     db: Session = Depends(get_db)
 ):
-    """Para akışı geçmişi - kupon bağışları dahil"""
+    """Para akışı geçmişi - kupon bağışları dahil (kaynak başına en fazla `limit` satır okunur)"""
     try:
-        flows = []
-        
-        # MoneyFlow kayıtları
-        try:
-            query = db.query(models.MoneyFlow)
-            if user_id:
-                query = query.filter(models.MoneyFlow.user_id == user_id)
-            money_flows = query.order_by(models.MoneyFlow.created_at.desc()).limit(limit).all()
-            
-            for mf in money_flows:
-                user = db.query(models.User).filter(models.User.id == mf.user_id).first() if mf.user_id else None
-                flows.append({
-                    "id": f"mf_{mf.id}",
-                    "user_id": mf.user_id,
-                    "user_name": user.name if user else None,
-                    "transaction_type": mf.transaction_type,
-                    "amount": mf.amount,
-                    "balance_before": mf.balance_before,
-                    "balance_after": mf.balance_after,
-                    "description": mf.description,
-                    "created_at": mf.created_at.isoformat() if mf.created_at else None
-                })
-        except:
-            pass
-        
-        # Kupon bağışları (Donation tablosundan)
-        try:
-            donations_query = db.query(models.Donation).filter(
-                models.Donation.coupon_type_id.isnot(None)
-            )
-            if user_id:
-                donations_query = donations_query.filter(models.Donation.user_id == user_id)
-            
-            donations = donations_query.order_by(models.Donation.created_at.desc()).limit(limit).all()
-            
-            for donation in donations:
-                donor = db.query(models.User).filter(models.User.id == donation.user_id).first()
-                coupon_type = db.query(models.CouponType).filter(models.CouponType.id == donation.coupon_type_id).first()
-                merchant = db.query(models.Merchant).filter(models.Merchant.id == coupon_type.merchant_id).first() if coupon_type else None
-                
-                flows.append({
-                    "id": f"don_{donation.id}",
-                    "user_id": donation.user_id,
-                    "user_name": donor.name if donor else None,
-                    "transaction_type": "coupon_donation",
-                    "amount": donation.amount,
-                    "balance_before": None,
-                    "balance_after": None,
-                    "description": f"Kupon bağışı - {coupon_type.name if coupon_type else 'Bilinmeyen'} ({merchant.name if merchant else 'Bilinmeyen İşletme'})",
-                    "created_at": donation.created_at.isoformat() if donation.created_at else None,
-                    "coupon_type_name": coupon_type.name if coupon_type else None,
-                    "merchant_name": merchant.name if merchant else None
-                })
-        except:
-            pass
-        
-        # Tarihe göre sırala ve limit uygula
-        flows.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-        flows = flows[:limit]
-        
+        flows, next_cursor = ledger.page(db, user_id, after, limit)
+        pagination.set_next_cursor(response, next_cursor)
         return flows
+    except HTTPException:
+        raise
     except Exception as e:
-        return []
+        raise HTTPException(status_code=500, detail=f"Para akışı alınırken hata: {str(e)}")
 
 
 # ============================================
@@ -909,7 +909,11 @@ def create_poverty_verification(req: PovertyVerificationRequest, db: Session = D
          description="Tüm fakirlik durumu başvurularını listeler")
 def list_poverty_verifications(
     status: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    after: Optional[str] = Query(None, description=pagination.AFTER_DESCRIPTION),
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, description=pagination.LIMIT_DESCRIPTION),
+    response: Response = None,
+    db: Session = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Fakirlik durumu başvurularını listele"""
     try:
@@ -917,13 +921,17 @@ def list_poverty_verifications(
         if status:
             query = query.filter(models.PovertyVerification.verification_status == status)
         
-        verifications = query.all()
+        verifications, next_cursor = pagination.paginate(
+            query, [models.PovertyVerification.id], after, limit, response=response
+        )
         
-        return [
+        users = loaders.users.get_many(v.user_id for v in verifications)
+        
+        return pagination.page([
             {
                 "id": v.id,
                 "user_id": v.user_id,
-                "user_name": db.query(models.User).filter(models.User.id == v.user_id).first().name,
+                "user_name": users[v.user_id].name if users.get(v.user_id) else None,
                 "document_url": v.document_url,
                 "verification_status": v.verification_status,
                 "verified_at": v.verified_at.isoformat() if v.verified_at else None,
@@ -931,9 +939,11 @@ def list_poverty_verifications(
                 "created_at": v.created_at.isoformat() if v.created_at else None
             }
             for v in verifications
-        ]
+        ], next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
-        return []
+        return pagination.page([], None)
 
 
 @app.post("/poverty-verification/{verification_id}/approve",
@@ -967,6 +977,7 @@ def approve_poverty_verification(
         
         db.commit()
         db.refresh(verification)
+        beneficiary_selector.invalidate()
         
         return {
             "status": "success",
@@ -1065,16 +1076,17 @@ def create_approval_band(req: ApprovalBandCreate, db: Session = Depends(get_db))
 @app.get("/approval-bands",
          summary="Onay Bandları Listesi",
          description="Tüm işletme onay bandlarını listeler")
-def list_approval_bands(db: Session = Depends(get_db)):
+def list_approval_bands(db: Session = Depends(get_db), loaders: Loaders = Depends(get_loaders)):
     """Onay bandları listesi"""
     try:
         bands = db.query(models.ApprovalBand).all()
+        merchants = loaders.merchants.get_many(b.merchant_id for b in bands)
         
         return [
             {
                 "id": b.id,
                 "merchant_id": b.merchant_id,
-                "merchant_name": db.query(models.Merchant).filter(models.Merchant.id == b.merchant_id).first().name,
+                "merchant_name": merchants[b.merchant_id].name if merchants.get(b.merchant_id) else None,
                 "daily_limit": b.daily_limit,
                 "used_today": b.used_today,
                 "remaining_today": b.daily_limit - b.used_today,
@@ -1125,59 +1137,71 @@ def reset_approval_band(band_id: int, db: Session = Depends(get_db)):
 def check_coupon_eligibility(user_id: int, db: Session = Depends(get_db)):
     """Kupon alma uygunluk kontrolü"""
     try:
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        if not user:
+        # Alınan kupon sayısı users.received_coupon_count sayacından okunur (kupon tablosu taranmaz)
+        eligibility = logic.coupon_eligibility(db, [user_id]).get(user_id)
+        if not eligibility:
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
-        
-        # Fakirlik durumu kontrolü
-        verification = db.query(models.PovertyVerification).filter(
-            models.PovertyVerification.user_id == user_id
-        ).first()
-        
-        is_verified = verification and verification.verification_status == "approved"
-        
-        # Kullanıcının aldığı kupon sayısı
-        received_coupons = db.query(models.Coupon).filter(
-            models.Coupon.beneficiary_id == user_id
-        ).count()
-        
-        # Priority'ye göre maksimum kupon sayısı
-        # Priority 0-30: 3 kupon, 31-60: 5 kupon, 61-100: 10 kupon
-        max_coupons = 3
-        if user.priority >= 31 and user.priority <= 60:
-            max_coupons = 5
-        elif user.priority >= 61:
-            max_coupons = 10
-        
-        can_receive = is_verified and received_coupons < max_coupons
-        
-        return {
-            "user_id": user_id,
-            "user_name": user.name,
-            "is_verified": is_verified,
-            "verification_status": verification.verification_status if verification else "none",
-            "priority": user.priority,
-            "received_coupons": received_coupons,
-            "max_coupons": max_coupons,
-            "can_receive": can_receive,
-            "remaining_coupons": max(0, max_coupons - received_coupons)
-        }
+        return eligibility
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Kontrol sırasında hata: {str(e)}")
 
 
+MAX_ELIGIBILITY_USER_IDS = 10000
+
+
+@app.post("/coupons/check-eligibility",
+          summary="Toplu Kupon Alma Uygunluk Kontrolü",
+          description="Birden çok kullanıcının kupon alabilme durumunu tek istekte kontrol eder")
+def check_coupon_eligibility_bulk(req: EligibilityCheckRequest, db: Session = Depends(get_db)):
+    """Listedeki her kullanıcı için uygunluk; bulunamayan ID'ler not_found altında döner"""
+    if len(req.user_ids) > MAX_ELIGIBILITY_USER_IDS:
+        raise HTTPException(status_code=400, detail=f"En fazla {MAX_ELIGIBILITY_USER_IDS} kullanıcı gönderilebilir")
+    
+    results = logic.coupon_eligibility(db, req.user_ids)
+    user_ids = list(dict.fromkeys(req.user_ids))
+    return {
+        "results": [results[user_id] for user_id in user_ids if user_id in results],
+        "not_found": [user_id for user_id in user_ids if user_id not in results],
+        "eligible_count": sum(1 for r in results.values() if r["can_receive"])
+    }
+
+
 # TRANSFER
 @app.post("/wallet/transfer")
-def wallet_transfer(req: TransferRequest, db: Session = Depends(get_db)):
-    return logic.transfer(db, req.sender_id, req.receiver_id, req.amount)
+def wallet_transfer(
+    req: TransferRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return idempotency.execute("/wallet/transfer", idempotency_key,
+                               logic.transfer, req.sender_id, req.receiver_id, req.amount,
+                               user_id=req.sender_id)
 
 
 # DONATE
 @app.post("/donate")
-def donate_endpoint(req: DonateRequest, db: Session = Depends(get_db)):
-    return logic.donate(db, req.user_id, req.amount, req.coupon_type_id)
+def donate_endpoint(
+    req: DonateRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return idempotency.execute("/donate", idempotency_key,
+                               logic.donate, req.user_id, req.amount, req.coupon_type_id,
+                               user_id=req.user_id)
+
+
+# Tek istekte kabul edilen en fazla bağış kalemi
+MAX_BATCH_DONATIONS = 5000
+
+
+@app.post("/donate/batch",
+          summary="Toplu Bağış",
+          description="Bordro bağışları ve otomatik bağışlar için çok sayıda bağışı tek işlemde uygular")
+def donate_batch_endpoint(req: DonateBatchRequest):
+    """Toplu bağış - kalem başına sonuç döner"""
+    if len(req.items) > MAX_BATCH_DONATIONS:
+        raise HTTPException(status_code=400, detail=f"En fazla {MAX_BATCH_DONATIONS} bağış kalemi gönderilebilir")
+    return write_pipeline.run(logic.donate_batch, [item.dict() for item in req.items])
 
 
 # BACKFLOW
@@ -1187,38 +1211,20 @@ def donate_endpoint(req: DonateRequest, db: Session = Depends(get_db)):
          description="İşletmenin günlük ve toplam kazanç bilgilerini getirir")
 def get_merchant_earnings(merchant_id: int, db: Session = Depends(get_db)):
     """İşletme kazanç bilgilerini getir"""
-    from datetime import date
-    from sqlalchemy import func
+    # Günlük kazanç kaydını (merchant_id, day) indeksi ile bul
+    daily_earning = logic.get_merchant_daily_earnings(db, merchant_id)
     
-    today = date.today()
-    
-    # Günlük kazanç kaydını bul
-    daily_earning = db.query(models.MerchantDailyEarnings).filter(
-        models.MerchantDailyEarnings.merchant_id == merchant_id,
-        func.date(models.MerchantDailyEarnings.date) == today
-    ).first()
+    # Eğer bugün için kayıt yoksa sıfır değerler (kayıt ilk kupon kullanımında oluşur)
+    daily_earnings = daily_earning.daily_earnings if daily_earning else 0.0
+    daily_limit = daily_earning.daily_limit if daily_earning else logic.DAILY_EARNINGS_LIMIT
     
-    # Eğer bugün için kayıt yoksa, sıfır değerlerle başlat
-    if not daily_earning:
-        daily_earning = models.MerchantDailyEarnings(
-            merchant_id=merchant_id,
-            date=datetime.utcnow(),
-            daily_earnings=0.0,
-            daily_limit=2000.0,
-            total_earnings=0.0,
-            total_donated_back=0.0
-        )
-        db.add(daily_earning)
-        db.commit()
-        db.refresh(daily_earning)
-    
-    # Toplam kazanç ve bağış bilgilerini al
-    all_earnings = db.query(models.MerchantDailyEarnings).filter(
+    # Toplam kazanç ve bağış bilgilerini SQL'de topla
+    total_earnings_all_time, total_donated_all_time = db.query(
+        func.coalesce(func.sum(models.MerchantDailyEarnings.total_earnings), 0.0),
+        func.coalesce(func.sum(models.MerchantDailyEarnings.total_donated_back), 0.0)
+    ).filter(
         models.MerchantDailyEarnings.merchant_id == merchant_id
-    ).all()
-    
-    total_earnings_all_time = sum(e.total_earnings for e in all_earnings)
-    total_donated_all_time = sum(e.total_donated_back for e in all_earnings)
+    ).one()
     
     merchant = db.query(models.Merchant).filter(models.Merchant.id == merchant_id).first()
     if not merchant:
@@ -1232,9 +1238,9 @@ def get_merchant_earnings(merchant_id: int, db: Session = Depends(get_db)):
     return {
         "merchant_id": merchant_id,
         "merchant_name": merchant.name,
-        "daily_earnings": daily_earning.daily_earnings,
-        "daily_limit": daily_earning.daily_limit,
-        "remaining_limit": daily_earning.daily_limit - daily_earning.daily_earnings,
+        "daily_earnings": daily_earnings,
+        "daily_limit": daily_limit,
+        "remaining_limit": daily_limit - daily_earnings,
         "total_earnings": total_earnings_all_time,
         "total_donated_back": total_donated_all_time,
         "merchant_balance": merchant_user.balance if merchant_user else 0.0,
@@ -1243,35 +1249,101 @@ def get_merchant_earnings(merchant_id: int, db: Session = Depends(get_db)):
 
 
 @app.post("/merchant/backflow")
-def backflow_endpoint(req: BackflowRequest, db: Session = Depends(get_db)):
-    return logic.merchant_backflow(db, req.coupon_id)
+def backflow_endpoint(req: BackflowRequest):
+    return write_pipeline.run(logic.merchant_backflow, req.coupon_id)
 
 
 # AUTO DONATION
 @app.post("/auto-donations")
 def create_auto_donation(req: AutoDonationCreate, db: Session = Depends(get_db)):
-    rule = models.AutoDonation(**req.dict(), is_active=True)
+    # İlk çalışma hemen; sonrakiler frequency'ye göre zamanlanır
+    rule = models.AutoDonation(**req.dict(), is_active=True, next_run_at=datetime.utcnow())
     db.add(rule)
     db.commit()
+    auto_donation_scheduler.scheduler.notify(rule.id, rule.next_run_at)
     return rule
 
 
-@app.post("/auto-donations/run")
-def run_auto_donations(db: Session = Depends(get_db)):
-    return logic.run_auto_donations(db)
+@app.post("/auto-donations/run",
+          summary="Otomatik Bağışları Çalıştır",
+          description="Vakti gelmiş otomatik bağış kurallarını hemen çalıştırır")
+def run_auto_donations():
+    return auto_donation_scheduler.scheduler.run_due(refill=True)
 
 
 # COUPONS
+# /coupons alanları: alan adı → projeksiyondaki sütunlar ve değer fonksiyonu
+COUPON_COLUMNS = {
+    "id": [models.Coupon.id],
+    "coupon_type_id": [models.Coupon.coupon_type_id],
+    "coupon_type_name": [models.CouponType.name.label("coupon_type_name")],
+    "coupon_type_amount": [models.CouponType.amount.label("coupon_type_amount")],
+    "coupon_type_category": [models.CouponType.category.label("coupon_type_category")],
+    "merchant_name": [models.Merchant.name.label("merchant_name")],
+    "merchant_id": [models.Merchant.id.label("merchant_id")],
+    "beneficiary_id": [models.Coupon.beneficiary_id],
+    "beneficiary_name": [models.User.name.label("beneficiary_name")],
+    "status": [models.Coupon.status],
+    "created_at": [models.Coupon.created_at],
+    "used_at": [models.Coupon.used_at],
+    "pool": [
+        models.Pool.id.label("pool_id"),
+        models.Pool.target_amount.label("pool_target_amount"),
+        models.Pool.current_balance.label("pool_current_balance")
+    ],
+}
+
+COUPON_FIELDS = {
+    "id": lambda c: c.id,
+    "coupon_type_id": lambda c: c.coupon_type_id,
+    "coupon_type_name": lambda c: c.coupon_type_name,
+    "coupon_type_amount": lambda c: c.coupon_type_amount,
+    "coupon_type_category": lambda c: c.coupon_type_category,
+    "merchant_name": lambda c: c.merchant_name,
+    "merchant_id": lambda c: c.merchant_id,
+    "beneficiary_id": lambda c: c.beneficiary_id,
+    "beneficiary_name": lambda c: c.beneficiary_name,
+    "status": lambda c: c.status,
+    "created_at": lambda c: c.created_at.isoformat() if c.created_at else None,
+    "used_at": lambda c: c.used_at.isoformat() if c.used_at else None,
+    # Pool bilgisi
+    "pool": lambda c: {
+        "target_amount": c.pool_target_amount,
+        "current_balance": c.pool_current_balance
+    } if c.pool_id is not None else None,
+}
+
+
 @app.get("/coupons")
 def list_coupons(
     status: Optional[str] = Query(None),
     beneficiary_id: Optional[int] = Query(None),
     merchant_id: Optional[int] = Query(None),
     category: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description=fieldsets.FIELDS_DESCRIPTION),
+    after: Optional[str] = Query(None, description=pagination.AFTER_DESCRIPTION),
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, description=pagination.LIMIT_DESCRIPTION),
+    response: Response = None,
     db: Session = Depends(get_db)
 ):
-    q = db.query(models.Coupon)
-
+    selected = fieldsets.parse(fields, COUPON_FIELDS)
+    wanted = selected or list(COUPON_FIELDS)
+
+    # Tek sorgu, sadece istenen alanların sütunları (ORM nesnesi oluşturulmaz, ilişkiler tembel yüklenmez)
+    columns = [models.Coupon.id]  # cursor için her zaman
+    for name in wanted:
+        columns.extend(c for c in COUPON_COLUMNS[name] if c is not models.Coupon.id)
+
+    q = db.query(*columns).join(models.CouponType, models.CouponType.id == models.Coupon.coupon_type_id)
+    # İstenmeyen alanların join'leri hiç yapılmaz
+    if "merchant_name" in wanted or "merchant_id" in wanted:
+        q = q.outerjoin(models.Merchant, models.Merchant.id == models.CouponType.merchant_id)
+    if "beneficiary_name" in wanted:
+        q = q.outerjoin(models.User, models.User.id == models.Coupon.beneficiary_id)
+    if "pool" in wanted:
+        q = q.outerjoin(models.Pool, models.Pool.coupon_type_id == models.CouponType.id)
+
+    # ix_coupons_status / ix_coupons_beneficiary_status / ix_coupons_type_status
     if status:
         q = q.filter(models.Coupon.status == status)
 
@@ -1279,40 +1351,39 @@ def list_coupons(
         q = q.filter(models.Coupon.beneficiary_id == beneficiary_id)
 
     if merchant_id:
-        q = q.join(models.Coupon.coupon_type).join(models.CouponType.merchant).filter(models.Merchant.id == merchant_id)
+        q = q.filter(models.CouponType.merchant_id == merchant_id)
 
     if category:
-        q = q.join(models.Coupon.coupon_type).filter(models.CouponType.category == category)
+        q = q.filter(models.CouponType.category == category)
 
-    coupons = q.all()
-    
-    return [
-        {
-            "id": c.id,
-            "coupon_type_id": c.coupon_type_id,
-            "coupon_type_name": c.coupon_type.name if c.coupon_type else None,
-            "coupon_type_amount": c.coupon_type.amount if c.coupon_type else None,
-            "coupon_type_category": c.coupon_type.category if c.coupon_type else None,
-            "merchant_name": c.coupon_type.merchant.name if c.coupon_type and c.coupon_type.merchant else None,
-            "merchant_id": c.coupon_type.merchant.id if c.coupon_type and c.coupon_type.merchant else None,
-            "beneficiary_id": c.beneficiary_id,
-            "beneficiary_name": c.beneficiary.name if c.beneficiary else None,
-            "status": c.status,
-            "created_at": c.created_at.isoformat() if c.created_at else None,
-            "used_at": c.used_at.isoformat() if c.used_at else None,
-            # Pool bilgisi
-            "pool": {
-                "target_amount": c.coupon_type.pool.target_amount if c.coupon_type and c.coupon_type.pool else None,
-                "current_balance": c.coupon_type.pool.current_balance if c.coupon_type and c.coupon_type.pool else None
-            } if c.coupon_type and c.coupon_type.pool else None
-        }
-        for c in coupons
-    ]
+    coupons, next_cursor = pagination.paginate(q, [models.Coupon.id], after, limit, response=response)
+
+    return pagination.page([fieldsets.render(c, COUPON_FIELDS, selected) for c in coupons], next_cursor)
 
 
 @app.post("/coupons/use")
-def use_coupon(req: UseCouponRequest, db: Session = Depends(get_db)):
-    return logic.use_coupon(db, req.coupon_id)
+def use_coupon(
+    req: UseCouponRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return idempotency.execute("/coupons/use", idempotency_key, logic.use_coupon, req.coupon_id)
+
+
+MAX_BATCH_COUPON_USES = 5000
+
+
+@app.post("/coupons/use/batch",
+          summary="Toplu Kupon Kullanımı",
+          description="Bir işletmenin çok sayıda kuponunu tek işlemde kullanır (günlük limit birikimli uygulanır)")
+def use_coupons_batch(
+    req: UseCouponBatchRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    if len(req.coupon_ids) > MAX_BATCH_COUPON_USES:
+        raise HTTPException(status_code=400, detail=f"En fazla {MAX_BATCH_COUPON_USES} kupon gönderilebilir")
+    return idempotency.execute(
+        "/coupons/use/batch", idempotency_key, logic.use_coupons_batch, req.merchant_id, req.coupon_ids
+    )
 
 
 @app.post("/coupons/assign",
@@ -1336,7 +1407,7 @@ def assign_coupon(req: AssignCouponRequest, db: Session = Depends(get_db)):
         existing_coupon = db.query(models.Coupon).filter(
             models.Coupon.coupon_type_id == coupon.coupon_type_id,
             models.Coupon.beneficiary_id == req.beneficiary_id,
-            models.Coupon.status.in_(["assigned", "used"])
+            models.Coupon.status.in_(coupon_state.HELD_STATUSES)
         ).first()
         
         if existing_coupon:
@@ -1345,10 +1416,20 @@ def assign_coupon(req: AssignCouponRequest, db: Session = Depends(get_db)):
                 detail="Bu kupon tipinden zaten bir kuponunuz var. Aynı kupon tipinden sadece 1 tane alabilirsiniz."
             )
         
-        coupon.beneficiary_id = req.beneficiary_id
-        coupon.status = "assigned"
+        # Koşullu geçiş: kupon hâlâ "created" ve kullanıcı bu tipten almamışsa atanır
+        assigned = coupon_state.transition(
+            db, coupon.id, "created", "assigned",
+            where=[~coupon_state.held_by(req.beneficiary_id, coupon.coupon_type_id)],
+            beneficiary_id=req.beneficiary_id
+        )
+        if not assigned:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Kupon bu sırada başka bir kullanıcıya atandı, tekrar deneyin")
+        logic.add_received_coupons(db, {req.beneficiary_id: 1})
         db.commit()
         db.refresh(coupon)
+        beneficiary_selector.invalidate()
+        showcase.cache.invalidate()
         
         return {
             "status": "success",
@@ -1368,6 +1449,48 @@ def assign_coupon(req: AssignCouponRequest, db: Session = Depends(get_db)):
 
 
 # BENEFICIARY COUPONS
+@app.post("/coupons/claim",
+          summary="Kupon Tipinden Kupon Al",
+          description="Kupon tipinin sıradaki boş kuponunu ihtiyaç sahibine atar (isteğe bağlı kısa süreli rezervasyon)")
+def claim_coupon(
+    req: ClaimCouponRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Belirli bir kupon ID'si gerekmez; aynı tipe gelen eşzamanlı istekler farklı kuponları alır"""
+    if req.reserve_seconds is not None and not 0 < req.reserve_seconds <= coupon_claims.MAX_RESERVATION_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"reserve_seconds 1 ile {coupon_claims.MAX_RESERVATION_SECONDS} arasında olmalı"
+        )
+    result = idempotency.execute(
+        "/coupons/claim", idempotency_key, coupon_claims.claim,
+        req.coupon_type_id, req.beneficiary_id, req.reserve_seconds,
+        user_id=req.beneficiary_id
+    )
+    if result.get("status") == "success":
+        beneficiary_selector.invalidate()
+    return result
+
+
+@app.post("/coupons/{coupon_id}/confirm",
+          summary="Kupon Rezervasyonunu Onayla",
+          description="/coupons/claim ile rezerve edilen kuponu süresi dolmadan onaylar")
+def confirm_coupon(coupon_id: int, req: ConfirmCouponRequest):
+    return write_pipeline.run(coupon_claims.confirm, coupon_id, req.beneficiary_id)
+
+
+@app.post("/coupons/allocate",
+          summary="Atanmamış Kuponları Toplu Dağıt",
+          description="Tüm atanmamış kuponları priority, kupon limiti ve tip başına 1 kupon kuralına göre tek seferde dağıtır")
+def allocate_coupons(req: AllocateCouponsRequest = None):
+    """Eşleştirme bellekte yapılır, sonuç tek toplu UPDATE ile yazılır (dry_run=true ise yazılmaz)"""
+    req = req or AllocateCouponsRequest()
+    result = write_pipeline.run(allocation.allocate, req.coupon_type_ids, req.dry_run)
+    if result.get("status") == "success" and result["assigned"] and not req.dry_run:
+        beneficiary_selector.invalidate()
+    return result
+
+
 @app.get("/beneficiaries/{beneficiary_id}/coupons")
 def beneficiary_coupons(beneficiary_id: int, db: Session = Depends(get_db)):
     coupons = db.query(models.Coupon).filter(models.Coupon.beneficiary_id == beneficiary_id).all()
@@ -1425,6 +1548,7 @@ def create_coupon_type(req: CouponTypeCreate, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(coupon_type)
         db.refresh(pool)
+        showcase.cache.invalidate()
         
         return {
             "id": coupon_type.id,
@@ -1451,30 +1575,56 @@ def create_coupon_type(req: CouponTypeCreate, db: Session = Depends(get_db)):
 def list_pools(
     category: Optional[str] = Query(None),
     merchant_id: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None, description=fieldsets.FIELDS_DESCRIPTION),
+    after: Optional[str] = Query(None, description=pagination.AFTER_DESCRIPTION),
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, description=pagination.LIMIT_DESCRIPTION),
+    response: Response = None,
     db: Session = Depends(get_db)
 ):
+    selected = fieldsets.parse(fields, fieldsets.column_names(models.Pool))
     q = db.query(models.Pool)
+    if selected:
+        q = q.options(fieldsets.load_only_option(models.Pool, selected))
     if category:
         q = q.join(models.Pool.coupon_type).filter(models.CouponType.category == category)
     if merchant_id:
         q = q.join(models.Pool.coupon_type).filter(models.CouponType.merchant_id == merchant_id)
-    return q.all()
+    pools, next_cursor = pagination.paginate(q, [models.Pool.id], after, limit, response=response)
+    if selected:
+        pools = [fieldsets.model_dict(p, selected) for p in pools]
+    return pagination.page(pools, next_cursor)
 
 
 # DONATION LIST
 @app.get("/donations")
-def list_donations(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+def list_donations(
+    user_id: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None, description=fieldsets.FIELDS_DESCRIPTION),
+    after: Optional[str] = Query(None, description=pagination.AFTER_DESCRIPTION),
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, description=pagination.LIMIT_DESCRIPTION),
+    response: Response = None,
+    db: Session = Depends(get_db)
+):
+    selected = fieldsets.parse(fields, fieldsets.column_names(models.Donation))
     q = db.query(models.Donation)
+    if selected:
+        q = q.options(fieldsets.load_only_option(models.Donation, selected))
     if user_id:
         q = q.filter(models.Donation.user_id == user_id)
-    return q.all()
+    donations, next_cursor = pagination.paginate(q, [models.Donation.id], after, limit, response=response)
+    if selected:
+        donations = [fieldsets.model_dict(d, selected) for d in donations]
+    return pagination.page(donations, next_cursor)
 
 
 # REPORTS
 @app.get("/reports/summary",
          summary="Platform Özet Raporu",
          description="Tüm platform istatistikleri ve kullanıcı listesi")
-def report_summary(db: Session = Depends(get_db)):
+def report_summary(
+    stream: bool = Query(False, description="true ise tüm sonuçlar sayfalanmadan akışlı JSON olarak döner"),
+    db: Session = Depends(get_db)
+):
     """
     Platform özet raporu ve veri setleri
     
@@ -1484,27 +1634,36 @@ def report_summary(db: Session = Depends(get_db)):
     - Kupon ve otomatik bağış sayıları
     - Kullanıcı listesi
     """
-    users = db.query(models.User).all()
-    return {
-        "total_users": len(users),
-        "total_donors": db.query(models.User).filter(models.User.role == "donor").count(),
-        "total_beneficiaries": db.query(models.User).filter(models.User.role == "beneficiary").count(),
-        "total_merchants": db.query(models.User).filter(models.User.role == "merchant").count(),
-        "total_donations_amount": db.query(func.coalesce(func.sum(models.Donation.amount), 0)).scalar(),
-        "total_coupons": db.query(models.Coupon).count(),
-        "total_auto_donation_rules": db.query(models.AutoDonation).count(),
-        "users_list": [
-            {
-                "id": u.id,
-                "name": u.name,
-                "role": u.role,
-                "balance": u.balance,
-                "is_verified": u.is_verified,
-                "password_note": "Tüm kullanıcılar için varsayılan şifre: 123"
-            }
-            for u in users
-        ]
-    }
+    def summary(db):
+        return {
+            "total_users": db.query(func.count(models.User.id)).scalar(),
+            "total_donors": db.query(models.User).filter(models.User.role == "donor").count(),
+            "total_beneficiaries": db.query(models.User).filter(models.User.role == "beneficiary").count(),
+            "total_merchants": db.query(models.User).filter(models.User.role == "merchant").count(),
+            "total_donations_amount": db.query(func.coalesce(func.sum(models.Donation.amount), 0)).scalar(),
+            "total_coupons": db.query(models.Coupon).count(),
+            "total_auto_donation_rules": db.query(models.AutoDonation).count(),
+        }
+
+    def users_query(db):
+        return db.query(
+            models.User.id, models.User.name, models.User.role, models.User.balance, models.User.is_verified
+        ).order_by(models.User.id)
+
+    def user_dict(u):
+        return {
+            "id": u.id,
+            "name": u.name,
+            "role": u.role,
+            "balance": u.balance,
+            "is_verified": u.is_verified,
+            "password_note": "Tüm kullanıcılar için varsayılan şifre: 123"
+        }
+
+    if stream:
+        return streaming.json_object(summary, "users_list", users_query, user_dict)
+
+    return {**summary(db), "users_list": [user_dict(u) for u in users_query(db).all()]}
 
 
 # NEEDS (İhtiyaç/İlan) ENDPOINT'LERİ
@@ -1527,9 +1686,11 @@ def create_need(req: NeedCreate, db: Session = Depends(get_db)):
             category=req.category,
             target_amount=req.target_amount,
             current_amount=0.0,
+            remaining_amount=req.target_amount,
             status="active"
         )
         db.add(need)
+        stats.bump(db, {stats.NEEDS_TOTAL: 1, stats.need_status("active"): 1})
         db.commit()
         db.refresh(need)
         
@@ -1551,6 +1712,38 @@ def create_need(req: NeedCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"İhtiyaç oluşturulurken hata: {str(e)}")
 
 
+# İhtiyaç alanları: alan adı → değer fonksiyonu; hesaplananların okuduğu sütunlar NEED_FIELD_DEPENDS'te
+NEED_FIELDS = {
+    "id": lambda n: n.id,
+    "user_id": lambda n: n.user_id,
+    "user_name": lambda n: n.user.name if n.user else None,
+    "title": lambda n: n.title,
+    "description": lambda n: n.description,
+    "category": lambda n: n.category,
+    "target_amount": lambda n: n.target_amount,
+    "current_amount": lambda n: n.current_amount,
+    "status": lambda n: n.status,
+    "progress": lambda n: (n.current_amount / n.target_amount * 100) if n.target_amount > 0 else 0,
+    "created_at": lambda n: n.created_at,
+    "completed_at": lambda n: n.completed_at,
+}
+
+NEED_FIELD_DEPENDS = {
+    "user_name": ["user_id"],
+    "progress": ["current_amount", "target_amount"],
+}
+
+
+def _need_options(selected):
+    """Seçili alanlara göre load_only ve (user_name istenirse) sadece kullanıcı adını joinedload et."""
+    if selected is None:
+        return [joinedload(models.Need.user)]
+    options = [fieldsets.load_only_option(models.Need, selected, NEED_FIELD_DEPENDS, always=("id", "created_at"))]
+    if "user_name" in selected:
+        options.append(joinedload(models.Need.user).load_only(models.User.name))
+    return options
+
+
 @app.get("/needs",
          summary="İhtiyaçları Listele",
          description="Tüm aktif ihtiyaçları listeler")
@@ -1558,62 +1751,56 @@ def list_needs(
     user_id: Optional[int] = Query(None),
     status: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description=fieldsets.FIELDS_DESCRIPTION),
+    after: Optional[str] = Query(None, description=pagination.AFTER_DESCRIPTION),
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, description=pagination.LIMIT_DESCRIPTION),
+    stream: bool = Query(False, description="true ise tüm sonuçlar sayfalanmadan akışlı JSON olarak döner"),
+    response: Response = None,
     db: Session = Depends(get_db)
 ):
     """İhtiyaçları filtreleyerek listele"""
-    q = db.query(models.Need)
-    
-    if user_id:
-        q = q.filter(models.Need.user_id == user_id)
-    if status:
-        q = q.filter(models.Need.status == status)
-    if category:
-        q = q.filter(models.Need.category == category)
-    
-    needs = q.order_by(models.Need.created_at.desc()).all()
-    
-    return [
-        {
-            "id": n.id,
-            "user_id": n.user_id,
-            "user_name": n.user.name if n.user else None,
-            "title": n.title,
-            "description": n.description,
-            "category": n.category,
-            "target_amount": n.target_amount,
-            "current_amount": n.current_amount,
-            "status": n.status,
-            "progress": (n.current_amount / n.target_amount * 100) if n.target_amount > 0 else 0,
-            "created_at": n.created_at,
-            "completed_at": n.completed_at
-        }
-        for n in needs
-    ]
+    selected = fieldsets.parse(fields, NEED_FIELDS)
+
+    def needs_query(db):
+        q = db.query(models.Need).options(*_need_options(selected))
+        if user_id:
+            q = q.filter(models.Need.user_id == user_id)
+        if status:
+            q = q.filter(models.Need.status == status)
+        if category:
+            q = q.filter(models.Need.category == category)
+        return q
+
+    def need_dict(n):
+        return fieldsets.render(n, NEED_FIELDS, selected)
+
+    if stream:
+        return streaming.json_array(
+            lambda db: needs_query(db).order_by(models.Need.created_at.desc(), models.Need.id.desc()),
+            need_dict
+        )
+
+    needs, next_cursor = pagination.paginate(
+        needs_query(db), [models.Need.created_at, models.Need.id], after, limit, descending=True, response=response
+    )
+    return pagination.page([need_dict(n) for n in needs], next_cursor)
 
 
 @app.get("/needs/{need_id}",
          summary="İhtiyaç Detayı",
          description="Belirli bir ihtiyacın detaylarını getirir")
-def get_need(need_id: int, db: Session = Depends(get_db)):
+def get_need(
+    need_id: int,
+    fields: Optional[str] = Query(None, description=fieldsets.FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db)
+):
     """İhtiyaç detayını getir"""
-    need = db.query(models.Need).filter(models.Need.id == need_id).first()
+    selected = fieldsets.parse(fields, NEED_FIELDS)
+    need = db.query(models.Need).options(*_need_options(selected)).filter(models.Need.id == need_id).first()
     if not need:
         raise HTTPException(status_code=404, detail="İhtiyaç bulunamadı")
     
-    return {
-        "id": need.id,
-        "user_id": need.user_id,
-        "user_name": need.user.name if need.user else None,
-        "title": need.title,
-        "description": need.description,
-        "category": need.category,
-        "target_amount": need.target_amount,
-        "current_amount": need.current_amount,
-        "status": need.status,
-        "progress": (need.current_amount / need.target_amount * 100) if need.target_amount > 0 else 0,
-        "created_at": need.created_at,
-        "completed_at": need.completed_at
-    }
+    return fieldsets.render(need, NEED_FIELDS, selected)
 
 
 @app.delete("/needs/{need_id}",
@@ -1629,6 +1816,7 @@ def delete_need(need_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Sadece tamamlanan veya iptal edilen ihtiyaçlar silinebilir")
     
     db.delete(need)
+    stats.bump(db, {stats.NEEDS_TOTAL: -1, stats.need_status(need.status): -1})
     db.commit()
     
     return {"message": "İhtiyaç başarıyla silindi"}
@@ -1637,8 +1825,21 @@ def delete_need(need_id: int, db: Session = Depends(get_db)):
 @app.post("/needs/{need_id}/donate",
           summary="İhtiyaca Bağış Yap",
           description="Belirli bir ihtiyaca bağış yapar")
-def donate_to_need(need_id: int, req: NeedDonateRequest, db: Session = Depends(get_db)):
+def donate_to_need(
+    need_id: int,
+    req: NeedDonateRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """İhtiyaca bağış yap"""
+    return idempotency.execute(f"/needs/{need_id}/donate", idempotency_key,
+                               _donate_to_need, need_id, req, user_id=req.donor_id)
+
+
+def _donate_to_need(db: Session, need_id: int, req: NeedDonateRequest, commit: bool = True):
+    """
+    İhtiyaca bağış işlemi (yazma hattında çalışır).
+    commit=False iken hata olursa rollback'i yazma hattı yapar (sadece bu işlemin SAVEPOINT'i).
+    """
     try:
         # İhtiyaç kontrolü
         need = db.query(models.Need).filter(models.Need.id == need_id).first()
@@ -1648,26 +1849,25 @@ def donate_to_need(need_id: int, req: NeedDonateRequest, db: Session = Depends(g
         if need.status != "active":
             raise HTTPException(status_code=400, detail="Sadece aktif ihtiyaçlara bağış yapılabilir")
         
-        # Bağışçı kontrolü
-        donor = db.query(models.User).filter(models.User.id == req.donor_id).first()
-        if not donor:
-            raise HTTPException(status_code=404, detail="Bağışçı bulunamadı")
+        if req.amount <= 0:
+            raise HTTPException(status_code=400, detail="Geçersiz bağış tutarı")
         
-        if donor.balance < req.amount:
+        # Bağış işlemi - bakiyeden koşullu düş (balance >= amount)
+        if not logic.debit_balance(db, req.donor_id, req.amount):
+            if not db.query(models.User.id).filter(models.User.id == req.donor_id).first():
+                raise HTTPException(status_code=404, detail="Bağışçı bulunamadı")
             raise HTTPException(status_code=400, detail="Yetersiz bakiye")
         
-        # Bağış işlemi
-        donor.balance -= req.amount  # Bağışçıdan para çek
-        need.current_amount += req.amount  # İhtiyaca para ekle
+        # İhtiyaca para ekle (sadece hâlâ aktifse)
+        if not logic.add_to_need(db, need_id, req.amount):
+            raise HTTPException(status_code=400, detail="Sadece aktif ihtiyaçlara bağış yapılabilir")
+        
+        # İhtiyaç tamamlandı mı kontrol et - sadece bir istek tamamlayabilir
+        need_completed = logic.complete_need_if_funded(db, need_id)
+        db.refresh(need)
         
-        # İhtiyaç tamamlandı mı kontrol et
-        need_completed = False
         created_coupon = None
-        if need.current_amount >= need.target_amount and need.status != "completed":
-            need.status = "completed"
-            need.completed_at = func.now()
-            need_completed = True
-            
+        if need_completed:
             # İhtiyaç tamamlandığında kupon oluştur
             # Önce kategoriye göre bir merchant bul veya oluştur
             category_merchant_name = {
@@ -1719,6 +1919,9 @@ def donate_to_need(need_id: int, req: NeedDonateRequest, db: Session = Depends(g
             )
             db.add(coupon)
             created_coupon = coupon
+            logic.add_received_coupons(db, {need.user_id: 1})
+            showcase.mark_dirty(db)
+            stats.bump(db, {stats.COUPONS_TOTAL: 1, stats.coupon_status("assigned"): 1})
         
         # Bağış kaydı oluştur
         donation = models.Donation(
@@ -1727,9 +1930,13 @@ def donate_to_need(need_id: int, req: NeedDonateRequest, db: Session = Depends(g
             coupon_type_id=None  # İhtiyaç bağışı için coupon_type_id yok
         )
         db.add(donation)
-        db.commit()
+        stats.bump(db, {stats.DONATIONS_TOTAL: 1, stats.DONATIONS_AMOUNT: req.amount})
+        donor_balance = logic.get_balance(db, req.donor_id)
+        if commit:
+            db.commit()
+        else:
+            db.flush()
         db.refresh(need)
-        db.refresh(donor)
         
         response = {
             "status": "success",
@@ -1740,7 +1947,7 @@ def donate_to_need(need_id: int, req: NeedDonateRequest, db: Session = Depends(g
                 "target_amount": need.target_amount,
                 "status": need.status
             },
-            "donor_balance": donor.balance,
+            "donor_balance": donor_balance,
             "need_completed": need_completed
         }
         
@@ -1757,7 +1964,8 @@ def donate_to_need(need_id: int, req: NeedDonateRequest, db: Session = Depends(g
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        if commit:
+            db.rollback()
         raise HTTPException(status_code=500, detail=f"Bağış yapılırken hata: {str(e)}")
 
 
@@ -1813,7 +2021,11 @@ def create_donor_application(req: DonorApplicationCreate, user_id: int = Query(.
 @app.get("/donor-applications")
 def list_donor_applications(
     status: Optional[str] = Query(None, description="Filtre: pending, approved, rejected"),
-    db: Session = Depends(get_db)
+    after: Optional[str] = Query(None, description=pagination.AFTER_DESCRIPTION),
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, description=pagination.LIMIT_DESCRIPTION),
+    response: Response = None,
+    db: Session = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Gönüllü başvurularını listele (Admin için)"""
     try:
@@ -1822,14 +2034,19 @@ def list_donor_applications(
         if status:
             query = query.filter(models.DonorApplication.verification_status == status)
         
-        applications = query.order_by(models.DonorApplication.created_at.desc()).all()
+        applications, next_cursor = pagination.paginate(
+            query, [models.DonorApplication.created_at, models.DonorApplication.id], after, limit,
+            descending=True, response=response
+        )
+        
+        # Sayfadaki tüm kullanıcı ve admin ID'leri tek sorguda
+        loaders.users.prime(app.user_id for app in applications)
+        loaders.users.prime(app.verified_by for app in applications)
         
         result = []
         for app in applications:
-            user = db.query(models.User).filter(models.User.id == app.user_id).first()
-            admin = None
-            if app.verified_by:
-                admin = db.query(models.User).filter(models.User.id == app.verified_by).first()
+            user = loaders.users.get(app.user_id)
+            admin = loaders.users.get(app.verified_by)
             
             result.append({
                 "id": app.id,
@@ -1847,13 +2064,15 @@ def list_donor_applications(
                 "updated_at": app.updated_at.isoformat() if app.updated_at else None
             })
         
-        return result
+        return pagination.page(result, next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Başvurular listelenirken hata: {str(e)}")
 
 
 @app.get("/donor-applications/{application_id}")
-def get_donor_application(application_id: int, db: Session = Depends(get_db)):
+def get_donor_application(application_id: int, db: Session = Depends(get_db), loaders: Loaders = Depends(get_loaders)):
     """Tek bir başvuruyu getir"""
     try:
         application = db.query(models.DonorApplication).filter(
@@ -1863,10 +2082,9 @@ def get_donor_application(application_id: int, db: Session = Depends(get_db)):
         if not application:
             raise HTTPException(status_code=404, detail="Başvuru bulunamadı")
         
-        user = db.query(models.User).filter(models.User.id == application.user_id).first()
-        admin = None
-        if application.verified_by:
-            admin = db.query(models.User).filter(models.User.id == application.verified_by).first()
+        loaders.users.prime([application.user_id, application.verified_by])
+        user = loaders.users.get(application.user_id)
+        admin = loaders.users.get(application.verified_by)
         
         return {
             "id": application.id,
@@ -1928,13 +2146,16 @@ def approve_donor_application(
         # Kullanıcının rolünü "donor" yap (veya "both" yapabiliriz)
         user = db.query(models.User).filter(models.User.id == application.user_id).first()
         if user:
+            old_role = user.role
             if user.role == "beneficiary" or user.role == "user":
                 user.role = "both"  # Hem beneficiary hem donor
             elif user.role != "both":
                 user.role = "donor"
+            stats.user_role_changed(db, old_role, user.role)
         
         db.commit()
         db.refresh(application)
+        beneficiary_selector.invalidate()
         
         return {
             "status": "success",
@@ -2005,7 +2226,7 @@ def reject_donor_application(
 
 
 @app.get("/donor-applications/user/{user_id}")
-def get_user_donor_application(user_id: int, db: Session = Depends(get_db)):
+def get_user_donor_application(user_id: int, db: Session = Depends(get_db), loaders: Loaders = Depends(get_loaders)):
     """Kullanıcının başvurusunu getir"""
     try:
         application = db.query(models.DonorApplication).filter(
@@ -2018,10 +2239,9 @@ def get_user_donor_application(user_id: int, db: Session = Depends(get_db)):
                 "message": "Henüz başvuru yapılmamış"
             }
         
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        admin = None
-        if application.verified_by:
-            admin = db.query(models.User).filter(models.User.id == application.verified_by).first()
+        loaders.users.prime([application.user_id, application.verified_by])
+        user = loaders.users.get(application.user_id)
+        admin = loaders.users.get(application.verified_by)
         
         return {
             "id": application.id,
@@ -2041,6 +2261,57 @@ def get_user_donor_application(user_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Başvuru getirilirken hata: {str(e)}")
 
 
+# ======================================
+# BELGELER (İÇERİK ADRESLİ BLOB DEPOSU)
+# ======================================
+
+def _store_document(data_url: str) -> str:
+    """Base64 (data URL) belgeyi blob deposuna yazar, SHA-256 özetini döner"""
+    try:
+        return blob_store.put_data_url(data_url)
+    except blob_store.DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except blob_store.InvalidDocument as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _document_url(request: Request, sha256: Optional[str]) -> Optional[str]:
+    """Listelerde belgenin kendisi yerine indirme adresi döner"""
+    if not sha256:
+        return None
+    return str(request.url_for("get_document", sha256=sha256))
+
+
+def _receive_upload(file: UploadFile) -> str:
+    """
+    Multipart dosyayı CHUNK_SIZE'lık parçalarla okuyup blob deposuna yazar (özet yazarken hesaplanır).
+    İstek gövdesinin boyutu okunurken UploadSizeLimit middleware'inde sınırlanır
+    (Content-Length olsun olmasın); put_chunks dosyanın kendisini ayrıca sınırlar.
+    """
+    try:
+        return blob_store.put_chunks(iter(lambda: file.file.read(blob_store.CHUNK_SIZE), b""))
+    except blob_store.DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except blob_store.InvalidDocument as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        file.file.close()
+
+
+@app.get("/documents/{sha256}",
+         summary="Belge İndir",
+         description="Blob deposundaki belgeyi SHA-256 özetiyle döner (Range istekleri desteklenir)")
+def get_document(sha256: str):
+    if not blob_store.exists(sha256):
+        raise HTTPException(status_code=404, detail="Belge bulunamadı")
+    return FileResponse(
+        blob_store.path_for(sha256),
+        media_type=blob_store.content_type(sha256),
+        # İçerik özetle adreslendiği için asla değişmez
+        headers={"Cache-Control": "private, max-age=31536000, immutable"}
+    )
+
+
 # ======================================
 # GÖNÜLLÜ BAŞVURU SİSTEMİ (E-DEVLET BELGESİ İLE)
 # Bağışçı (donor) sisteminden ayrı, yeni bir sistem
@@ -2053,7 +2324,7 @@ def create_volunteer_application(req: VolunteerApplicationCreate, db: Session =
         # Aynı e-posta ile başvuru var mı kontrol et
         if req.email:
             existing_application = db.query(models.VolunteerApplication).filter(
-                func.lower(models.VolunteerApplication.email) == func.lower(req.email)
+                models.VolunteerApplication.email_normalized == models.normalize_email(req.email)
             ).first()
             
             if existing_application:
@@ -2062,6 +2333,9 @@ def create_volunteer_application(req: VolunteerApplicationCreate, db: Session =
                 elif existing_application.verification_status == "approved":
                     raise HTTPException(status_code=400, detail="Bu e-posta ile zaten onaylanmış bir başvurunuz var")
         
+        # Belge veritabanına değil blob deposuna yazılır, satırda sadece özeti tutulur
+        document_sha256 = _store_document(req.document_file) if req.document_file else None
+        
         # Yeni başvuru oluştur
         application = models.VolunteerApplication(
             name=req.name,
@@ -2069,7 +2343,7 @@ def create_volunteer_application(req: VolunteerApplicationCreate, db: Session =
             phone=req.phone,
             edevlet_document_url=req.edevlet_document_url,
             edevlet_qr_data=req.edevlet_qr_data,
-            document_file=req.document_file,
+            document_sha256=document_sha256,
             verification_status="pending"
         )
         
@@ -2093,25 +2367,34 @@ def create_volunteer_application(req: VolunteerApplicationCreate, db: Session =
 @app.get("/volunteer-applications")
 def list_volunteer_applications(
     status: Optional[str] = Query(None, description="Filtre: pending, approved, rejected"),
-    db: Session = Depends(get_db)
+    after: Optional[str] = Query(None, description=pagination.AFTER_DESCRIPTION),
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, description=pagination.LIMIT_DESCRIPTION),
+    response: Response = None,
+    request: Request = None,
+    db: Session = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Gönüllü başvurularını listele (Admin için)"""
     try:
-        query = db.query(models.VolunteerApplication)
+        # Eski base64 belge sütunu listede okunmaz
+        query = db.query(models.VolunteerApplication).options(defer(models.VolunteerApplication.document_file))
         
         if status:
             query = query.filter(models.VolunteerApplication.verification_status == status)
         
-        applications = query.order_by(models.VolunteerApplication.created_at.desc()).all()
+        applications, next_cursor = pagination.paginate(
+            query, [models.VolunteerApplication.created_at, models.VolunteerApplication.id], after, limit,
+            descending=True, response=response
+        )
+        
+        # Sayfadaki tüm kullanıcı ve admin ID'leri tek sorguda
+        loaders.users.prime(app.user_id for app in applications)
+        loaders.users.prime(app.verified_by for app in applications)
         
         result = []
         for app in applications:
-            admin = None
-            user = None
-            if app.verified_by:
-                admin = db.query(models.User).filter(models.User.id == app.verified_by).first()
-            if app.user_id:
-                user = db.query(models.User).filter(models.User.id == app.user_id).first()
+            admin = loaders.users.get(app.verified_by)
+            user = loaders.users.get(app.user_id)
             
             result.append({
                 "id": app.id,
@@ -2120,7 +2403,8 @@ def list_volunteer_applications(
                 "phone": app.phone,
                 "edevlet_document_url": app.edevlet_document_url,
                 "edevlet_qr_data": app.edevlet_qr_data,
-                "document_file": app.document_file,
+                "document_file": _document_url(request, app.document_sha256),  # Sadece indirme adresi
+                "document_sha256": app.document_sha256,
                 "verification_status": app.verification_status,
                 "verified_at": app.verified_at.isoformat() if app.verified_at else None,
                 "verified_by": app.verified_by,
@@ -2132,7 +2416,9 @@ def list_volunteer_applications(
                 "updated_at": app.updated_at.isoformat() if app.updated_at else None
             })
         
-        return result
+        return pagination.page(result, next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Başvurular listelenirken hata: {str(e)}")
 
@@ -2177,10 +2463,15 @@ def approve_volunteer_application(
         existing_user = None
         if application.email:
             existing_user = db.query(models.User).filter(
-                func.lower(models.User.email) == func.lower(application.email)
+                models.User.email_normalized == models.normalize_email(application.email)
             ).first()
         
         if not existing_user:
+            if _name_taken(db, application.name):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Başvurudaki isimle kayıtlı başka bir kullanıcı var, kullanıcı hesabı oluşturulamadı"
+                )
             # Yeni kullanıcı oluştur
             new_user = models.User(
                 name=application.name,
@@ -2190,12 +2481,14 @@ def approve_volunteer_application(
                 is_verified=True
             )
             db.add(new_user)
+            stats.user_created(db, new_user.role, new_user.balance)
             db.commit()
             db.refresh(new_user)
             application.user_id = new_user.id
         else:
             # Mevcut kullanıcının rolünü güncelle
             if existing_user.role != "volunteer":
+                stats.user_role_changed(db, existing_user.role, "volunteer")
                 existing_user.role = "volunteer"
             existing_user.is_verified = True
             application.user_id = existing_user.id
@@ -2216,6 +2509,68 @@ def approve_volunteer_application(
         raise HTTPException(status_code=500, detail=f"Başvuru onaylanırken hata: {str(e)}")
 
 
+@app.post("/volunteer-applications/{application_id}/document",
+          summary="Gönüllü Başvurusuna Belge Yükle",
+          description="E-devlet belgesini multipart/form-data ile yükler (base64 gerekmez)")
+def upload_volunteer_application_document(
+    application_id: int,
+    request: Request,
+    file: UploadFile = File(..., description="E-devlet belgesi (PDF/görsel)"),
+    db: Session = Depends(get_db)
+):
+    """Belgeyi parça parça blob deposuna yazar ve başvuruya bağlar"""
+    application = db.query(models.VolunteerApplication).filter(
+        models.VolunteerApplication.id == application_id
+    ).first()
+    if not application:
+        raise HTTPException(status_code=404, detail="Başvuru bulunamadı")
+    
+    if application.verification_status != "pending":
+        raise HTTPException(status_code=400, detail="Sadece bekleyen başvurulara belge yüklenebilir")
+    
+    application.document_sha256 = _receive_upload(file)
+    db.commit()
+    
+    return {
+        "status": "success",
+        "message": "Belge yüklendi",
+        "application_id": application.id,
+        "document_sha256": application.document_sha256,
+        "document_file": _document_url(request, application.document_sha256)
+    }
+
+
+@app.post("/beneficiary-registrations/{registration_id}/sgk-document",
+          summary="İhtiyaç Sahibi Kaydına SGK Belgesi Yükle",
+          description="SGK döküm evrağını multipart/form-data ile yükler (base64 gerekmez)")
+def upload_beneficiary_sgk_document(
+    registration_id: int,
+    request: Request,
+    file: UploadFile = File(..., description="SGK döküm evrağı (PDF/görsel)"),
+    db: Session = Depends(get_db)
+):
+    """SGK belgesini parça parça blob deposuna yazar ve kayda bağlar"""
+    registration = db.query(models.BeneficiaryRegistration).filter(
+        models.BeneficiaryRegistration.id == registration_id
+    ).first()
+    if not registration:
+        raise HTTPException(status_code=404, detail="Kayıt bulunamadı")
+    
+    if registration.verification_status != "pending":
+        raise HTTPException(status_code=400, detail="Sadece bekleyen kayıtlara belge yüklenebilir")
+    
+    registration.sgk_document_sha256 = _receive_upload(file)
+    db.commit()
+    
+    return {
+        "status": "success",
+        "message": "SGK belgesi yüklendi",
+        "registration_id": registration.id,
+        "sgk_document_sha256": registration.sgk_document_sha256,
+        "sgk_document_file": _document_url(request, registration.sgk_document_sha256)
+    }
+
+
 @app.post("/volunteer-applications/{application_id}/reject")
 def reject_volunteer_application(
     application_id: int,
@@ -2271,11 +2626,11 @@ def reject_volunteer_application(
 
 
 @app.get("/volunteer-applications/email/{email}")
-def get_volunteer_application_by_email(email: str, db: Session = Depends(get_db)):
+def get_volunteer_application_by_email(email: str, db: Session = Depends(get_db), loaders: Loaders = Depends(get_loaders)):
     """E-posta ile gönüllü başvurusunu getir"""
     try:
         application = db.query(models.VolunteerApplication).filter(
-            func.lower(models.VolunteerApplication.email) == func.lower(email)
+            models.VolunteerApplication.email_normalized == models.normalize_email(email)
         ).first()
         
         if not application:
@@ -2284,12 +2639,9 @@ def get_volunteer_application_by_email(email: str, db: Session = Depends(get_db)
                 "message": "Henüz başvuru yapılmamış"
             }
         
-        admin = None
-        user = None
-        if application.verified_by:
-            admin = db.query(models.User).filter(models.User.id == application.verified_by).first()
-        if application.user_id:
-            user = db.query(models.User).filter(models.User.id == application.user_id).first()
+        loaders.users.prime([application.user_id, application.verified_by])
+        admin = loaders.users.get(application.verified_by)
+        user = loaders.users.get(application.user_id)
         
         return {
             "id": application.id,
@@ -1,20 +1,46 @@
-﻿from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
+﻿from sqlalchemy import Column, Integer, String, Text, Float, Boolean, ForeignKey, DateTime, Date, Index
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from app.database import Base
 
 
+# Noktalı/noktasız I'nın tüm biçimleri (I, İ, ı, i) aynı anahtara düşer: Türkçe yazılan "IŞIK"
+# ile "ışık", ASCII yazılan "ADMIN" ile "admin" eşleşir. (casefold tek başına "İ"yi "i" + birleşik nokta yapar.)
+_FOLD_I = str.maketrans({"I": "i", "İ": "i", "ı": "i"})
+_COMBINING_DOT = "\u0307"
+
+
+def _fold(value):
+    # Başka yerde lower() ile küçültülmüş "i̇" (i + birleşik nokta) de "i" olsun
+    return value.translate(_FOLD_I).casefold().replace("i" + _COMBINING_DOT, "i")
+
+
+def normalize_name(value):
+    """Büyük/küçük harf duyarsız kullanıcı adı anahtarı; boş değer None olur."""
+    return _fold(value) if value else None
+
+
+def normalize_email(value):
+    """Büyük/küçük harf duyarsız e-posta anahtarı; boş değer None olur."""
+    return _fold(value) if value else None
+
+
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     email = Column(String, nullable=True, unique=False)
+    # normalize_name(name) / normalize_email(email) - indeksli, büyük/küçük harf duyarsız arama (yazılırken @validates ile güncellenir)
+    name_normalized = Column(String, nullable=True)
+    email_normalized = Column(String, nullable=True)
     password = Column(String, nullable=True)  # Şifre (test için plain text)
     role = Column(String, nullable=False, default="donor")  # donor / beneficiary / both / merchant / admin / volunteer
     balance = Column(Float, nullable=False, default=0.0)
     priority = Column(Integer, nullable=False, default=0)  # ihtiyaç sahipleri için
     is_verified = Column(Boolean, nullable=False, default=False)
+    # Atanan kupon sayısı (coupons.beneficiary_id sayacı; atama/üretimde artırılır)
+    received_coupon_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Profil özelleştirme alanları
     phone = Column(String, nullable=True)
@@ -29,6 +55,24 @@ class User(Base):
     donations = relationship("Donation", back_populates="user")
     coupons_received = relationship("Coupon", back_populates="beneficiary", foreign_keys="Coupon.beneficiary_id")
 
+    __table_args__ = (
+        # İhtiyaç sahibi seçimi: role IN (...) AND is_verified ORDER BY priority DESC
+        Index("ix_users_role_verified_priority", "role", "is_verified", "priority"),
+        # Giriş / kayıt: kullanıcı adı ve e-posta büyük/küçük harf duyarsız tekil
+        Index("ix_users_name_normalized", "name_normalized", unique=True),
+        Index("ix_users_email_normalized", "email_normalized", unique=True),
+    )
+
+    @validates("name")
+    def _sync_name_normalized(self, key, value):
+        self.name_normalized = normalize_name(value)
+        return value
+
+    @validates("email")
+    def _sync_email_normalized(self, key, value):
+        self.email_normalized = normalize_email(value)
+        return value
+
 
 class Merchant(Base):
     __tablename__ = "merchants"
@@ -72,13 +116,22 @@ class Coupon(Base):
     id = Column(Integer, primary_key=True, index=True)
     coupon_type_id = Column(Integer, ForeignKey("coupon_types.id"), nullable=False)
     beneficiary_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    status = Column(String, nullable=False, default="created")  # created / assigned / used
+    status = Column(String, nullable=False, default="created")  # created / reserved / assigned / used
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     used_at = Column(DateTime(timezone=True), nullable=True)
+    reserved_until = Column(DateTime(timezone=True), nullable=True)  # status=reserved iken onay için son an
+    backflow_at = Column(DateTime(timezone=True), nullable=True)  # İşletme geri akışı yapıldıysa (bir kez)
 
     coupon_type = relationship("CouponType", back_populates="coupons")
     beneficiary = relationship("User", back_populates="coupons_received")
 
+    __table_args__ = (
+        # /coupons filtreleri: status, beneficiary_id + status, coupon_type_id + status
+        Index("ix_coupons_status", "status"),
+        Index("ix_coupons_beneficiary_status", "beneficiary_id", "status"),
+        Index("ix_coupons_type_status", "coupon_type_id", "status"),
+    )
+
 
 class Donation(Base):
     __tablename__ = "donations"
@@ -92,6 +145,12 @@ class Donation(Base):
     user = relationship("User", back_populates="donations")
     coupon_type = relationship("CouponType")
 
+    __table_args__ = (
+        # /money-flows: kullanıcı bazlı ve genel (created_at, id) azalan sayfalama
+        Index("ix_donations_user_created", "user_id", "created_at"),
+        Index("ix_donations_created", "created_at"),
+    )
+
 
 class Transfer(Base):
     __tablename__ = "transfers"
@@ -113,10 +172,16 @@ class AutoDonation(Base):
     frequency = Column(String, nullable=False, default="daily")  # daily / weekly / monthly (simülasyon)
     is_active = Column(Boolean, nullable=False, default=True)
     last_run = Column(DateTime(timezone=True), nullable=True)
+    next_run_at = Column(DateTime(timezone=True), nullable=True)  # frequency + last_run ile hesaplanır
 
     user = relationship("User")
     coupon_type = relationship("CouponType")
 
+    __table_args__ = (
+        # Zamanlayıcı: is_active AND next_run_at <= :now ORDER BY next_run_at
+        Index("ix_auto_donations_active_next_run", "is_active", "next_run_at"),
+    )
+
 
 class Need(Base):
     __tablename__ = "needs"
@@ -128,12 +193,18 @@ class Need(Base):
     category = Column(String, nullable=False)  # gıda, kırtasiye, ulaşım, tech, etc.
     target_amount = Column(Float, nullable=False)
     current_amount = Column(Float, nullable=False, default=0.0)
+    remaining_amount = Column(Float, nullable=True)  # target_amount - current_amount (bağışlarla birlikte güncellenir)
     status = Column(String, nullable=False, default="active")  # active / completed / cancelled
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Sayfalama: (created_at, id)
     completed_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User")
 
+    __table_args__ = (
+        # Geri bağış: status = 'active' ORDER BY remaining_amount LIMIT 1
+        Index("ix_needs_status_remaining", "status", "remaining_amount"),
+    )
+
 
 class PovertyVerification(Base):
     """E-devlet fakirlik durumu tescili"""
@@ -159,7 +230,8 @@ class BeneficiaryRegistration(Base):
     name = Column(String, nullable=False)  # Ad Soyad
     email = Column(String, nullable=True)  # E-posta
     password = Column(String, nullable=True)  # Şifre (hash'lenmiş)
-    sgk_document_file = Column(String, nullable=True)  # Base64 encoded SGK döküm evrağı
+    sgk_document_file = Column(String, nullable=True)  # Eski kayıtlar: base64 SGK döküm evrağı (yeni kayıtlar blob deposunda)
+    sgk_document_sha256 = Column(String, nullable=True)  # SGK döküm evrağı - blob deposundaki SHA-256 özeti
     sgk_document_url = Column(String, nullable=True)  # SGK belgesi URL'i
     verification_status = Column(String, nullable=False, default="pending")  # pending / approved / rejected
     verified_at = Column(DateTime(timezone=True), nullable=True)
@@ -205,6 +277,12 @@ class MoneyFlow(Base):
 
     user = relationship("User")
 
+    __table_args__ = (
+        # /money-flows: kullanıcı bazlı ve genel (created_at, id) azalan sayfalama
+        Index("ix_money_flows_user_created", "user_id", "created_at"),
+        Index("ix_money_flows_created", "created_at"),
+    )
+
 
 
 class MerchantDailyEarnings(Base):
@@ -214,6 +292,7 @@ class MerchantDailyEarnings(Base):
     id = Column(Integer, primary_key=True, index=True)
     merchant_id = Column(Integer, ForeignKey("merchants.id"), nullable=False)
     date = Column(DateTime(timezone=True), nullable=False)
+    day = Column(Date, nullable=True)  # Kaydın günü - (merchant_id, day) benzersiz
     daily_earnings = Column(Float, nullable=False, default=0.0)  # Bugünkü kazanç
     daily_limit = Column(Float, nullable=False, default=2000.0)  # Günlük limit (2000 TL)
     total_earnings = Column(Float, nullable=False, default=0.0)  # Toplam kazanç
@@ -223,6 +302,11 @@ class MerchantDailyEarnings(Base):
 
     merchant = relationship("Merchant")
 
+    __table_args__ = (
+        # Günlük kayıt araması ve upsert hedefi: her işletme için günde tek satır
+        Index("ux_merchant_daily_earnings_merchant_day", "merchant_id", "day", unique=True),
+    )
+
 
 class VolunteerApplication(Base):
     """Gönüllü başvuru sistemi - E-devlet belgesi ile Admin onayı (Bağışçı değil, ayrı sistem)"""
@@ -232,17 +316,50 @@ class VolunteerApplication(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)  # Ad Soyad
     email = Column(String, nullable=True)  # E-posta
+    email_normalized = Column(String, nullable=True, index=True)  # normalize_email(email) - e-posta ile arama
     phone = Column(String, nullable=True)  # Telefon
     edevlet_document_url = Column(String, nullable=True)  # E-devlet belgesi URL'i
     edevlet_qr_data = Column(String, nullable=True)  # E-devlet QR kod verisi
-    document_file = Column(String, nullable=True)  # Base64 encoded belge dosyası
+    document_file = Column(String, nullable=True)  # Eski kayıtlar: base64 belge (yeni kayıtlar blob deposunda)
+    document_sha256 = Column(String, nullable=True)  # Belge dosyası - blob deposundaki SHA-256 özeti
     verification_status = Column(String, nullable=False, default="pending")  # pending / approved / rejected
     verified_at = Column(DateTime(timezone=True), nullable=True)
     verified_by = Column(Integer, ForeignKey("users.id"), nullable=True)  # Admin kullanıcı ID
     rejection_reason = Column(String, nullable=True)  # Red nedeni
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Onaylandıktan sonra oluşturulan kullanıcı ID
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Sayfalama: (created_at, id)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     user = relationship("User", foreign_keys=[user_id])
     admin = relationship("User", foreign_keys=[verified_by])
+
+    @validates("email")
+    def _sync_email_normalized(self, key, value):
+        self.email_normalized = normalize_email(value)
+        return value
+
+
+class IdempotencyKey(Base):
+    """Para hareketi endpoint'leri için Idempotency-Key kayıtları - tekrar denemede aynı yanıt döner"""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    endpoint = Column(String, nullable=False)  # /donate, /wallet/transfer ...
+    key = Column(String, nullable=False)  # İstemcinin gönderdiği Idempotency-Key
+    user_id = Column(Integer, nullable=True)  # İsteği yapan kullanıcı
+    request_hash = Column(String, nullable=True)  # İstek argümanlarının SHA-256'sı (farklı istekte anahtar tekrar oynatılmaz)
+    response = Column(Text, nullable=False)  # İlk başarılı yanıt (JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ux_idempotency_keys_endpoint_key", "endpoint", "key", unique=True),
+    )
+
+
+class PlatformStat(Base):
+    """Platform sayaçları (rol/durum bazında sayılar, toplamlar) - yazma işlemleriyle birlikte artırılır"""
+    __tablename__ = "platform_stats"
+
+    key = Column(String, primary_key=True)  # users.total, users.role:donor, coupons.status:used ...
+    value = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,127 @@
+"""
+Liste endpoint'leri için keyset (cursor) sayfalama.
+
+OFFSET yerine son satırın sıralama anahtarı (id veya (created_at, id)) opak bir
+cursor olarak döner; sonraki sayfa bu anahtardan sonrasını indeks üzerinden okur.
+Böylece her sayfa tablo boyutundan bağımsız sürede ve bellekte gelir.
+
+SQLite tarihleri metin olarak saklar ve aynı tablo içinde biçim karışık olabilir
+(server_default "YYYY-MM-DD HH:MM:SS", Python tarafı mikro saniyeli). Bu yüzden tarih
+sütunları cursor'da veritabanındaki ham metin olarak tutulur ve metin olarak karşılaştırılır;
+ORDER BY ile aynı sıralama garanti edilir.
+
+Her istek sayfalanır: limit verilmezse DEFAULT_LIMIT, en fazla MAX_LIMIT satır okunur.
+Yanıt gövdesi {"items": [...], "next_cursor": "..."} biçimindedir; son sayfada next_cursor
+null'dır. Aynı cursor ayrıca X-Next-Cursor header'ında döner. Frontend tüm listeye ihtiyaç
+duyduğunda cursor'ı takip ederek sayfaları sırayla çeker (src/utils/fetchAllPages.js).
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+from sqlalchemy import String, and_, literal, or_, type_coerce
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+LIMIT_DESCRIPTION = f"Sayfa boyutu (varsayılan {DEFAULT_LIMIT}, en fazla {MAX_LIMIT})"
+AFTER_DESCRIPTION = "Önceki sayfanın next_cursor değeri"
+
+
+def _invalid_cursor():
+    return HTTPException(status_code=400, detail="Geçersiz sayfalama cursor'ı")
+
+
+def encode_token(payload) -> str:
+    """JSON'a çevrilebilen cursor içeriğini opak bir metne çevirir."""
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_token(token: str):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise _invalid_cursor()
+
+
+def bind_values(columns, values) -> list:
+    """Cursor'dan gelen değerleri after_condition'a verilecek SQL değerlerine çevirir."""
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise _invalid_cursor()
+    return [literal(v, String()) if _is_datetime(c) else v for c, v in zip(columns, values)]
+
+
+def encode_cursor(values) -> str:
+    return encode_token(list(values))
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    return bind_values(columns, decode_token(cursor))
+
+
+def _is_datetime(column) -> bool:
+    try:
+        return column.type.python_type is datetime
+    except NotImplementedError:
+        return False
+
+
+def sort_column(column):
+    # Tarih sütunları ham metin olarak karşılaştırılır (ORDER BY ile aynı sıra)
+    return type_coerce(column, String()) if _is_datetime(column) else column
+
+
+def cursor_values(query, columns, row) -> list:
+    values = [getattr(row, c.key) for c in columns]
+    if any(_is_datetime(c) for c in columns):
+        # Son satırın tarihlerini ham metin olarak al (son sütun id: birincil anahtarla tek okuma)
+        values = list(
+            query.session.query(*[sort_column(c) for c in columns]).filter(columns[-1] == values[-1]).one()
+        )
+    return values
+
+
+def after_condition(columns, values, descending: bool):
+    """(c1, c2) > (v1, v2) koşulu (azalan sırada <); SQLite satır karşılaştırmasına gerek yok."""
+    column, value = sort_column(columns[0]), values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, after_condition(columns[1:], values[1:], descending)))
+
+
+def paginate(query, columns, after: str = None, limit: int = DEFAULT_LIMIT,
+             descending: bool = False, response: Response = None):
+    """
+    query'yi columns sırasına göre bir sayfa olarak çalıştırır ve (rows, next_cursor) döner.
+    columns benzersiz bir sıralama oluşturmalı (son sütun id). response verilirse
+    next_cursor X-Next-Cursor header'ına yazılır.
+    """
+    limit = max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+
+    if after:
+        query = query.filter(after_condition(columns, decode_cursor(after, columns), descending))
+
+    order = [c.desc() for c in columns] if descending else list(columns)
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(cursor_values(query, columns, rows[-1]))
+
+    set_next_cursor(response, next_cursor)
+    return rows, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: str):
+    if response is not None and next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+def page(items, next_cursor: str) -> dict:
+    """Sayfalı liste endpoint'lerinin yanıt gövdesi."""
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,124 @@
+"""
+/items vitrini için tek sorgulu özet ve süreç içi önbellek.
+
+Havuzlar, kupon tipleri ve işletmeler tek sorguda birleştirilir; kupon sayıları
+kupon tipi başına COUNT(*) / COUNT(*) FILTER (status = 'created') ile aynı sorguda alınır.
+Sonuç bellekte tutulur. Havuz veya kupon değiştiren işlemler mark_dirty(db) çağırır;
+önbellek o session commit edildikten sonra temizlenir (commit öncesi temizlenirse
+commit'i beklemeyen bir okuyucu eski veriyi yeniden önbelleğe alabilirdi).
+Diğer worker'ların yazdıkları için önbellek en fazla TTL_SECONDS yaşar.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal
+
+TTL_SECONDS = 30
+
+_DIRTY_KEY = "showcase_dirty"
+
+
+def _load_items(db: Session):
+    counts = (
+        db.query(
+            models.Coupon.coupon_type_id.label("coupon_type_id"),
+            func.count(models.Coupon.id).label("coupon_count"),
+            func.count(models.Coupon.id).filter(models.Coupon.status == "created").label("available_coupons")
+        )
+        .group_by(models.Coupon.coupon_type_id)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            models.Pool.id,
+            models.Pool.coupon_type_id,
+            models.Pool.target_amount,
+            models.Pool.current_balance,
+            models.CouponType.name.label("coupon_type_name"),
+            models.CouponType.category,
+            models.CouponType.merchant_id,
+            models.Merchant.name.label("merchant_name"),
+            func.coalesce(counts.c.coupon_count, 0).label("coupon_count"),
+            func.coalesce(counts.c.available_coupons, 0).label("available_coupons")
+        )
+        .join(models.CouponType, models.CouponType.id == models.Pool.coupon_type_id)
+        .join(models.Merchant, models.Merchant.id == models.CouponType.merchant_id)
+        .outerjoin(counts, counts.c.coupon_type_id == models.Pool.coupon_type_id)
+        .order_by(models.Pool.id)
+        .all()
+    )
+
+    items = []
+    for p in rows:
+        # Potansiyel kupon sayısını hesapla (mevcut bakiye / hedef tutar)
+        # Örneğin: 6000 TL toplandı, hedef 1000 TL ise, 6 kupon oluşturulabilir
+        potential_coupons = int(p.current_balance / p.target_amount) if p.target_amount > 0 else 0
+        items.append({
+            "id": p.id,
+            "pool_id": p.id,
+            "coupon_type_id": p.coupon_type_id,  # Bağış için gerekli
+            "merchant_id": p.merchant_id,
+            "title": p.coupon_type_name,
+            "description": f"{p.merchant_name} tarafından sağlanan destek.",
+            "company": p.merchant_name,
+            "category": p.category,
+            "totalAmount": p.target_amount,
+            "collected": p.current_balance,
+            "coupon_count": p.coupon_count,  # Toplam oluşturulmuş kupon sayısı
+            "available_coupons": p.available_coupons,  # Henüz alınmamış kupon sayısı
+            "potential_coupons": potential_coupons,  # Mevcut bakiye ile oluşturulabilecek kupon sayısı
+            "is_completed": p.current_balance >= p.target_amount
+        })
+    return items
+
+
+class ShowcaseCache:
+    def __init__(self, ttl_seconds: float = TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._items = None
+        self._loaded_at = None
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._items = None
+            self._generation += 1
+
+    def get(self, db: Session, merchant_id: int = None):
+        with self._lock:
+            items = self._items
+            fresh = self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.ttl_seconds
+            generation = self._generation
+
+        if items is None or not fresh:
+            items = _load_items(db)
+            with self._lock:
+                # Yükleme sırasında invalidate geldiyse eski sonucu saklama
+                if self._generation == generation:
+                    self._items = items
+                    self._loaded_at = time.monotonic()
+
+        if merchant_id:
+            return [item for item in items if item["merchant_id"] == merchant_id]
+        return list(items)
+
+
+cache = ShowcaseCache()
+
+
+def mark_dirty(db: Session):
+    """Bu session commit edildiğinde vitrin önbelleğini temizle."""
+    db.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        cache.invalidate()
+
@@ -0,0 +1,161 @@
+"""
+Platform sayaçları (/database/overview).
+
+Sayılar ve toplamlar platform_stats tablosunda anahtar/değer olarak tutulur. Yazma
+işlemleri aynı transaction içinde bump(db, {anahtar: fark}) çağırır; işlem geri
+alınırsa sayaç da geri alınır. Okuma tek bir küçük tablo taramasıdır, veritabanı
+boyutundan bağımsızdır.
+
+rebuild() sayaçları GROUP BY sorgularıyla baştan hesaplar (onarım, toplu silme/demo
+yükleme sonrası ve tablo ilk kez kullanılırken).
+"""
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app import models
+
+# rebuild en az bir kez çalıştıysa bulunur; yoksa sayaçlar henüz güvenilir değildir
+INITIALIZED_KEY = "stats.initialized"
+
+USERS_TOTAL = "users.total"
+USERS_BALANCE = "users.balance"
+DONATIONS_TOTAL = "donations.total"
+DONATIONS_AMOUNT = "donations.amount"
+TRANSFERS_TOTAL = "transfers.total"
+TRANSFERS_AMOUNT = "transfers.amount"
+NEEDS_TOTAL = "needs.total"
+COUPONS_TOTAL = "coupons.total"
+
+
+def user_role(role: str) -> str:
+    return f"users.role:{role}"
+
+
+def need_status(status: str) -> str:
+    return f"needs.status:{status}"
+
+
+def coupon_status(status: str) -> str:
+    return f"coupons.status:{status}"
+
+
+def bump(db: Session, deltas: dict):
+    """Sayaçları artırır/azaltır (tek upsert ifadesi). Commit etmez."""
+    rows = [{"key": key, "value": delta} for key, delta in deltas.items() if delta]
+    if not rows:
+        return
+    table = models.PlatformStat.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.key],
+        set_={"value": table.c.value + stmt.excluded.value, "updated_at": func.now()}
+    )
+    db.execute(stmt, rows)
+
+
+def user_created(db: Session, role: str, balance: float = 0.0):
+    bump(db, {USERS_TOTAL: 1, user_role(role): 1, USERS_BALANCE: balance or 0.0})
+
+
+def user_role_changed(db: Session, old_role: str, new_role: str):
+    if old_role != new_role:
+        bump(db, {user_role(old_role): -1, user_role(new_role): 1})
+
+
+def coupon_status_changed(db: Session, old_status: str, new_status: str, count: int = 1):
+    if old_status != new_status:
+        bump(db, {coupon_status(old_status): -count, coupon_status(new_status): count})
+
+
+def need_status_changed(db: Session, old_status: str, new_status: str):
+    if old_status != new_status:
+        bump(db, {need_status(old_status): -1, need_status(new_status): 1})
+
+
+def rebuild(db: Session, commit: bool = True):
+    """Sayaçları tablolardan GROUP BY ile yeniden hesaplar."""
+    # Önce silme: yazma kilidi alınır, aşağıdaki okumalar eşzamanlı bump'larla tutarlı olur
+    db.query(models.PlatformStat).delete(synchronize_session=False)
+
+    values = {INITIALIZED_KEY: 1}
+
+    users_total, users_balance = db.query(
+        func.count(models.User.id), func.coalesce(func.sum(models.User.balance), 0.0)
+    ).one()
+    values[USERS_TOTAL] = users_total
+    values[USERS_BALANCE] = users_balance
+    for role, count in db.query(models.User.role, func.count(models.User.id)).group_by(models.User.role):
+        values[user_role(role)] = count
+
+    values[DONATIONS_TOTAL], values[DONATIONS_AMOUNT] = db.query(
+        func.count(models.Donation.id), func.coalesce(func.sum(models.Donation.amount), 0.0)
+    ).one()
+    values[TRANSFERS_TOTAL], values[TRANSFERS_AMOUNT] = db.query(
+        func.count(models.Transfer.id), func.coalesce(func.sum(models.Transfer.amount), 0.0)
+    ).one()
+
+    values[NEEDS_TOTAL] = 0
+    for status, count in db.query(models.Need.status, func.count(models.Need.id)).group_by(models.Need.status):
+        values[need_status(status)] = count
+        values[NEEDS_TOTAL] += count
+
+    values[COUPONS_TOTAL] = 0
+    for status, count in db.query(models.Coupon.status, func.count(models.Coupon.id)).group_by(models.Coupon.status):
+        values[coupon_status(status)] = count
+        values[COUPONS_TOTAL] += count
+
+    db.execute(
+        models.PlatformStat.__table__.insert(),
+        [{"key": key, "value": value} for key, value in values.items()]
+    )
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return {"status": "success", "keys": len(values)}
+
+
+def snapshot(db: Session):
+    """Tüm sayaçlar {anahtar: değer}; tablo henüz hiç hesaplanmadıysa None."""
+    values = dict(db.query(models.PlatformStat.key, models.PlatformStat.value).all())
+    if INITIALIZED_KEY not in values:
+        return None
+    return values
+
+
+def _grouped(values: dict, prefix: str) -> dict:
+    return {
+        key[len(prefix):]: int(value)
+        for key, value in values.items()
+        if key.startswith(prefix) and value
+    }
+
+
+def overview(values: dict) -> dict:
+    """snapshot() değerlerinden /database/overview sayaç bölümleri"""
+    return {
+        "users": {
+            "total": int(values.get(USERS_TOTAL, 0)),
+            "by_role": _grouped(values, "users.role:"),
+            "total_balance": round(values.get(USERS_BALANCE, 0.0), 2)
+        },
+        "donations": {
+            "total": int(values.get(DONATIONS_TOTAL, 0)),
+            "total_amount": round(values.get(DONATIONS_AMOUNT, 0.0), 2)
+        },
+        "transfers": {
+            "total": int(values.get(TRANSFERS_TOTAL, 0)),
+            "total_amount": round(values.get(TRANSFERS_AMOUNT, 0.0), 2)
+        },
+        "needs": {
+            "total": int(values.get(NEEDS_TOTAL, 0)),
+            "active": int(values.get(need_status("active"), 0)),
+            "completed": int(values.get(need_status("completed"), 0))
+        },
+        "coupons": {
+            "total": int(values.get(COUPONS_TOTAL, 0)),
+            "by_status": _grouped(values, "coupons.status:")
+        }
+    }
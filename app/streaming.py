@@ -0,0 +1,78 @@
+"""
+Büyük sonuç kümeleri için akışlı (streaming) JSON yanıtları.
+
+Satırlar yield_per ile parça parça okunur ve JSON dizisi parça parça yazılır;
+tüm liste bellekte kurulmaz, ilk byte ilk parça okununca gider.
+
+Yanıt gövdesi endpoint döndükten sonra üretildiği için istek session'ı (get_db)
+kullanılamaz; akış kendi SessionLocal'ını açar ve bitince kapatır.
+"""
+
+import json
+from datetime import date, datetime
+
+from fastapi.responses import StreamingResponse
+
+from app.database import SessionLocal
+
+STREAM_BATCH_SIZE = 1000
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} JSON'a çevrilemez")
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=_default)
+
+
+def _iter_array(db, build_query, to_dict, batch_size: int):
+    # Her satırı ayrı yazmak yerine batch_size satırlık parçalar halinde gönder
+    yield "["
+    buffer = []
+    written = False
+    for row in build_query(db).yield_per(batch_size):
+        buffer.append(_dumps(to_dict(row)))
+        if len(buffer) >= batch_size:
+            yield ("," if written else "") + ",".join(buffer)
+            written = True
+            buffer = []
+    if buffer:
+        yield ("," if written else "") + ",".join(buffer)
+    yield "]"
+
+
+def _run(chunks_fn):
+    db = SessionLocal()
+    try:
+        yield from chunks_fn(db)
+    finally:
+        db.close()
+
+
+def json_array(build_query, to_dict, batch_size: int = STREAM_BATCH_SIZE) -> StreamingResponse:
+    """
+    build_query(db) → Query; her satır to_dict(row) ile dönüştürülüp JSON dizisi olarak akıtılır.
+    """
+    return StreamingResponse(
+        _run(lambda db: _iter_array(db, build_query, to_dict, batch_size)),
+        media_type="application/json"
+    )
+
+
+def json_object(build_fields, array_key: str, build_query, to_dict,
+                batch_size: int = STREAM_BATCH_SIZE) -> StreamingResponse:
+    """
+    build_fields(db) → dict (sayılar, toplamlar); ardından array_key altında satırlar akıtılır:
+    {"alan": ..., ..., "array_key": [ ... ]}
+    """
+    def chunks(db):
+        fields = build_fields(db)
+        head = _dumps(fields)[:-1]
+        yield head + ("," if fields else "") + _dumps(array_key) + ":"
+        yield from _iter_array(db, build_query, to_dict, batch_size)
+        yield "}"
+
+    return StreamingResponse(_run(chunks), media_type="application/json")
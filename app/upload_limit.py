@@ -0,0 +1,66 @@
+"""
+Belge yükleme endpoint'leri için istek gövdesi boyut sınırı (ASGI middleware).
+
+FastAPI multipart gövdeyi endpoint çalışmadan önce geçici dosyaya okur; endpoint içindeki
+kontrol ancak tüm gövde diske yazıldıktan sonra çalışır. Bu middleware gövdeyi
+okunurken sayar: Content-Length sınırı aşıyorsa hiç okunmadan, Content-Length yoksa
+(chunked yükleme) sınır aşıldığı anda 413 döner ve okuma kesilir.
+"""
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app import blob_store
+
+# Multipart sınırları ve başlıkları için belge boyutunun üstüne eklenen pay
+MULTIPART_OVERHEAD = 64 * 1024
+
+MAX_UPLOAD_BODY_SIZE = blob_store.MAX_DOCUMENT_SIZE + MULTIPART_OVERHEAD
+
+# Sınırın uygulandığı POST yolları (yol bu eklerden biriyle biter)
+UPLOAD_PATH_SUFFIXES = ("/document", "/sgk-document")
+
+
+def too_large_detail(max_size: int = blob_store.MAX_DOCUMENT_SIZE) -> str:
+    return f"Belge en fazla {max_size // (1024 * 1024)} MB olabilir"
+
+
+class UploadSizeLimit:
+    def __init__(self, app, max_body_size: int = MAX_UPLOAD_BODY_SIZE,
+                 path_suffixes=UPLOAD_PATH_SUFFIXES):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_suffixes = tuple(path_suffixes)
+
+    def _applies(self, scope) -> bool:
+        return (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"].endswith(self.path_suffixes)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = JSONResponse({"detail": too_large_detail()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    # Form ayrıştırması burada kesilir; FastAPI HTTPException'ı 413 yanıtına çevirir
+                    raise HTTPException(status_code=413, detail=too_large_detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,103 @@
+"""
+Tek yazıcılı (single-writer) grup commit hattı.
+
+İstek thread'leri yazma işlemlerini (bağış, transfer, kupon kullanımı) kuyruğa bırakır.
+Tek bir yazıcı thread kuyruktaki işlemleri toplar, hepsini tek transaction içinde
+(her biri kendi SAVEPOINT'inde) uygular ve tek commit ile diske yazar.
+Her isteğin Future'ı kendi sonucuyla çözülür.
+
+SQLite tek dosyaya aynı anda tek yazıcı kabul ettiği için istek thread'leri
+birbirinin kilidini beklemez ve her istek için ayrı fsync yapılmaz.
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+
+from app.database import BEGIN_MODE_OPTION, SessionLocal
+
+# Tek commit'te uygulanacak en fazla işlem sayısı
+MAX_BATCH = 128
+
+
+class WritePipeline:
+    def __init__(self, session_factory=SessionLocal, max_batch: int = MAX_BATCH):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="write-pipeline", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        fn(db, *args, commit=False, **kwargs) yazıcı thread'de çalıştırılır.
+        fn commit etmemeli; commit'i hat grup halinde yapar.
+        """
+        self.start()
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """submit + sonucu bekle (hata olursa aynı hata burada yükselir)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply(batch)
+
+    def _apply(self, batch):
+        db = self.session_factory()
+        outcomes = []
+        try:
+            # Batch tek transaction: BEGIN IMMEDIATE ile açılır, her işlem kendi SAVEPOINT'inde
+            db.connection(execution_options={BEGIN_MODE_OPTION: "IMMEDIATE"})
+            for future, fn, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                savepoint = db.begin_nested()
+                try:
+                    result = fn(db, *args, commit=False, **kwargs)
+                except Exception as e:
+                    savepoint.rollback()
+                    outcomes.append((future, None, e))
+                    continue
+
+                # Hata dönen işlemin yazdıkları gruba karışmasın
+                if isinstance(result, dict) and result.get("status") == "error":
+                    savepoint.rollback()
+                else:
+                    savepoint.commit()
+                outcomes.append((future, result, None))
+
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for future, _, _, _ in batch:
+                if future.running():
+                    future.set_exception(e)
+            return
+        finally:
+            db.close()
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+pipeline = WritePipeline()
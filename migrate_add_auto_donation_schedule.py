@@ -0,0 +1,61 @@
+"""
+Veritabanı migration scripti - Otomatik bağış zamanlaması
+Bu script auto_donations tablosuna next_run_at sütununu ve
+(is_active, next_run_at) indeksini ekler, mevcut kuralların next_run_at değerini
+frequency ve last_run'dan hesaplar.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Mevcut sütunları kontrol et
+        cursor.execute("PRAGMA table_info(auto_donations)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'next_run_at' not in columns:
+            print("next_run_at sütunu ekleniyor...")
+            cursor.execute("ALTER TABLE auto_donations ADD COLUMN next_run_at DATETIME")
+        
+        # Hiç çalışmamış kurallar hemen, diğerleri last_run + aralık (app/logic.py AUTO_DONATION_INTERVALS)
+        print("next_run_at değerleri hesaplanıyor...")
+        cursor.execute("""
+            UPDATE auto_donations
+            SET next_run_at = CASE
+                WHEN last_run IS NULL THEN strftime('%Y-%m-%d %H:%M:%f', 'now')
+                WHEN frequency = 'weekly' THEN strftime('%Y-%m-%d %H:%M:%f', last_run, '+7 days')
+                WHEN frequency = 'monthly' THEN strftime('%Y-%m-%d %H:%M:%f', last_run, '+30 days')
+                ELSE strftime('%Y-%m-%d %H:%M:%f', last_run, '+1 day')
+            END
+            WHERE next_run_at IS NULL
+        """)
+        
+        print("ix_auto_donations_active_next_run indeksi ekleniyor...")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS ix_auto_donations_active_next_run
+            ON auto_donations (is_active, next_run_at)
+        """)
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
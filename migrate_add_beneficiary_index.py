@@ -0,0 +1,38 @@
+"""
+Veritabanı migration scripti - İhtiyaç sahibi seçim indeksi
+Bu script users tablosuna (role, is_verified, priority) bileşik indeksini ekler.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        print("ix_users_role_verified_priority indeksi ekleniyor...")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS ix_users_role_verified_priority
+            ON users (role, is_verified, priority)
+        """)
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
@@ -0,0 +1,43 @@
+"""
+Veritabanı migration scripti - Kupon geri akış işareti
+Bu script coupons tablosuna backflow_at sütununu ekler
+(/merchant/backflow her kupon için en fazla bir kez uygulanır).
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Mevcut sütunları kontrol et
+        cursor.execute("PRAGMA table_info(coupons)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'backflow_at' not in columns:
+            print("backflow_at sütunu ekleniyor...")
+            cursor.execute("ALTER TABLE coupons ADD COLUMN backflow_at DATETIME")
+        else:
+            print("backflow_at sütunu zaten mevcut.")
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
@@ -0,0 +1,43 @@
+"""
+Veritabanı migration scripti - Kupon listeleme indeksleri
+Bu script coupons tablosuna (status), (beneficiary_id, status) ve
+(coupon_type_id, status) indekslerini ekler.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+INDEXES = [
+    ("ix_coupons_status", "status"),
+    ("ix_coupons_beneficiary_status", "beneficiary_id, status"),
+    ("ix_coupons_type_status", "coupon_type_id, status"),
+]
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        for name, columns in INDEXES:
+            print(f"{name} indeksi ekleniyor...")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON coupons ({columns})")
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
@@ -0,0 +1,43 @@
+"""
+Veritabanı migration scripti - Kupon rezervasyonu
+Bu script coupons tablosuna reserved_until sütununu ekler
+(/coupons/claim ile "reserved" durumuna alınan kuponların onay süresi).
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Mevcut sütunları kontrol et
+        cursor.execute("PRAGMA table_info(coupons)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'reserved_until' not in columns:
+            print("reserved_until sütunu ekleniyor...")
+            cursor.execute("ALTER TABLE coupons ADD COLUMN reserved_until DATETIME")
+        else:
+            print("reserved_until sütunu zaten mevcut.")
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
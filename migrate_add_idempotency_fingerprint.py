@@ -0,0 +1,55 @@
+"""
+Veritabanı migration scripti - Idempotency-Key istek parmak izi
+Bu script idempotency_keys tablosuna user_id ve request_hash sütunlarını ekler
+(aynı anahtar farklı bir istek veya kullanıcı ile gelirse kayıtlı yanıt tekrar oynatılmaz).
+Mevcut kayıtlarda bu sütunlar boş kalır ve karşılaştırma yapılmaz.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='idempotency_keys'")
+        if not cursor.fetchone():
+            print("idempotency_keys tablosu yok, uygulama ilk açılışta oluşturacak.")
+            return
+
+        # Mevcut sütunları kontrol et
+        cursor.execute("PRAGMA table_info(idempotency_keys)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'user_id' not in columns:
+            print("user_id sütunu ekleniyor...")
+            cursor.execute("ALTER TABLE idempotency_keys ADD COLUMN user_id INTEGER")
+        else:
+            print("user_id sütunu zaten mevcut.")
+
+        if 'request_hash' not in columns:
+            print("request_hash sütunu ekleniyor...")
+            cursor.execute("ALTER TABLE idempotency_keys ADD COLUMN request_hash VARCHAR")
+        else:
+            print("request_hash sütunu zaten mevcut.")
+
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
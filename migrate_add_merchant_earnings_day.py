@@ -0,0 +1,70 @@
+"""
+Veritabanı migration scripti - İşletme günlük kazanç anahtarı
+Bu script merchant_daily_earnings tablosuna day sütununu ekler, mevcut kayıtları
+doldurur, aynı güne ait mükerrer kayıtları birleştirir ve (merchant_id, day)
+benzersiz indeksini oluşturur.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Mevcut sütunları kontrol et
+        cursor.execute("PRAGMA table_info(merchant_daily_earnings)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'day' not in columns:
+            print("day sütunu ekleniyor...")
+            cursor.execute("ALTER TABLE merchant_daily_earnings ADD COLUMN day DATE")
+        
+        cursor.execute("UPDATE merchant_daily_earnings SET day = date(date) WHERE day IS NULL")
+        
+        # Eşzamanlı kullanımda aynı gün için oluşmuş mükerrer satırları ilk satırda birleştir
+        cursor.execute("""
+            SELECT merchant_id, day, MIN(id), SUM(daily_earnings), SUM(total_earnings), SUM(total_donated_back)
+            FROM merchant_daily_earnings
+            GROUP BY merchant_id, day
+            HAVING COUNT(*) > 1
+        """)
+        duplicates = cursor.fetchall()
+        for merchant_id, day, keep_id, daily, total, donated in duplicates:
+            print(f"Mükerrer kayıtlar birleştiriliyor: merchant_id={merchant_id}, day={day}")
+            cursor.execute("""
+                UPDATE merchant_daily_earnings
+                SET daily_earnings = ?, total_earnings = ?, total_donated_back = ?
+                WHERE id = ?
+            """, (daily, total, donated, keep_id))
+            cursor.execute("""
+                DELETE FROM merchant_daily_earnings
+                WHERE merchant_id = ? AND day = ? AND id != ?
+            """, (merchant_id, day, keep_id))
+        
+        print("ux_merchant_daily_earnings_merchant_day indeksi ekleniyor...")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_merchant_daily_earnings_merchant_day
+            ON merchant_daily_earnings (merchant_id, day)
+        """)
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
@@ -0,0 +1,44 @@
+"""
+Veritabanı migration scripti - Para akışı defteri indeksleri
+Bu script money_flows ve donations tablolarına (user_id, created_at) ve
+(created_at) indekslerini ekler.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+INDEXES = [
+    ("ix_money_flows_user_created", "money_flows", "user_id, created_at"),
+    ("ix_money_flows_created", "money_flows", "created_at"),
+    ("ix_donations_user_created", "donations", "user_id, created_at"),
+    ("ix_donations_created", "donations", "created_at"),
+]
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        for name, table, columns in INDEXES:
+            print(f"{name} indeksi ekleniyor...")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
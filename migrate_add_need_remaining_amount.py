@@ -0,0 +1,52 @@
+"""
+Veritabanı migration scripti - İhtiyaç kalan tutar alanı
+Bu script needs tablosuna remaining_amount sütununu ekler, mevcut kayıtlar için
+target_amount - current_amount ile doldurur ve (status, remaining_amount) indeksini oluşturur.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Mevcut sütunları kontrol et
+        cursor.execute("PRAGMA table_info(needs)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'remaining_amount' not in columns:
+            print("remaining_amount sütunu ekleniyor...")
+            cursor.execute("ALTER TABLE needs ADD COLUMN remaining_amount FLOAT")
+        
+        cursor.execute("""
+            UPDATE needs SET remaining_amount = target_amount - current_amount
+            WHERE remaining_amount IS NULL
+        """)
+        
+        print("ix_needs_status_remaining indeksi ekleniyor...")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS ix_needs_status_remaining
+            ON needs (status, remaining_amount)
+        """)
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
@@ -0,0 +1,117 @@
+"""
+Veritabanı migration scripti - Normalize edilmiş kullanıcı adı / e-posta
+Bu script users tablosuna name_normalized ve email_normalized,
+volunteer_applications tablosuna email_normalized sütunlarını ekler, mevcut kayıtları
+doldurur ve indeksleri oluşturur.
+
+Değerler Python'da hesaplanır (SQLite lower() sadece ASCII harfleri çevirir); noktalı/noktasız
+I'nın tüm biçimleri (I, İ, ı, i) "i" olur. Daha önce çalıştırıldıysa tekrar çalıştırmak
+mevcut değerleri yeni kurala göre yeniden hesaplar.
+Büyük/küçük harf farkıyla aynı olan kullanıcı adları / e-postalar varsa tekil indeks
+oluşturulmaz ve çakışan kayıtlar listelenir; düzeltip script'i tekrar çalıştırın.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+
+# app.models.normalize_name / normalize_email ile aynı olmalı
+_FOLD_I = str.maketrans({"I": "i", "İ": "i", "ı": "i"})
+_COMBINING_DOT = "\u0307"
+
+
+def _fold(value):
+    return value.translate(_FOLD_I).casefold().replace("i" + _COMBINING_DOT, "i")
+
+
+def normalize_name(value):
+    return _fold(value) if value else None
+
+
+def normalize_email(value):
+    return _fold(value) if value else None
+
+
+def add_column(cursor, table, column):
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = [c[1] for c in cursor.fetchall()]
+    if column not in columns:
+        print(f"{table}.{column} sütunu ekleniyor...")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} VARCHAR")
+
+
+def backfill(cursor, table, source, target, normalize):
+    cursor.execute(f"SELECT id, {source} FROM {table}")
+    rows = [(normalize(value), row_id) for row_id, value in cursor.fetchall()]
+    cursor.executemany(f"UPDATE {table} SET {target} = ? WHERE id = ?", rows)
+    print(f"   {table}.{target}: {len(rows)} kayıt dolduruldu")
+
+
+def create_unique_index(cursor, name, table, column, source):
+    cursor.execute(f"""
+        SELECT {column}, GROUP_CONCAT(id || ':' || {source}, ', ')
+        FROM {table}
+        WHERE {column} IS NOT NULL
+        GROUP BY {column}
+        HAVING COUNT(*) > 1
+    """)
+    duplicates = cursor.fetchall()
+    if duplicates:
+        print(f"⚠️  {table}.{source} içinde büyük/küçük harf farkıyla aynı {len(duplicates)} değer var, {name} oluşturulmadı:")
+        for value, users in duplicates:
+            print(f"   '{value}' → {users}")
+        return False
+
+    print(f"{name} indeksi ekleniyor...")
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({column})")
+    return True
+
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        add_column(cursor, "users", "name_normalized")
+        add_column(cursor, "users", "email_normalized")
+        # Yeniden çalıştırmada yeni kural çakışma üretebilir; tekil indeksler kontrolden sonra tekrar kurulur
+        cursor.execute("DROP INDEX IF EXISTS ix_users_name_normalized")
+        cursor.execute("DROP INDEX IF EXISTS ix_users_email_normalized")
+        backfill(cursor, "users", "name", "name_normalized", normalize_name)
+        backfill(cursor, "users", "email", "email_normalized", normalize_email)
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='volunteer_applications'")
+        if cursor.fetchone():
+            add_column(cursor, "volunteer_applications", "email_normalized")
+            backfill(cursor, "volunteer_applications", "email", "email_normalized", normalize_email)
+            print("ix_volunteer_applications_email_normalized indeksi ekleniyor...")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS ix_volunteer_applications_email_normalized
+                ON volunteer_applications (email_normalized)
+            """)
+
+        ok = create_unique_index(cursor, "ix_users_name_normalized", "users", "name_normalized", "name")
+        ok = create_unique_index(cursor, "ix_users_email_normalized", "users", "email_normalized", "email") and ok
+
+        conn.commit()
+        if ok:
+            print("✅ Migration başarıyla tamamlandı!")
+        else:
+            print("⚠️  Migration tamamlandı, ancak çakışan kayıtlar düzeltilip tekrar çalıştırılmalı.")
+
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
@@ -0,0 +1,42 @@
+"""
+Veritabanı migration scripti - Sayfalama indeksleri
+Bu script (created_at, id) ile sayfalanan needs ve volunteer_applications
+tablolarına created_at indekslerini ekler.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+INDEXES = [
+    ("ix_needs_created_at", "needs"),
+    ("ix_volunteer_applications_created_at", "volunteer_applications"),
+]
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        for name, table in INDEXES:
+            print(f"{name} indeksi ekleniyor...")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} (created_at)")
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
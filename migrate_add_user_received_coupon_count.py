@@ -0,0 +1,49 @@
+"""
+Veritabanı migration scripti - Alınan kupon sayacı
+Bu script users tablosuna received_coupon_count sütununu ekler ve mevcut
+kullanıcılar için coupons tablosundaki beneficiary_id sayılarıyla doldurur.
+"""
+
+import sqlite3
+import os
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Mevcut sütunları kontrol et
+        cursor.execute("PRAGMA table_info(users)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'received_coupon_count' not in columns:
+            print("received_coupon_count sütunu ekleniyor...")
+            cursor.execute("ALTER TABLE users ADD COLUMN received_coupon_count INTEGER NOT NULL DEFAULT 0")
+        
+        print("Alınan kupon sayıları hesaplanıyor...")
+        cursor.execute("""
+            UPDATE users SET received_coupon_count = (
+                SELECT COUNT(*) FROM coupons WHERE coupons.beneficiary_id = users.id
+            )
+        """)
+        print(f"   {cursor.rowcount} kullanıcı güncellendi")
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
@@ -0,0 +1,76 @@
+"""
+Veritabanı migration scripti - Belgeleri blob deposuna taşıma
+Bu script volunteer_applications.document_sha256 ve beneficiary_registrations.sgk_document_sha256
+sütunlarını ekler, veritabanındaki base64 belgeleri içerik adresli blob deposuna (./blobs)
+yazar ve satırlarda sadece SHA-256 özetini bırakır.
+"""
+
+import sqlite3
+import os
+import sys
+
+# Blob deposu sunucu ile aynı dizine göre çözülsün (./blobs)
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+from app import blob_store
+
+# Veritabanı dosya yolu
+db_path = os.path.join(os.path.dirname(__file__), 'donation.db')
+
+# (tablo, eski base64 sütunu, yeni özet sütunu)
+DOCUMENT_COLUMNS = [
+    ("volunteer_applications", "document_file", "document_sha256"),
+    ("beneficiary_registrations", "sgk_document_file", "sgk_document_sha256"),
+]
+
+def migrate():
+    """Veritabanı şemasını güncelle"""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        for table, file_column, sha_column in DOCUMENT_COLUMNS:
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = [column[1] for column in cursor.fetchall()]
+            if not columns:
+                print(f"{table} tablosu yok, atlanıyor")
+                continue
+            
+            if sha_column not in columns:
+                print(f"{sha_column} sütunu ekleniyor...")
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {sha_column} VARCHAR")
+            
+            rows = cursor.execute(
+                f"SELECT id, {file_column} FROM {table} WHERE {file_column} IS NOT NULL AND {sha_column} IS NULL"
+            ).fetchall()
+            moved = 0
+            for row_id, data_url in rows:
+                try:
+                    sha256 = blob_store.put_data_url(data_url)
+                except ValueError as e:
+                    print(f"⚠️  {table} #{row_id}: {e} - atlandı")
+                    continue
+                cursor.execute(
+                    f"UPDATE {table} SET {sha_column} = ?, {file_column} = NULL WHERE id = ?",
+                    (sha256, row_id)
+                )
+                moved += 1
+            print(f"{table}: {moved} belge blob deposuna taşındı")
+        
+        conn.commit()
+        print("✅ Migration başarıyla tamamlandı!")
+        print("Boşalan alanı geri kazanmak için: sqlite3 donation.db \"VACUUM\"")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Hata: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("Veritabanı migration başlatılıyor...")
+    migrate()
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import '../App.css';
 import ThemeSwitcher, { themes } from './ThemeSwitcher';
+import { fetchAllPages } from '../utils/fetchAllPages';
 
 const AdminPanel = ({ user, onBack }) => {
     const [applications, setApplications] = useState([]);
@@ -38,7 +39,7 @@ const AdminPanel = ({ user, onBack }) => {
                     ? 'http://localhost:8080/volunteer-applications'
                     : `http://localhost:8080/volunteer-applications?status=${filter}`;
                 
-                const response = await fetch(url);
+                const response = await fetchAllPages(url);
                 if (response.ok) {
                     const data = await response.json();
                     setVolunteerApplications(data);
@@ -49,7 +50,7 @@ const AdminPanel = ({ user, onBack }) => {
                     ? 'http://localhost:8080/donor-applications'
                     : `http://localhost:8080/donor-applications?status=${filter}`;
                 
-                const response = await fetch(url);
+                const response = await fetchAllPages(url);
                 if (response.ok) {
                     const data = await response.json();
                     setApplications(data);
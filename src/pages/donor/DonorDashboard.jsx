@@ -5,6 +5,7 @@ import UserSettings from '../user/UserSettings';
 import NotificationSystem from '../../components/NotificationSystem';
 import ThemeSwitcher, { themes } from '../../components/ThemeSwitcher';
 import PaydaLogo from '../../components/PaydaLogo';
+import { fetchAllPages } from '../../utils/fetchAllPages';
 
 const DonorDashboard = ({ user, onLogout }) => {
     const [searchTerm, setSearchTerm] = useState("");
@@ -99,7 +100,7 @@ const DonorDashboard = ({ user, onLogout }) => {
                 }
                 
                 // İhtiyaçları yeniden yükle
-                const needsResponse = await fetch('http://localhost:8080/needs?status=active');
+                const needsResponse = await fetchAllPages('http://localhost:8080/needs?status=active');
                 if (needsResponse.ok) {
                     const needsData = await needsResponse.json();
                     setNeeds(needsData);
@@ -232,7 +233,7 @@ const DonorDashboard = ({ user, onLogout }) => {
     useEffect(() => {
         const fetchNeeds = async () => {
             try {
-                const response = await fetch('http://localhost:8080/needs?status=active');
+                const response = await fetchAllPages('http://localhost:8080/needs?status=active');
                 if (response.ok) {
                     const data = await response.json();
                     setNeeds(data);
@@ -266,7 +267,7 @@ const DonorDashboard = ({ user, onLogout }) => {
         const fetchDonationHistory = async () => {
             try {
                 if (user && user.id) {
-                    const response = await fetch(`http://localhost:8080/donations?user_id=${user.id}`);
+                    const response = await fetchAllPages(`http://localhost:8080/donations?user_id=${user.id}`);
                     if (response.ok) {
                         const data = await response.json();
                         // Tarihe göre sırala (en yeni önce)
@@ -7,6 +7,7 @@ import NotificationSystem from '../../components/NotificationSystem';
 import ThemeSwitcher, { themes } from '../../components/ThemeSwitcher';
 import { censorName } from '../../utils/nameCensor';
 import PaydaLogo from '../../components/PaydaLogo';
+import { fetchAllPages } from '../../utils/fetchAllPages';
 
 const SellerDashboard = ({ user, onLogout }) => {
     const [needs, setNeeds] = useState([]);
@@ -46,7 +47,7 @@ const SellerDashboard = ({ user, onLogout }) => {
         try {
             setCouponsLoading(true);
             // Bu şirkete ait kuponları çek (user.id merchant_id olarak kullanılabilir)
-            const couponsResponse = await fetch(`http://localhost:8080/coupons?merchant_id=${user.id}`);
+            const couponsResponse = await fetchAllPages(`http://localhost:8080/coupons?merchant_id=${user.id}`);
             const itemsResponse = await fetch(`http://localhost:8080/items?merchant_id=${user.id}`);
             
             let allCoupons = [];
@@ -109,7 +110,7 @@ const SellerDashboard = ({ user, onLogout }) => {
             const fetchNeeds = async () => {
                 try {
                     setLoading(true);
-                    const response = await fetch('http://localhost:8080/needs?status=active');
+                    const response = await fetchAllPages('http://localhost:8080/needs?status=active');
                     if (response.ok) {
                         const data = await response.json();
                         setNeeds(data);
@@ -163,7 +164,7 @@ const SellerDashboard = ({ user, onLogout }) => {
             const fetchDonations = async () => {
                 try {
                     setDonationsLoading(true);
-                    const response = await fetch('http://localhost:8080/donations');
+                    const response = await fetchAllPages('http://localhost:8080/donations');
                     if (response.ok) {
                         const data = await response.json();
                         // Tarihe göre sırala (en yeni önce)
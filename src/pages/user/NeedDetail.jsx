@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import '../../App.css';
 import PaydaLogo from '../../components/PaydaLogo';
+import { fetchAllPages } from '../../utils/fetchAllPages';
 
 const NeedDetail = ({ needId, onBack }) => {
     const [need, setNeed] = useState(null);
@@ -19,7 +20,7 @@ const NeedDetail = ({ needId, onBack }) => {
                 }
 
                 // Bu ihtiyaca yapılan bağışları çek (user_id ile filtrele)
-                const donationsResponse = await fetch(`http://localhost:8080/donations`);
+                const donationsResponse = await fetchAllPages(`http://localhost:8080/donations`);
                 if (donationsResponse.ok) {
                     const allDonations = await donationsResponse.json();
                     // İhtiyaç ile ilgili bağışları filtrele (şimdilik tüm bağışları göster)
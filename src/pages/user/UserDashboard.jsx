@@ -11,6 +11,7 @@ import DatabasePanel from '../../components/DatabasePanel';
 import ThemeSwitcher, { themes } from '../../components/ThemeSwitcher';
 import PaydaLogo from '../../components/PaydaLogo';
 import AdminPanel from '../../components/AdminPanel';
+import { fetchAllPages } from '../../utils/fetchAllPages';
 
 const UserDashboard = ({ user, onLogout }) => {
     const [showNeedCreate, setShowNeedCreate] = useState(false);
@@ -43,11 +44,11 @@ const UserDashboard = ({ user, onLogout }) => {
             setLoading(true);
                 // Backend'deki vitrin endpointine istek atıyoruz
             const itemsResponse = await fetch('http://localhost:8080/items');
-            const needsResponse = await fetch('http://localhost:8080/needs?status=active');
-            const couponsResponse = await fetch('http://localhost:8080/coupons?status=created'); // Atanmamış kuponlar
-            const myCouponsResponse = user?.id ? await fetch(`http://localhost:8080/coupons?beneficiary_id=${user.id}`) : null;
+            const needsResponse = await fetchAllPages('http://localhost:8080/needs?status=active');
+            const couponsResponse = await fetchAllPages('http://localhost:8080/coupons?status=created'); // Atanmamış kuponlar
+            const myCouponsResponse = user?.id ? await fetchAllPages(`http://localhost:8080/coupons?beneficiary_id=${user.id}`) : null;
             // Kupon bağışlarını çek (coupon_type_id olan bağışlar)
-            const donationsResponse = await fetch('http://localhost:8080/donations');
+            const donationsResponse = await fetchAllPages('http://localhost:8080/donations?fields=id,user_id,amount,coupon_type_id,created_at');
 
             if (itemsResponse.ok) {
                 const itemsData = await itemsResponse.json();
@@ -123,43 +124,26 @@ const UserDashboard = ({ user, onLogout }) => {
         }
 
         try {
-            // Önce bu coupon_type_id için mevcut bir kupon bul (status=created)
-            const availableCouponsResponse = await fetch(`http://localhost:8080/coupons?status=created`);
-            let couponId = null;
-            
-            if (availableCouponsResponse.ok) {
-                const availableCouponsData = await availableCouponsResponse.json();
-                // İlk mevcut kuponu al (bu coupon_type_id için)
-                const availableCoupon = availableCouponsData.find(c => c.coupon_type_id === couponTypeId);
-                if (availableCoupon) {
-                    couponId = availableCoupon.id;
-                }
-            }
-
-            if (!couponId) {
-                alert('Bu kupon tipi için mevcut kupon bulunamadı. Lütfen daha sonra tekrar deneyin.');
-                return;
-            }
-
-            const response = await fetch('http://localhost:8080/coupons/assign', {
+            // Kupon ID'si seçmeden kupon tipinden al (backend sıradaki boş kuponu verir)
+            const response = await fetch('http://localhost:8080/coupons/claim', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
-                    coupon_id: couponId,
+                    coupon_type_id: couponTypeId,
                     beneficiary_id: user.id
                 })
             });
 
             const data = await response.json();
 
-            if (response.ok) {
+            if (response.ok && data.status === 'success') {
                 addNotification('Kupon Alındı', 'Kupon başarıyla alındı!', 'success', 'fa-check-circle');
                 // Kısa bir gecikme ile verileri yenile (backend'in işlemi tamamlaması için)
                 setTimeout(() => {
                     fetchData();
                 }, 500);
             } else {
-                alert(data.detail || 'Kupon alınamadı');
+                alert(data.detail || data.message || 'Kupon alınamadı');
             }
         } catch (error) {
             console.error('Kupon alma hatası:', error);
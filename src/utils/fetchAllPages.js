@@ -0,0 +1,26 @@
+/**
+ * Sayfalı liste endpoint'lerinin tüm sayfalarını next_cursor'ı takip ederek çeker.
+ * Yanıt gövdesi { items, next_cursor } biçimindedir; dönen nesne fetch yanıtı gibi
+ * kullanılır (ok, status, json()) ve json() tüm sayfaların birleşik listesini verir.
+ */
+const PAGE_LIMIT = 500;
+
+export const fetchAllPages = async (url) => {
+    const separator = url.includes('?') ? '&' : '?';
+    const items = [];
+    let cursor = null;
+
+    do {
+        const pageUrl = `${url}${separator}limit=${PAGE_LIMIT}`
+            + (cursor ? `&after=${encodeURIComponent(cursor)}` : '');
+        const response = await fetch(pageUrl);
+        if (!response.ok) {
+            return response;
+        }
+        const page = await response.json();
+        items.push(...page.items);
+        cursor = page.next_cursor;
+    } while (cursor);
+
+    return { ok: true, status: 200, json: async () => items };
+};
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import beneficiary_selector, models
+from app.database import Base, configure_sqlite
+
+
+@pytest.fixture
+def db():
+    """Her test için boş bir bellek içi SQLite veritabanı (uygulamayla aynı transaction ayarlarıyla)."""
+    engine = configure_sqlite(create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False, "isolation_level": None},
+        poolclass=StaticPool
+    ))
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autoflush=False, bind=engine)()
+    beneficiary_selector.selector.invalidate()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+        beneficiary_selector.selector.invalidate()
+
+
+@pytest.fixture
+def coupon_type(db):
+    merchant = models.Merchant(name="Market")
+    db.add(merchant)
+    db.flush()
+    coupon_type = models.CouponType(name="Gıda", amount=10.0, category="gıda", merchant_id=merchant.id)
+    db.add(coupon_type)
+    db.flush()
+    db.add(models.Pool(coupon_type_id=coupon_type.id, target_amount=10.0, current_balance=0.0))
+    db.commit()
+    return coupon_type
+
+
+def make_user(db, name, **values):
+    user = models.User(name=name, email=f"{name}@example.com", password="x", **values)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def make_beneficiary(db, name, priority=10, **values):
+    return make_user(db, name, role="beneficiary", is_verified=True, priority=priority, **values)
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from app import allocation, models
+
+from conftest import make_beneficiary
+
+
+def _random_case(seed):
+    rng = random.Random(seed)
+    candidates = []
+    for user_id in range(1, 200):
+        priority = rng.randint(0, 100)
+        cap = 10 if priority >= 61 else 5 if priority >= 31 else 3
+        candidates.append((user_id, priority, rng.randint(0, cap - 1), cap))
+    coupons, next_id = {}, 1
+    for coupon_type_id in range(1, 8):
+        count = rng.randint(0, 120)
+        coupons[coupon_type_id] = list(range(next_id, next_id + count))
+        next_id += count
+    owned = {t: set(rng.sample(range(1, 200), 30)) for t in coupons}
+    return coupons, candidates, owned
+
+
+@pytest.mark.skipif(allocation.np is None, reason="NumPy kurulu değil")
+@pytest.mark.parametrize("seed", range(5))
+def test_numpy_and_python_engines_agree(seed):
+    coupons, candidates, owned = _random_case(seed)
+
+    assert allocation._match_numpy(coupons, candidates, owned) == allocation._match_python(coupons, candidates, owned)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_respect_cap_and_one_per_type(seed):
+    coupons, candidates, owned = _random_case(seed)
+    type_of = {c: t for t, ids in coupons.items() for c in ids}
+    room = {c[0]: c[3] - c[2] for c in candidates}
+
+    pairs = allocation._match_python(coupons, candidates, owned)
+
+    per_type = {(type_of[c], u) for c, u in pairs}
+    assert len(per_type) == len(pairs)
+    assert not any(u in owned[t] for t, u in per_type)
+    for user_id, left in room.items():
+        assert sum(1 for _, u in pairs if u == user_id) <= left
+
+
+def test_allocate_assigns_and_counts(db, coupon_type):
+    first = make_beneficiary(db, "ayse", priority=90)
+    second = make_beneficiary(db, "mehmet", priority=10)
+    db.add_all(models.Coupon(coupon_type_id=coupon_type.id, status="created") for _ in range(3))
+    db.commit()
+
+    result = allocation.allocate(db)
+
+    assert result["assigned"] == 2
+    db.expire_all()
+    assert db.get(models.User, first.id).received_coupon_count == 1
+    assert db.get(models.User, second.id).received_coupon_count == 1
+    assert db.query(models.Coupon).filter_by(status="created").count() == 1
+
+
+def test_rejected_quota_rolls_back_assignments(db, coupon_type, monkeypatch):
+    make_beneficiary(db, "ayse", priority=90)
+    db.add(models.Coupon(coupon_type_id=coupon_type.id, status="created"))
+    db.commit()
+    # Başka bir worker'ın aynı anda limiti doldurduğu durum
+    monkeypatch.setattr(allocation.logic, "reserve_coupon_quota", lambda db, counts: set())
+
+    result = allocation.allocate(db)
+
+    assert result["status"] == "error"
+    assert not db.in_transaction()
+    assert db.query(models.Coupon).filter_by(status="created").count() == 1
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+
+def _import_logic(policy):
+    env = dict(os.environ, BACKFLOW_POLICY=policy)
+    return subprocess.run(
+        [sys.executable, "-c", "import app.logic"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+
+def test_unknown_policy_fails_at_import():
+    result = _import_logic("closets")
+
+    assert result.returncode != 0
+    assert "BACKFLOW_POLICY" in result.stderr
+
+
+def test_known_policy_imports():
+    assert _import_logic("round_robin").returncode == 0
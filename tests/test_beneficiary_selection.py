@@ -0,0 +1,54 @@
+from collections import Counter
+
+from app import beneficiary_selector, logic, models
+
+from conftest import make_beneficiary
+
+
+def test_one_coupon_per_beneficiary_per_type(db, coupon_type):
+    first = make_beneficiary(db, "ayse", priority=90)
+    second = make_beneficiary(db, "mehmet", priority=90)
+
+    coupons = logic.mint_coupons(db, coupon_type.id, 6)
+    db.commit()
+
+    per_user = Counter(c["beneficiary_id"] for c in coupons)
+    assert per_user == {first.id: 1, second.id: 1, None: 4}
+    assert [c["status"] for c in coupons].count("created") == 4
+
+
+def test_holders_of_the_type_are_skipped(db, coupon_type):
+    make_beneficiary(db, "ayse", priority=90)
+    logic.mint_coupons(db, coupon_type.id, 1)
+    db.commit()
+
+    coupons = logic.mint_coupons(db, coupon_type.id, 1)
+    db.commit()
+
+    assert coupons[0]["beneficiary_id"] is None
+    assert coupons[0]["status"] == "created"
+
+
+def test_priority_cap_is_enforced_in_sql(db, coupon_type):
+    # Sayaç başka bir worker tarafından limite getirilmiş, bu sürecin kuyruğu bunu bilmiyor
+    user = make_beneficiary(db, "ayse", priority=10)
+    beneficiary_selector.selector.pick(db, 0)
+    db.commit()
+    db.query(models.User).filter(models.User.id == user.id).update({models.User.received_coupon_count: 3})
+    db.commit()
+
+    coupons = logic.mint_coupons(db, coupon_type.id, 1)
+    db.commit()
+
+    assert coupons[0]["beneficiary_id"] is None
+    db.refresh(user)
+    assert user.received_coupon_count == 3
+
+
+def test_rolled_back_pick_resets_the_queue(db, coupon_type):
+    make_beneficiary(db, "ayse", priority=90)
+
+    logic.mint_coupons(db, coupon_type.id, 1)
+    db.rollback()
+
+    assert beneficiary_selector.selector._loaded_at is None
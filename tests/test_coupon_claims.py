@@ -0,0 +1,57 @@
+from app import coupon_claims, models
+
+from conftest import make_beneficiary, make_user
+
+
+def _created_coupons(db, coupon_type, count):
+    db.add_all(models.Coupon(coupon_type_id=coupon_type.id, status="created") for _ in range(count))
+    db.commit()
+    coupon_claims.queues.invalidate()
+
+
+def test_unverified_and_non_beneficiary_users_cannot_claim(db, coupon_type):
+    _created_coupons(db, coupon_type, 1)
+    donor = make_user(db, "bagisci", role="donor", is_verified=True)
+    unverified = make_user(db, "ayse", role="beneficiary", is_verified=False)
+
+    assert coupon_claims.claim(db, coupon_type.id, donor.id)["status"] == "error"
+    assert coupon_claims.claim(db, coupon_type.id, unverified.id)["status"] == "error"
+    assert db.query(models.Coupon).filter_by(status="created").count() == 1
+
+
+def test_priority_cap_applies_to_claims(db, coupon_type):
+    _created_coupons(db, coupon_type, 1)
+    user = make_beneficiary(db, "ayse", priority=10, received_coupon_count=3)
+
+    result = coupon_claims.claim(db, coupon_type.id, user.id)
+
+    assert result["status"] == "error"
+    db.expire_all()
+    assert db.get(models.User, user.id).received_coupon_count == 3
+    assert db.query(models.Coupon).filter_by(status="created").count() == 1
+
+
+def test_claim_counts_towards_the_cap(db, coupon_type):
+    _created_coupons(db, coupon_type, 1)
+    user = make_beneficiary(db, "ayse", priority=10, received_coupon_count=2)
+
+    result = coupon_claims.claim(db, coupon_type.id, user.id)
+
+    assert result["status"] == "success"
+    db.expire_all()
+    assert db.get(models.User, user.id).received_coupon_count == 3
+
+
+def test_rolled_back_claim_returns_coupon_to_queue(db, coupon_type):
+    _created_coupons(db, coupon_type, 2)
+    first = make_beneficiary(db, "ayse")
+    second = make_beneficiary(db, "mehmet")
+
+    savepoint = db.begin_nested()
+    claimed = coupon_claims.claim(db, coupon_type.id, first.id, commit=False)
+    savepoint.rollback()
+
+    result = coupon_claims.claim(db, coupon_type.id, second.id)
+
+    assert result["status"] == "success"
+    assert result["coupon"]["id"] == claimed["coupon"]["id"]
@@ -0,0 +1,63 @@
+from app import logic, models, stats
+
+from conftest import make_beneficiary, make_user
+
+
+def _stat(db, key):
+    return db.query(models.PlatformStat.value).filter_by(key=key).scalar() or 0
+
+
+def _merchant_with_coupons(db, coupon_type, statuses):
+    merchant_user = make_user(db, "market", role="merchant")
+    assert merchant_user.id == coupon_type.merchant_id
+    holder = make_beneficiary(db, "ayse")
+    coupons = [
+        models.Coupon(
+            coupon_type_id=coupon_type.id,
+            status=status,
+            beneficiary_id=holder.id if status == "assigned" else None
+        )
+        for status in statuses
+    ]
+    db.add_all(coupons)
+    db.commit()
+    stats.rebuild(db)
+    return [c.id for c in coupons]
+
+
+def test_batch_use_moves_counters_by_source_status(db, coupon_type):
+    coupon_ids = _merchant_with_coupons(db, coupon_type, ["assigned", "created", "created"])
+
+    result = logic.use_coupons_batch(db, coupon_type.merchant_id, coupon_ids)
+
+    assert result["accepted"] == 3
+    assert _stat(db, stats.coupon_status("used")) == 3
+    assert _stat(db, stats.coupon_status("assigned")) == 0
+    assert _stat(db, stats.coupon_status("created")) == 0
+
+
+def test_merchant_backflow_defers_commit_to_caller(db, coupon_type):
+    coupon_ids = _merchant_with_coupons(db, coupon_type, ["assigned"])
+    logic.use_coupon(db, coupon_ids[0])
+
+    savepoint = db.begin_nested()
+    result = logic.merchant_backflow(db, coupon_ids[0], commit=False)
+    savepoint.rollback()
+
+    assert result["status"] == "success"
+    db.expire_all()
+    assert db.get(models.Coupon, coupon_ids[0]).backflow_at is None
+
+
+def test_second_redemption_is_rejected(db, coupon_type):
+    coupon_ids = _merchant_with_coupons(db, coupon_type, ["assigned"])
+
+    first = logic.use_coupon(db, coupon_ids[0])
+    second = logic.use_coupon(db, coupon_ids[0])
+    batch = logic.use_coupons_batch(db, coupon_type.merchant_id, coupon_ids)
+
+    assert first["status"] == "success"
+    assert second["status"] == "error"
+    assert batch["accepted"] == 0
+    db.expire_all()
+    assert db.get(models.User, coupon_type.merchant_id).balance == coupon_type.amount
@@ -0,0 +1,91 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, update
+
+from app import idempotency, logic, models
+
+from conftest import make_user
+
+
+def _balance(db, user_id):
+    db.expire_all()
+    return db.get(models.User, user_id).balance
+
+
+def test_debit_never_goes_below_zero(db):
+    user = make_user(db, "ayse", role="donor", balance=50.0)
+
+    assert logic.debit_balance(db, user.id, 80.0) is False
+    assert logic.debit_balance(db, user.id, 50.0) is True
+    assert logic.debit_balance(db, user.id, 0.01) is False
+    db.commit()
+
+    assert _balance(db, user.id) == 0.0
+
+
+def test_donate_batch_rolls_back_when_a_debit_misses(db, coupon_type):
+    user = make_user(db, "ayse", role="donor", balance=100.0)
+    users = models.User.__table__
+
+    spent = []
+
+    # Bakiyeler okunduktan sonra başka bir işlem bakiyeyi sıfırlamış gibi
+    @event.listens_for(db, "do_orm_execute")
+    def _concurrent_spend(state):
+        if state.is_update and state.statement.table is users and not spent:
+            spent.append(True)
+            state.session.execute(update(users).where(users.c.id == user.id).values(balance=0.0))
+
+    result = logic.donate_batch(db, [{"user_id": user.id, "amount": 30.0, "coupon_type_id": coupon_type.id}])
+
+    assert result["status"] == "error"
+    assert _balance(db, user.id) == 100.0
+    assert db.query(models.Donation).count() == 0
+    assert db.query(models.Pool.current_balance).scalar() == 0.0
+
+
+def test_daily_earnings_upsert_stops_at_the_limit(db, coupon_type):
+    merchant_id = coupon_type.merchant_id
+    today = date.today()
+
+    assert logic.add_merchant_earnings(db, merchant_id, 1500.0, 150.0, today) is not None
+    assert logic.add_merchant_earnings(db, merchant_id, 600.0, 60.0, today) is None
+    assert logic.add_merchant_earnings(db, merchant_id, logic.DAILY_EARNINGS_LIMIT + 1, 0.0, today) is None
+    row = logic.add_merchant_earnings(db, merchant_id, 500.0, 50.0, today)
+    db.commit()
+
+    assert row.daily_earnings == logic.DAILY_EARNINGS_LIMIT
+    assert logic.get_merchant_daily_earnings(db, merchant_id, today).total_donated_back == 200.0
+
+
+@pytest.fixture
+def fresh_responses(monkeypatch):
+    monkeypatch.setattr(idempotency, "recent_responses", idempotency.ResponseLRU())
+
+
+def test_idempotent_replay_does_not_debit_twice(db, coupon_type, fresh_responses):
+    user = make_user(db, "ayse", role="donor", balance=100.0)
+
+    first = idempotency.run_once(db, "/donate", "k1", logic.donate, user.id, 30.0, coupon_type.id, user_id=user.id)
+    replay = idempotency.run_once(db, "/donate", "k1", logic.donate, user.id, 30.0, coupon_type.id, user_id=user.id)
+
+    assert first["status"] == "success"
+    assert replay == first
+    assert _balance(db, user.id) == 70.0
+    assert db.query(models.Donation).count() == 1
+
+
+def test_reused_key_with_different_body_is_rejected(db, coupon_type, fresh_responses):
+    user = make_user(db, "ayse", role="donor", balance=100.0)
+    other = make_user(db, "mehmet", role="donor", balance=100.0)
+    idempotency.run_once(db, "/donate", "k1", logic.donate, user.id, 30.0, coupon_type.id, user_id=user.id)
+
+    with pytest.raises(HTTPException) as body_mismatch:
+        idempotency.run_once(db, "/donate", "k1", logic.donate, user.id, 40.0, coupon_type.id, user_id=user.id)
+    with pytest.raises(HTTPException) as user_mismatch:
+        idempotency.run_once(db, "/donate", "k1", logic.donate, user.id, 30.0, coupon_type.id, user_id=other.id)
+
+    assert body_mismatch.value.status_code == user_mismatch.value.status_code == 422
+    assert _balance(db, user.id) == 70.0
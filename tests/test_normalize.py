@@ -0,0 +1,41 @@
+from app import models
+
+
+def test_turkish_names_match_case_insensitively():
+    assert models.normalize_name("IŞIK") == models.normalize_name("ışık")
+    assert models.normalize_name("İpek") == models.normalize_name("ipek") == "ipek"
+    assert models.normalize_name("Ayşe İhtiyaç") == models.normalize_name("ayşe ihtiyaç")
+    assert models.normalize_name("ÇİĞDEM ÖZTÜRK") == models.normalize_name("çiğdem öztürk")
+
+
+def test_ascii_names_match_case_insensitively():
+    assert models.normalize_name("ADMIN") == models.normalize_name("admin") == "admin"
+    assert models.normalize_name("ILGAZ") == models.normalize_name("ilgaz")
+
+
+def test_dotted_and_dotless_i_collide():
+    # Türkçe ve ASCII yazımlar aynı anahtara düşer
+    keys = {models.normalize_name(name) for name in ["ILGAZ", "İLGAZ", "ılgaz", "ilgaz", "Ilgaz"]}
+    assert len(keys) == 1
+    assert models.normalize_name("IŞIK") == models.normalize_name("Isik".replace("s", "ş"))
+
+
+def test_lowered_dotted_capital_i_is_plain_i():
+    # "İ".lower() → "i̇" (i + birleşik nokta)
+    assert models.normalize_name("İpek".lower()) == "ipek"
+
+
+def test_email_folding():
+    assert models.normalize_email("INFO@Example.COM") == "info@example.com"
+    assert models.normalize_email("İpek@example.com") == "ipek@example.com"
+
+
+def test_empty_values_are_none():
+    assert models.normalize_name("") is None
+    assert models.normalize_email(None) is None
+
+
+def test_user_keeps_normalized_columns_in_sync():
+    user = models.User(name="IŞIK", email="Isik@Example.com")
+    assert user.name_normalized == models.normalize_name("ışık")
+    assert user.email_normalized == "isik@example.com"
@@ -0,0 +1,42 @@
+from app import models, pagination
+
+from conftest import make_user
+
+
+def _donations(db, count):
+    user = make_user(db, "bagisci", role="donor")
+    db.add_all(models.Donation(user_id=user.id, amount=i + 1) for i in range(count))
+    db.commit()
+    return db.query(models.Donation)
+
+
+def test_default_limit_applies_without_parameters(db):
+    query = _donations(db, pagination.DEFAULT_LIMIT + 5)
+
+    rows, next_cursor = pagination.paginate(query, [models.Donation.id])
+
+    assert len(rows) == pagination.DEFAULT_LIMIT
+    assert next_cursor is not None
+
+
+def test_limit_is_clamped_to_maximum(db):
+    query = _donations(db, pagination.MAX_LIMIT + 5)
+
+    rows, _ = pagination.paginate(query, [models.Donation.id], limit=pagination.MAX_LIMIT * 10)
+
+    assert len(rows) == pagination.MAX_LIMIT
+
+
+def test_cursor_walks_every_row_once(db):
+    query = _donations(db, 25)
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = pagination.paginate(query, [models.Donation.created_at, models.Donation.id], cursor, 10)
+        seen.extend(r.id for r in rows)
+        if cursor is None:
+            break
+
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen)) == 25
+    assert pagination.page(seen, None) == {"items": seen, "next_cursor": None}
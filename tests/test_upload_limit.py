@@ -0,0 +1,107 @@
+import asyncio
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.upload_limit import UploadSizeLimit
+
+LIMIT = 64 * 1024
+BOUNDARY = "testboundary"
+
+received_sizes = []
+
+app = FastAPI()
+app.add_middleware(UploadSizeLimit, max_body_size=LIMIT)
+
+
+@app.post("/applications/{application_id}/document")
+def upload(application_id: int, file: UploadFile = File(...)):
+    size = len(file.file.read())
+    received_sizes.append(size)
+    return {"size": size}
+
+
+client = TestClient(app)
+
+
+def multipart_chunks(payload_size: int, chunk_size: int = 8 * 1024):
+    # Tek dosya alanlı multipart gövdenin parçaları
+    yield (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="belge.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode()
+    for start in range(0, payload_size, chunk_size):
+        yield b"x" * min(chunk_size, payload_size - start)
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def post_chunked(payload_size: int):
+    """
+    Gövdeyi Content-Length olmadan parça parça (uvicorn'un chunked yüklemede yaptığı gibi)
+    ayrı http.request mesajlarıyla gönderir. (status, uygulamanın okuduğu bayt) döner.
+    """
+    chunks = list(multipart_chunks(payload_size))
+    consumed = 0
+    messages = []
+
+    async def receive():
+        nonlocal consumed
+        if not chunks:
+            return {"type": "http.disconnect"}
+        chunk = chunks.pop(0)
+        consumed += len(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/applications/1/document",
+        "raw_path": b"/applications/1/document",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+            (b"transfer-encoding", b"chunked"),
+        ],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    status = next(m["status"] for m in messages if m["type"] == "http.response.start")
+    return status, consumed
+
+
+def test_chunked_upload_over_limit_is_rejected_while_streaming():
+    received_sizes.clear()
+    status, consumed = post_chunked(LIMIT * 16)
+    assert status == 413
+    assert received_sizes == []
+    # Okuma sınır aşıldığı anda kesilir, gövdenin geri kalanı okunmaz
+    assert consumed < LIMIT * 2
+
+
+def test_chunked_upload_under_limit_is_accepted():
+    received_sizes.clear()
+    status, _ = post_chunked(LIMIT // 2)
+    assert status == 200
+    assert received_sizes == [LIMIT // 2]
+
+
+def test_content_length_over_limit_is_rejected():
+    response = client.post(
+        "/applications/1/document",
+        files={"file": ("belge.pdf", b"x" * (LIMIT * 2), "application/pdf")},
+    )
+    assert response.status_code == 413
+
+
+def test_other_paths_are_not_limited():
+    limited = UploadSizeLimit(app, max_body_size=LIMIT)
+    assert not limited._applies({"type": "http", "method": "POST", "path": "/volunteer-applications"})
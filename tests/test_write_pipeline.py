@@ -0,0 +1,106 @@
+import sqlite3
+from concurrent.futures import Future
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base, configure_sqlite
+from app.write_pipeline import WritePipeline
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "pipeline.db"
+    engine = configure_sqlite(create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False, "isolation_level": None}
+    ))
+    Base.metadata.create_all(bind=engine)
+    yield path, sessionmaker(autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def merchant_names(path):
+    # Ayrı bağlantı: sadece commit edilmiş satırları görür
+    conn = sqlite3.connect(path)
+    try:
+        return [name for (name,) in conn.execute("SELECT name FROM merchants ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def add_merchant(name):
+    def op(db, commit=True):
+        db.add(models.Merchant(name=name))
+        db.flush()
+        return {"status": "success", "name": name}
+    return op
+
+
+def run_batch(pipeline, *ops):
+    futures = []
+    batch = []
+    for op in ops:
+        future = Future()
+        futures.append(future)
+        batch.append((future, op, (), {}))
+    pipeline._apply(batch)
+    return futures
+
+
+def test_batch_is_invisible_until_group_commit(db_path):
+    path, session_factory = db_path
+    seen_mid_batch = []
+
+    def look(db, commit=True):
+        seen_mid_batch.extend(merchant_names(path))
+        return {"status": "success"}
+
+    futures = run_batch(WritePipeline(session_factory), add_merchant("a"), look, add_merchant("b"))
+
+    assert seen_mid_batch == []
+    assert [f.result()["status"] for f in futures] == ["success"] * 3
+    assert merchant_names(path) == ["a", "b"]
+
+
+def test_rolled_back_ops_leave_no_rows(db_path):
+    path, session_factory = db_path
+
+    def failing(db, commit=True):
+        db.add(models.Merchant(name="error-dict"))
+        db.flush()
+        return {"status": "error", "message": "iptal"}
+
+    def raising(db, commit=True):
+        db.add(models.Merchant(name="exception"))
+        db.flush()
+        raise RuntimeError("boom")
+
+    futures = run_batch(WritePipeline(session_factory), add_merchant("a"), failing, raising, add_merchant("b"))
+
+    assert futures[1].result()["status"] == "error"
+    with pytest.raises(RuntimeError):
+        futures[2].result()
+    assert merchant_names(path) == ["a", "b"]
+
+
+def test_failed_group_commit_fails_every_op(db_path):
+    path, session_factory = db_path
+
+    class FailingCommit:
+        def __init__(self):
+            self.session = session_factory()
+
+        def __getattr__(self, name):
+            return getattr(self.session, name)
+
+        def commit(self):
+            raise RuntimeError("disk full")
+
+    futures = run_batch(WritePipeline(FailingCommit), add_merchant("a"), add_merchant("b"))
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result()
+    assert merchant_names(path) == []